@@ -0,0 +1,147 @@
+"""Admission control and priority scheduling for graph executions
+
+Every request runs a graph on a checked-out agent set, so only a bounded
+number can make progress at once. Requests beyond that wait in a bounded
+queue ordered by priority class (order confirmations and other text messages
+ahead of new image lists), then by arrival. When the queue is full, or a
+request has waited longer than the queue timeout, it is rejected straight
+away so the caller can reply "busy, please retry" instead of holding the
+customer until the graph's execution timeout.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import metrics
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+REJECT_QUEUE_FULL = "queue_full"
+REJECT_TIMEOUT = "queue_timeout"
+
+# Class of requests whose action is not in the configured priorities
+OTHER_CLASS = "other"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted (queue full or queue timeout)"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class AdmissionController:
+    """Bounded, priority-ordered admission of requests to max_concurrency slots
+
+    Args:
+        max_concurrency: Requests allowed to run at once
+        max_queue_size: Requests allowed to wait for a slot; further requests are rejected
+        queue_timeout: Seconds a request may wait for a slot (None waits indefinitely)
+        priorities: Priority per request class, lower runs first
+        default_priority: Priority of classes missing from priorities
+    """
+
+    def __init__(self, max_concurrency: int, max_queue_size: int, queue_timeout: Optional[float] = None,
+                 priorities: Optional[Dict[str, int]] = None, default_priority: int = 0):
+        if max_concurrency < 1:
+            raise ValueError(f"Admission max_concurrency must be at least 1, got {max_concurrency}")
+
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max(0, max_queue_size)
+        self.queue_timeout = queue_timeout
+        self.priorities = priorities or {}
+        self.default_priority = default_priority
+        self._condition = threading.Condition()
+        self._running = 0
+        self._waiting = []  # Heap of (priority, sequence) for queued requests
+        self._sequence = itertools.count()
+
+    def request_class(self, action: Optional[str]) -> str:
+        """Map a client-supplied action onto a configured class, so metric names stay bounded"""
+        return action if action in self.priorities else OTHER_CLASS
+
+    def priority(self, request_class: str) -> int:
+        return self.priorities.get(request_class, self.default_priority)
+
+    def _record_occupancy(self) -> None:
+        metrics.set_gauge("admission.running", self._running)
+        metrics.set_gauge("admission.queued", len(self._waiting))
+
+    def _reject(self, request_class: str, reason: str, message: str) -> AdmissionRejected:
+        metrics.increment(f"admission.rejected.{request_class}.{reason}")
+        logger.warning(f"Rejected '{request_class}' request: {message}")
+        return AdmissionRejected(reason, message)
+
+    def _acquire(self, request_class: str) -> None:
+        start = time.perf_counter()
+
+        with self._condition:
+            if self._running < self.max_concurrency and not self._waiting:
+                self._running += 1
+                self._record_occupancy()
+                metrics.observe(f"admission.queue_ms.{request_class}", 0)
+                return
+
+            if len(self._waiting) >= self.max_queue_size:
+                raise self._reject(request_class, REJECT_QUEUE_FULL,
+                                   f"Queue full ({len(self._waiting)} waiting, {self._running} running)")
+
+            ticket = (self.priority(request_class), next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            self._record_occupancy()
+
+            deadline = None if self.queue_timeout is None else start + self.queue_timeout
+            while not (self._waiting[0] == ticket and self._running < self.max_concurrency):
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._record_occupancy()
+                    # The head of the queue may have changed
+                    self._condition.notify_all()
+                    raise self._reject(request_class, REJECT_TIMEOUT,
+                                       f"No slot after {self.queue_timeout}s in the queue")
+                self._condition.wait(remaining)
+
+            heapq.heappop(self._waiting)
+            self._running += 1
+            self._record_occupancy()
+            # Let the next queued request claim any other free slot
+            self._condition.notify_all()
+
+        metrics.observe(f"admission.queue_ms.{request_class}", (time.perf_counter() - start) * 1000)
+
+    def _release(self) -> None:
+        with self._condition:
+            self._running -= 1
+            self._record_occupancy()
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, request_class: str):
+        """Hold a slot for the duration of the with-block, queueing by priority if none is free
+
+        Raises:
+            AdmissionRejected: If the queue is full or no slot became free within queue_timeout
+        """
+        self._acquire(request_class)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return current slot and queue occupancy"""
+        with self._condition:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "queued": len(self._waiting),
+                "max_queue_size": self.max_queue_size,
+            }
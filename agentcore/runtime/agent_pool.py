@@ -0,0 +1,107 @@
+"""Checked-out pool of per-request agent sets
+
+Strands agents keep their conversation on the instance and a compiled Graph
+keeps its execution state, so neither can serve two requests at once. The
+pool hands each request its own set of agents (created on demand up to a
+configured size) while expensive shared resources such as the MCP client and
+the Bedrock model clients stay process-wide.
+"""
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+import metrics
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+
+class AgentPoolTimeout(Exception):
+    """Raised when no agent set becomes available within the checkout timeout"""
+
+
+class AgentPool:
+    """Bounded pool of objects created by factory, checked out one request at a time"""
+
+    def __init__(self, factory: Callable[[], Any], size: int, name: str = "agent_pool"):
+        if size < 1:
+            raise ValueError(f"Agent pool size must be at least 1, got {size}")
+
+        self.factory = factory
+        self.size = size
+        self.name = name
+        self._idle = queue.LifoQueue()  # Reuse the most recently returned (warmest) set first
+        self._created = 0
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    def _try_create(self) -> Optional[Any]:
+        """Create a new item if the pool has not reached its size"""
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+
+        try:
+            item = self.factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+        logger.info(f"{self.name}: created item {self._created}/{self.size}")
+        return item
+
+    def _record_usage(self, delta: int) -> None:
+        with self._lock:
+            self._in_use += delta
+            in_use = self._in_use
+        metrics.set_gauge(f"{self.name}.in_use", in_use)
+        metrics.set_gauge(f"{self.name}.utilisation", in_use / self.size)
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None):
+        """Check out an item for the duration of the with-block
+
+        Args:
+            timeout: Seconds to wait for a free item (None waits indefinitely)
+
+        Raises:
+            AgentPoolTimeout: If no item became available in time
+        """
+        start = time.perf_counter()
+
+        try:
+            item = self._idle.get_nowait()
+        except queue.Empty:
+            item = self._try_create()
+            if item is None:
+                try:
+                    item = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    metrics.increment(f"{self.name}.timeouts")
+                    raise AgentPoolTimeout(
+                        f"No agents available after {timeout}s ({self.size} in use)"
+                    )
+
+        metrics.observe(f"{self.name}.wait_ms", (time.perf_counter() - start) * 1000)
+        self._record_usage(1)
+
+        try:
+            yield item
+        finally:
+            self._record_usage(-1)
+            self._idle.put(item)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return current pool occupancy"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+            }
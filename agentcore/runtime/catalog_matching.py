@@ -0,0 +1,212 @@
+"""Deterministic catalog matching, availability and pricing
+
+Implements the mechanical part of the catalog agent's workflow
+(prompts/catalog.md) in code: match requested items to products returned by
+search_products_by_product_names, compare stock with the requested quantity,
+pick alternatives for out-of-stock items and format the two order options.
+Items that cannot be matched unambiguously are left for the catalog agent.
+"""
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from grocery_items import list_item_text, split_quantity
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+_WORD_QUANTITIES = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "ten": 10, "twelve": 12}
+
+AVAILABLE = "available"
+PARTIAL = "partial"
+OUT_OF_STOCK = "out_of_stock"
+NOT_FOUND = "not_found"
+
+
+@dataclass
+class RequestedItem:
+    """An item of the customer's list"""
+
+    name: str
+    quantity: float = 1
+    unit: Optional[str] = None
+
+    def quantity_text(self, quantity: Optional[float] = None) -> str:
+        quantity = self.quantity if quantity is None else quantity
+        text = f"{quantity:g}"
+        return f"{text} {self.unit}" if self.unit else text
+
+
+@dataclass
+class ItemMatch:
+    """Outcome of matching a requested item against the catalog"""
+
+    item: RequestedItem
+    product: Optional[Dict[str, Any]] = None
+    candidates: List[Dict[str, Any]] = field(default_factory=list)
+    status: str = NOT_FOUND
+    alternative: Optional[Dict[str, Any]] = None
+
+    @property
+    def resolved(self) -> bool:
+        return self.product is not None
+
+
+def parse_quantity(text: Optional[str]) -> float:
+    if not text:
+        return 1
+    text = text.lower()
+    if text in _WORD_QUANTITIES:
+        return _WORD_QUANTITIES[text]
+    try:
+        if "/" in text:
+            numerator, denominator = text.split("/", 1)
+            return float(numerator) / float(denominator)
+        return float(text.replace(",", "."))
+    except (ValueError, ZeroDivisionError):
+        return 1
+
+
+def parse_requested_items(text: str) -> List[RequestedItem]:
+    """Requested items from the extracted grocery list lines of text"""
+    items = []
+    seen = set()
+    for line in text.splitlines():
+        item_text = list_item_text(line)
+        if item_text is None:
+            continue
+        quantity, unit, name = split_quantity(item_text)
+        if not name or name.lower() in seen:
+            continue
+        seen.add(name.lower())
+        items.append(RequestedItem(name=name, quantity=parse_quantity(quantity), unit=unit))
+    return items
+
+
+def search_terms(items: List[RequestedItem]) -> List[str]:
+    """Names to search for, plus singular forms (the search matches substrings)"""
+    terms = []
+    for item in items:
+        for term in (item.name, item.name[:-1] if item.name.lower().endswith("s") else None):
+            if term and term.lower() not in (existing.lower() for existing in terms):
+                terms.append(term)
+    return terms
+
+
+def parse_products(tool_text: str) -> List[Dict[str, Any]]:
+    """Products from the text of a catalog tool result
+
+    The gateway returns the Lambda response ({"statusCode": ..., "body": "<json>"});
+    a bare JSON list is accepted too.
+    """
+    try:
+        data = json.loads(tool_text)
+    except ValueError:
+        return []
+    if isinstance(data, dict):
+        body = data.get("body", [])
+        data = json.loads(body) if isinstance(body, str) else body
+    return [product for product in data if isinstance(product, dict) and "product_name" in product] \
+        if isinstance(data, list) else []
+
+
+def availability(quantity: float, stock_level: float) -> str:
+    if stock_level <= 0:
+        return OUT_OF_STOCK
+    if stock_level >= quantity:
+        return AVAILABLE
+    return PARTIAL
+
+
+def match_item(item: RequestedItem, products: List[Dict[str, Any]]) -> ItemMatch:
+    """Match an item to exactly one product, or record the candidates if ambiguous"""
+    name = item.name.lower()
+    exact = [product for product in products if product["product_name"].lower() == name]
+    candidates = exact or [product for product in products if name in product["product_name"].lower()]
+    if not candidates and name.endswith("s"):
+        candidates = [product for product in products if name[:-1] in product["product_name"].lower()]
+
+    match = ItemMatch(item=item, candidates=candidates)
+    if len(candidates) == 1:
+        match.product = candidates[0]
+        match.status = availability(item.quantity, candidates[0].get("stock_level", 0))
+    return match
+
+
+def choose_alternative(match: ItemMatch, catalogue: List[Dict[str, Any]],
+                       exclude: List[str]) -> Optional[Dict[str, Any]]:
+    """In-stock product of the same category, preferring shared words, then the lowest price"""
+    category = match.product.get("product_category")
+    words = set(match.product["product_name"].lower().split())
+    options = [
+        product
+        for product in catalogue
+        if product.get("product_category") == category
+        and product.get("stock_level", 0) > 0
+        and product["product_name"] not in exclude
+    ]
+    if not options:
+        return None
+    return min(options, key=lambda product: (-len(words & set(product["product_name"].lower().split())),
+                                             product.get("price", 0)))
+
+
+def format_money(amount: float) -> str:
+    return f"${amount:,.2f}"
+
+
+def format_options(customer_id: str, matches: List[ItemMatch]) -> str:
+    """Render the options message in the catalog agent's output format"""
+    available = [match for match in matches if match.status in (AVAILABLE, PARTIAL)]
+    out_of_stock = [match for match in matches if match.status == OUT_OF_STOCK]
+    not_found = [match for match in matches if match.status == NOT_FOUND]
+
+    def order_line(product, item, quantity):
+        return f"• {product['product_name']} ({item.quantity_text(quantity)}) - {format_money(product['price'] * quantity)}"
+
+    lines = [f"Customer ID: {customer_id}", "", "Hi! Here's what we have for you:", ""]
+
+    option_1 = []
+    for match in available:
+        quantity = min(match.item.quantity, match.product.get("stock_level", 0))
+        option_1.append((order_line(match.product, match.item, quantity), match.product["price"] * quantity))
+
+    if available:
+        lines.append(f"✅ Available now ({len(available)} items):")
+        for match, (line, _) in zip(available, option_1):
+            if match.status == PARTIAL:
+                line += f" ⚠️ only {match.item.quantity_text(match.product.get('stock_level', 0))} of " \
+                        f"{match.item.quantity_text()} in stock"
+            lines.append(line)
+        lines.append("")
+
+    option_2 = list(option_1)
+    if out_of_stock:
+        lines.append("❌ Out of stock:")
+        for match in out_of_stock:
+            lines.append(f"• {match.product['product_name']} ({match.item.quantity_text()})")
+            if match.alternative:
+                quantity = min(match.item.quantity, match.alternative.get("stock_level", 0))
+                lines.append(f"  Alternative: {match.alternative['product_name']} - "
+                             f"{format_money(match.alternative['price'])}")
+                option_2.append((order_line(match.alternative, match.item, quantity),
+                                 match.alternative["price"] * quantity))
+        lines.append("")
+
+    if not_found:
+        lines.append("❓ Not in our catalogue:")
+        lines.extend(f"• {match.item.name} ({match.item.quantity_text()})" for match in not_found)
+        lines.append("")
+
+    lines.append("---")
+    lines.append("")
+    for title, option in (("OPTION 1 - Available items only", option_1),
+                          ("OPTION 2 - Available items + alternatives", option_2)):
+        lines.append(title)
+        lines.extend(line for line, _ in option)
+        lines.append(f"Total: {format_money(sum(amount for _, amount in option))}")
+        lines.append("")
+
+    lines.append('Reply "Option 1" or "Option 2" to confirm your order.')
+    return "\n".join(lines)
@@ -1,22 +1,32 @@
 import os
 import logging
 import atexit
+import asyncio
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from strands import Agent
 from strands.models import BedrockModel
 from strands.tools.mcp.mcp_client import MCPClient
-from strands_tools import image_reader
 from mcp.client.streamable_http import streamablehttp_client
-from bedrock_agentcore_starter_toolkit.operations.gateway.client import GatewayClient
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
 import json
 import pathlib
 import boto3
-from strands.multiagent import GraphBuilder
 import yaml
-
-# OpenTelemetry imports for tracing
-from arize.otel import register
-from openinference.instrumentation.bedrock import BedrockInstrumentor
+import metrics
+from routing import classify_request, PATH_IMAGE, PATH_CACHED_IMAGE, PATH_DOCUMENT, PATH_ORDER
+from agent_pool import AgentPool
+from admission import AdmissionController, AdmissionRejected
+from session_memory import SessionMemory
+from tool_cache import ToolResultCache, wrap_tools
+from startup import StartupTimer, is_worker_process
+from gateway_session import GatewaySession, GatewayTool
+from image_cache import ImageResultCache, dhash
+from model_guard import GuardedModel, create_limiters
+from model_fallback import FallbackModel
+from model_profiles import build_inference_profile
 
 BASE_DIR = pathlib.Path(__file__).absolute().parent
 
@@ -27,6 +37,9 @@ if not logger.handlers:
 
 # Load model configuration
 MODEL_CONFIG = None
+MODEL_CONFIG_MTIME = None
+model_config_checked_at = 0.0
+model_config_lock = threading.Lock()
 OTEL_CONFIG = None
 TRACER_PROVIDER = None
 AWS_REGION = None
@@ -46,11 +59,20 @@ def get_aws_region() -> str:
 
 
 def load_model_config() -> Dict[str, Any]:
-    """Load model configuration from region-specific YAML file"""
-    global MODEL_CONFIG
+    """Load model configuration from region-specific YAML file
+
+    With runtime.config_reload_interval set, the file's modification time is
+    checked at most once per interval and a changed file is reloaded; the
+    agents' inference profiles are applied to the shared models (see
+    apply_inference_profiles).
+    """
+    global MODEL_CONFIG, MODEL_CONFIG_MTIME, model_config_checked_at
 
     if MODEL_CONFIG is not None:
-        return MODEL_CONFIG
+        reload_interval = MODEL_CONFIG.get("runtime", {}).get("config_reload_interval", 0)
+        if not reload_interval or time.monotonic() - model_config_checked_at < reload_interval:
+            return MODEL_CONFIG
+        return reload_model_config()
 
     region = get_aws_region()
 
@@ -59,8 +81,11 @@ def load_model_config() -> Dict[str, Any]:
 
     try:
         if region_config_path.exists():
-            with open(region_config_path, "r") as f:
-                MODEL_CONFIG = yaml.safe_load(f)
+            with model_config_lock:
+                MODEL_CONFIG_MTIME = region_config_path.stat().st_mtime
+                model_config_checked_at = time.monotonic()
+                with open(region_config_path, "r") as f:
+                    MODEL_CONFIG = yaml.safe_load(f)
             logger.info(f"Loaded region-specific model configuration from {region_config_path}")
             return MODEL_CONFIG
         else:
@@ -71,6 +96,40 @@ def load_model_config() -> Dict[str, Any]:
         raise
 
 
+def reload_model_config() -> Dict[str, Any]:
+    """Reload the model configuration if its file changed since it was loaded
+
+    A file that fails to parse is logged and ignored; the previous
+    configuration stays in effect.
+    """
+    global MODEL_CONFIG, MODEL_CONFIG_MTIME, model_config_checked_at
+
+    region_config_path = BASE_DIR / f"model_config.{get_aws_region()}.yaml"
+
+    with model_config_lock:
+        model_config_checked_at = time.monotonic()
+        try:
+            mtime = region_config_path.stat().st_mtime
+            if mtime == MODEL_CONFIG_MTIME:
+                return MODEL_CONFIG
+            with open(region_config_path, "r") as f:
+                config = yaml.safe_load(f)
+            if not isinstance(config, dict) or not isinstance(config.get("agents"), dict):
+                raise ValueError("missing 'agents' section")
+        except Exception as e:
+            metrics.increment("model_config.reload_failures")
+            logger.error(f"Error reloading model config, keeping the previous configuration: {e}")
+            return MODEL_CONFIG
+
+        MODEL_CONFIG = config
+        MODEL_CONFIG_MTIME = mtime
+
+    metrics.increment("model_config.reloads")
+    logger.info(f"Reloaded model configuration from {region_config_path}")
+    apply_inference_profiles()
+    return MODEL_CONFIG
+
+
 def load_otel_config() -> Dict[str, Any]:
     """Load OpenTelemetry configuration from YAML file"""
     global OTEL_CONFIG
@@ -129,6 +188,10 @@ def initialize_otel_tracing():
             print("[OTel] Tracing disabled - configuration contains placeholder values")
             return None
 
+        # Tracing dependencies are only imported when tracing is configured
+        from arize.otel import register
+        from openinference.instrumentation.bedrock import BedrockInstrumentor
+
         # Register with Arize
         print("[OTel] Initializing tracing with Arize...")
         TRACER_PROVIDER = register(
@@ -151,16 +214,57 @@ def initialize_otel_tracing():
         return None
 
 
+# Node that produces the final user-facing response in every graph
+TERMINAL_NODE = "respond"
+
+# Maximum size of a text chunk in a streamed response (WhatsApp text body limit)
+STREAM_CHUNK_CHARS = 4096
+
 # Global state
 bedrock_model = None
-mcp_client = None
+gateway_session = None  # MCP gateway session, reconnected with a fresh token before expiry
 mcp_tools = None
-mcp_client_started = False  # Track if MCP client session is active
-catalog_agent = None
-order_agent = None
-wm_agent = None
-image_processor_agent = None
-orchestrator_agent = None
+tool_cache = None
+
+# Shared across all agent sets: Bedrock model clients, MCP tools and prompts per agent
+agent_models = {}
+model_limiters = {}  # Bulkhead limiter of each agent's model (empty when model_limits is disabled)
+tier_models = {}  # Model of each tier for agents with a tiering policy
+tiering_policies = {}
+agent_tools = {}
+agent_prompts = {}
+agent_pool = None
+session_memory = None
+image_cache = None
+agents_init_lock = threading.Lock()
+admission = None
+admission_lock = threading.Lock()
+
+# System prompt file for each agent (keyed by model_config agent name)
+AGENT_PROMPT_FILES = {
+    "orchestrator": "prompts/router.md",
+    "catalog": "prompts/catalog.md",
+    "order": "prompts/order.md",
+    "warehouse": "prompts/wm.md",
+    "image_processor": "prompts/image_processor.md",
+}
+
+# Reply for requests rejected by admission control when the model config sets none
+DEFAULT_BUSY_MESSAGE = "We're busy right now. Please try again in a minute."
+
+# Reply when a graph run ends without output from the terminal node
+NO_RESPONSE_MESSAGE = "Sorry, something went wrong while handling your message. Please try again."
+
+# Token usage fields recorded per graph node (Bedrock reports cached input separately from inputTokens)
+USAGE_METRICS = {
+    "inputTokens": "input_uncached",
+    "cacheReadInputTokens": "input_cache_read",
+    "cacheWriteInputTokens": "input_cache_write",
+    "outputTokens": "output",
+}
+
+# System prompt of the LLM terminal node (graph.relay_mode "llm"), which uses the orchestrator model
+RELAY_PROMPT_FILE = "prompts/relay.md"
 
 
 def create_streamable_http_transport(mcp_url: str, access_token: str):
@@ -186,76 +290,131 @@ def get_full_tools_list(client):
     return tools
 
 
-def load_mcp_tools(tool_filter=None):
+def get_tool_cache_config() -> Dict[str, Any]:
+    """Tool result cache settings (tool_cache section of the model config)"""
+    return load_model_config().get("tool_cache", {})
+
+
+def get_tool_cache() -> ToolResultCache:
+    """Return the process-wide MCP tool result cache"""
+    global tool_cache
+
+    if tool_cache is None:
+        tool_cache = ToolResultCache(max_entries=get_tool_cache_config().get("max_entries", 1000))
+    return tool_cache
+
+
+def fetch_gateway_credentials(timer: StartupTimer):
+    """Fetch the MCP gateway URL and an access token
+
+    The gateway id and URL are independent SSM parameters and are fetched in
+    parallel; the client secret depends on the gateway id, and the token on
+    the client secret.
+
+    Args:
+        timer: Startup timer recording each step
+
+    Returns:
+        Tuple of (gateway_url, access token provider, first access token)
+    """
+    region = get_aws_region()
+
+    # Fetch gateway configuration from SSM Parameter Store
+    session = boto3.Session()
+    ssm_client = session.client("ssm")
+    secrets_client = session.client("secretsmanager")
+
+    def get_parameter(name):
+        return ssm_client.get_parameter(Name=name)["Parameter"]["Value"]
+
+    parameters = timer.run_parallel(
+        {
+            "ssm_gateway_id": lambda: get_parameter("/order-assistant/gateway-id"),
+            "ssm_gateway_url": lambda: get_parameter("/order-assistant/gateway-url"),
+        }
+    )
+    gateway_id = parameters["ssm_gateway_id"]
+    gateway_url = parameters["ssm_gateway_url"]
+    logger.info(f"Retrieved gateway_id from SSM: {gateway_id}")
+    logger.info(f"Retrieved gateway_url from SSM: {gateway_url}")
+
+    # Get client_info from Secrets Manager
+    with timer.step("gateway_secret"):
+        secret_name = f"agentcore/gateway/{gateway_id}/client-info"
+        response = secrets_client.get_secret_value(SecretId=secret_name)
+        client_info = json.loads(response["SecretString"])
+    logger.info(f"Retrieved client_info from Secrets Manager: {secret_name}")
+
+    from bedrock_agentcore_starter_toolkit.operations.gateway.client import GatewayClient
+
+    gateway_client = GatewayClient(region_name=region)
+
+    def get_access_token():
+        return gateway_client.get_access_token_for_cognito(client_info)
+
+    # Get access token
+    logger.info("Getting access token for MCP gateway...")
+    with timer.step("access_token"):
+        access_token = get_access_token()
+    logger.info("✓ Access token obtained")
+
+    return gateway_url, get_access_token, access_token
+
+
+def load_mcp_tools(tool_filter=None, timer: Optional[StartupTimer] = None):
     """Load MCP tools from AgentCore Gateway
 
     Args:
         tool_filter: Optional list of tool name prefixes to filter (e.g., ['PostgreSQLMCPTarget___query'] for PostgreSQL)
+        timer: Optional startup timer recording each step
     """
-    global mcp_tools, mcp_client, mcp_client_started
+    global mcp_tools, gateway_session
 
     # Return cached tools if no filter is specified and we have cached tools
     if mcp_tools is not None and tool_filter is None:
         return mcp_tools
 
-    try:
-        # Only initialize MCP client once
-        if mcp_client is None or not mcp_client_started:
-            # Get region from AWS session
-            region = get_aws_region()
-
-            # Fetch gateway configuration from SSM Parameter Store
-            session = boto3.Session()
-            ssm_client = session.client("ssm")
+    timer = timer or StartupTimer("mcp_startup")
 
-            gateway_id_response = ssm_client.get_parameter(
-                Name="/order-assistant/gateway-id"
-            )
-            gateway_id = gateway_id_response["Parameter"]["Value"]
-            logger.info(f"Retrieved gateway_id from SSM: {gateway_id}")
-
-            gateway_url_response = ssm_client.get_parameter(
-                Name="/order-assistant/gateway-url"
-            )
-            gateway_url = gateway_url_response["Parameter"]["Value"]
-            logger.info(f"Retrieved gateway_url from SSM: {gateway_url}")
-
-            # Get client_info from Secrets Manager
-            secrets_client = session.client("secretsmanager")
-            secret_name = f"agentcore/gateway/{gateway_id}/client-info"
-            response = secrets_client.get_secret_value(SecretId=secret_name)
-            client_info = json.loads(response["SecretString"])
-            logger.info(f"Retrieved client_info from Secrets Manager: {secret_name}")
-
-            # Get access token
-            logger.info("Getting access token for MCP gateway...")
-            gateway_client = GatewayClient(region_name=region)
-            access_token = gateway_client.get_access_token_for_cognito(client_info)
-            logger.info("✓ Access token obtained")
+    try:
+        # Only initialize the gateway session once; it refreshes its own token
+        if gateway_session is None or not gateway_session.started:
+            gateway_url, get_access_token, access_token = fetch_gateway_credentials(timer)
 
             # Setup MCP client and keep it alive globally
             logger.info(f"Connecting to MCP gateway: {gateway_url}")
 
-            # Clean up existing client if present
-            if mcp_client is not None and mcp_client_started:
+            # Clean up existing session if present
+            if gateway_session is not None:
                 try:
-                    logger.info("Cleaning up existing MCP client session")
-                    mcp_client.__exit__(None, None, None)
-                    mcp_client_started = False
+                    logger.info("Cleaning up existing MCP gateway session")
+                    gateway_session.close()
                 except Exception as e:
-                    logger.warning(f"Error cleaning up existing MCP client: {e}")
-
-            mcp_client = MCPClient(
-                lambda: create_streamable_http_transport(gateway_url, access_token)
+                    logger.warning(f"Error cleaning up existing MCP gateway session: {e}")
+
+            gateway_config = load_model_config().get("gateway", {})
+            session = GatewaySession(
+                token_provider=get_access_token,
+                client_factory=lambda token: MCPClient(lambda: create_streamable_http_transport(gateway_url, token)),
+                refresh_margin=gateway_config.get("token_refresh_margin", 300),
+                drain_timeout=gateway_config.get("drain_timeout", 120),
             )
-            # Start the client - it will stay alive for the lifetime of the application
-            mcp_client.__enter__()
-            mcp_client_started = True
+            with timer.step("mcp_connect"):
+                # The session stays alive for the lifetime of the application
+                session.start(access_token)
+            gateway_session = session
             logger.info("✓ MCP client connected and active")
 
         # Get all tools from the MCP client
         if mcp_tools is None:
-            all_tools = get_full_tools_list(mcp_client)
+            with timer.step("mcp_list_tools"):
+                with gateway_session.acquire() as client:
+                    all_tools = get_full_tools_list(client)
+            # Call tools through the current session so token refreshes are transparent
+            tool_timeout = load_model_config().get("gateway", {}).get("tool_timeout")
+            all_tools = [GatewayTool(tool, gateway_session, timeout=tool_timeout) for tool in all_tools]
+            # Serve repeated read-only lookups from the cross-request result cache
+            all_tools = wrap_tools(all_tools, get_tool_cache(), get_tool_cache_config().get("ttls", {}))
             mcp_tools = all_tools
             logger.info(f"Loaded {len(all_tools)} MCP tools")
         else:
@@ -281,22 +440,28 @@ def load_mcp_tools(tool_filter=None):
         return []
 
 
-def create_bedrock_model(agent_name: str) -> BedrockModel:
-    """Create a BedrockModel for a specific agent
-
-    Args:
-        agent_name: Name of the agent (e.g., 'orchestrator', 'catalog', 'order', 'warehouse', 'image_processor')
-    """
+def inference_profile(agent_name: str) -> Dict[str, Any]:
+    """Model settings of an agent from agents.<name> in the model config (see model_profiles)"""
     config = load_model_config()
 
     # Get agent-specific config
     if agent_name not in config.get("agents", {}):
         raise ValueError(f"No configuration found for agent '{agent_name}' in model_config.yaml")
 
-    agent_config = config["agents"][agent_name]
+    return build_inference_profile(agent_name, config["agents"][agent_name])
 
-    # Read directly from config
-    model_id = agent_config.get("model_id")
+
+def create_bedrock_model(agent_name: str, model_id: Optional[str] = None) -> BedrockModel:
+    """Create a BedrockModel for a specific agent
+
+    Args:
+        agent_name: Name of the agent (e.g., 'orchestrator', 'catalog', 'order', 'warehouse', 'image_processor')
+        model_id: Model to use with the agent's inference profile instead of its model_id (for fallbacks)
+    """
+    profile = inference_profile(agent_name)
+    if model_id is not None:
+        profile["model_id"] = model_id
+    model_id = profile["model_id"]
 
     # Get region from AWS session
     region = get_aws_region()
@@ -304,8 +469,8 @@ def create_bedrock_model(agent_name: str) -> BedrockModel:
     try:
         logger.info(f"Creating Bedrock model for '{agent_name}' agent using model: {model_id}")
         model = BedrockModel(
-            model_id=model_id,
             region_name=region,
+            **profile,
         )
         logger.info(f"'{agent_name}' agent created with model: {model_id}")
         return model
@@ -314,15 +479,165 @@ def create_bedrock_model(agent_name: str) -> BedrockModel:
         raise
 
 
+def apply_inference_profiles() -> None:
+    """Apply the current inference profile of every agent to its shared model
+
+    Agents hold a reference to the shared model, so the new settings take
+    effect from their next model call without recreating any agent.
+    """
+    for agent_name, model in list(agent_models.items()):
+        try:
+            profile = inference_profile(agent_name)
+        except ValueError as e:
+            logger.error(f"Keeping the current settings of '{agent_name}': {e}")
+            continue
+        model.update_config(**profile)
+        settings = {key: value for key, value in profile.items() if value is not None}
+        logger.info(f"Applied inference profile of '{agent_name}': {settings}")
+
+        # Tier models keep their own model ID
+        profile.pop("model_id")
+        for tier_model in tier_models.get(agent_name, []):
+            if tier_model is not model:
+                tier_model.update_config(**profile)
+
+
+def create_agent_model(agent_name: str):
+    """Create the model an agent calls: its Bedrock model and any fallbacks
+
+    Each model of the chain runs within the agent's bulkhead limit when
+    model_limits is enabled (see model_guard). With agents.<name>.fallback_model_ids
+    or agents.<name>.hedge set, the chain is wrapped in a FallbackModel (see
+    model_fallback).
+    """
+    config = load_model_config()
+    agent_config = config["agents"][agent_name]
+
+    chain = []
+    for model_id in [None] + list(agent_config.get("fallback_model_ids") or []):
+        model = create_bedrock_model(agent_name, model_id)
+        if agent_name in model_limiters:
+            model = GuardedModel(model, model_limiters[agent_name])
+        chain.append(model)
+
+    if len(chain) == 1 and not agent_config.get("hedge", False):
+        return chain[0]
+
+    fallback_config = config.get("model_fallback", {})
+    logger.info(f"'{agent_name}' model chain: {len(chain)} model(s), hedging {agent_config.get('hedge', False)}")
+    return FallbackModel(
+        agent_name,
+        chain,
+        hedge=agent_config.get("hedge", False),
+        hedge_percentile=fallback_config.get("hedge_percentile", 0.95),
+        hedge_min_samples=fallback_config.get("hedge_min_samples", 20),
+        hedge_default_delay_ms=fallback_config.get("hedge_default_delay_ms", 5000),
+        hedge_min_delay_ms=fallback_config.get("hedge_min_delay_ms", 500),
+        hedge_max_rate=fallback_config.get("hedge_max_rate", 0.05),
+    )
+
+
+def create_agent_models(timer: StartupTimer) -> None:
+    """Create the model of every agent concurrently
+
+    With model_limits.enabled in the model config, each Bedrock model is
+    wrapped in a GuardedModel that limits concurrent calls per bulkhead (see
+    model_guard).
+    """
+    global model_limiters
+
+    logger.info("Initializing agents...")
+    limits_config = load_model_config().get("model_limits", {})
+    if limits_config.get("enabled", False):
+        model_limiters = create_limiters(limits_config, AGENT_PROMPT_FILES)
+
+    models = timer.run_parallel(
+        {f"model.{name}": (lambda name=name: create_agent_model(name)) for name in AGENT_PROMPT_FILES}
+    )
+    for agent_name in AGENT_PROMPT_FILES:
+        agent_models[agent_name] = models[f"model.{agent_name}"]
+
+    create_tier_models()
+
+
+def create_tier_models() -> None:
+    """Create the tier models of agents with a tiering policy (tiering section of the model config)
+
+    A tier whose model is the agent's own model reuses the agent's model
+    (including its fallbacks); other tiers get a Bedrock model with the
+    agent's inference profile, within the agent's bulkhead limit.
+    """
+    config = load_model_config()
+    tiering_config = config.get("tiering", {})
+    if not tiering_config.get("enabled", False):
+        return
+
+    from model_tiering import TieringPolicy, base_model_id
+
+    tiers = tiering_config.get("tiers", [])
+    tier_names = [tier["name"] for tier in tiers]
+    for agent_name, agent_config in (tiering_config.get("agents") or {}).items():
+        policy = TieringPolicy.from_config(tier_names, agent_config)
+        if not policy.can_change_tier:
+            # Tiering only escalates, so an agent on the top tier would pay the node's overhead for nothing
+            logger.warning(f"Tiering for '{agent_name}' has no tier above its base; using the plain agent node")
+            continue
+
+        models = []
+        for tier in tiers:
+            if tier["model_id"] == config["agents"][agent_name].get("model_id"):
+                models.append(agent_models[agent_name])
+                continue
+            model = create_bedrock_model(agent_name, tier["model_id"])
+            if agent_name in model_limiters:
+                model = GuardedModel(model, model_limiters[agent_name])
+            models.append(model)
+
+        tiering_policies[agent_name] = policy
+        base_model = base_model_id(tiers, agent_config)
+        if base_model != config["agents"][agent_name].get("model_id"):
+            logger.warning(f"Tiering moves simple '{agent_name}' requests to {base_model}")
+        tier_models[agent_name] = models
+        logger.info(f"Tiering for '{agent_name}': tiers {tier_names}, "
+                    f"base '{tier_names[tiering_policies[agent_name].base_tier]}'")
+
+
+def load_agent_prompts() -> None:
+    """Read the system prompt file of every agent"""
+    for agent_name, prompt_file in AGENT_PROMPT_FILES.items():
+        agent_prompts[agent_name] = (BASE_DIR / prompt_file).read_text()
+    agent_prompts["relay"] = (BASE_DIR / RELAY_PROMPT_FILE).read_text()
+
+
 def initialize_agents():
-    """Initialize the specialized agents with individual model configurations"""
-    global catalog_agent, order_agent, wm_agent, image_processor_agent, bedrock_model
+    """Initialize shared agent resources and the pool of per-request agent sets
 
-    # Initialize OpenTelemetry tracing
-    initialize_otel_tracing()
+    MCP tools, Bedrock models and system prompts are created once and shared;
+    the agents themselves are created per agent set by the pool.
+    """
+    global agent_pool, session_memory, image_cache
+
+    timer = StartupTimer()
+
+    # Independent startup work runs concurrently: the MCP gateway chain
+    # (SSM -> secret -> token -> connect -> list tools), Bedrock model clients,
+    # prompt files and tracing setup
+    with timer.step("config"):
+        load_model_config()
+    timer.run_parallel(
+        {
+            "otel": initialize_otel_tracing,
+            "mcp_tools": lambda: load_mcp_tools(timer=timer),
+            "models": lambda: create_agent_models(timer),
+            "prompts": load_agent_prompts,
+        }
+    )
+    if mcp_tools is None:
+        # Fail initialization so it is retried, rather than serving agents without tools
+        raise RuntimeError("MCP gateway tools could not be loaded")
 
     # Load custom PostgreSQL tools for product catalog
-    postgres_tools = load_mcp_tools(
+    agent_tools["catalog"] = load_mcp_tools(
         tool_filter=[
             "PostgreSQLMCPTarget___search_products_by_product_names",
             "PostgreSQLMCPTarget___list_product_catalogue",
@@ -330,7 +645,7 @@ def initialize_agents():
     )
 
     # Load custom DynamoDB tools for order management
-    order_tools = load_mcp_tools(
+    agent_tools["order"] = load_mcp_tools(
         tool_filter=[
             "DynamoDBMCPTarget___place_order",
             "DynamoDBMCPTarget___get_order",
@@ -339,7 +654,7 @@ def initialize_agents():
     )
 
     # Load DynamoDB tools for warehouse management and delivery slots
-    wm_tools = load_mcp_tools(
+    agent_tools["warehouse"] = load_mcp_tools(
         tool_filter=[
             "DynamoDBMCPTarget___scan_table",
             "DynamoDBMCPTarget___query_table",
@@ -351,178 +666,684 @@ def initialize_agents():
 
     # Import S3 tools from runtime/tools directory
     import sys
+    from strands_tools import image_reader
 
     sys.path.insert(0, str(BASE_DIR / "tools"))
     from s3_tools import download_image_from_s3
+    import image_preprocess
 
-    # Create agent-specific models
-    logger.info("Initializing agents...")
+    image_preprocess.configure(load_model_config().get("image_preprocessing", {}))
 
-    catalog_model = create_bedrock_model("catalog")
-    order_model = create_bedrock_model("order")
-    wm_model = create_bedrock_model("warehouse")
-    image_processor_model = create_bedrock_model("image_processor")
+    # Image processor extracts grocery lists from images using S3 + image_reader
+    agent_tools["image_processor"] = [download_image_from_s3, image_reader]
 
-    # Catalog Agent - searches product catalog with PostgreSQL access
-    catalog_agent = Agent(
-        system_prompt=(BASE_DIR / "prompts/catalog.md").read_text(),
-        tools=postgres_tools,
-        model=catalog_model,
-    )
-    logger.info("✓ Catalog agent initialized")
+    # Router only routes and relays - no tools
+    agent_tools["orchestrator"] = []
 
-    # Order Agent - handles order placement with custom DynamoDB tools
-    order_agent = Agent(
-        system_prompt=(BASE_DIR / "prompts/order.md").read_text(),
-        tools=order_tools,
-        model=order_model,
-    )
-    logger.info("✓ Order agent initialized")
+    runtime_config = load_model_config().get("runtime", {})
+    pool_size = runtime_config.get("agent_pool_size", 4)
+    agent_pool = AgentPool(AgentSet, pool_size)
 
-    # WM Agent - handles warehouse management and delivery scheduling with DynamoDB access
-    wm_agent = Agent(
-        system_prompt=(BASE_DIR / "prompts/wm.md").read_text(),
-        tools=wm_tools,
-        model=wm_model,
+    # Conversation history is kept per session, bounded, and swapped into pooled agents
+    memory_config = runtime_config.get("session_memory", {})
+    session_memory = SessionMemory(
+        max_sessions=memory_config.get("max_sessions", 200),
+        max_turns=memory_config.get("max_turns", 5),
+        max_tokens=memory_config.get("max_tokens", 20000),
+        max_total_bytes=memory_config.get("max_total_bytes", 16_000_000),
     )
-    logger.info("✓ Warehouse agent initialized")
 
-    # Image Processor Agent - extracts grocery lists from images using S3 + image_reader
-    image_processor_agent = Agent(
-        system_prompt=(BASE_DIR / "prompts/image_processor.md").read_text(),
-        tools=[download_image_from_s3, image_reader],
-        model=image_processor_model,
-    )
-    logger.info("✓ Image processor agent initialized")
-    logger.info("All agents initialized successfully")
+    # Grocery lists extracted from images, reused when a customer resends the same image
+    image_cache_config = load_model_config().get("image_cache", {})
+    if image_cache_config.get("enabled", False):
+        image_cache = ImageResultCache(
+            ttl_seconds=image_cache_config.get("ttl_seconds", 604800),
+            max_entries_per_customer=image_cache_config.get("max_entries_per_customer", 20),
+            max_customers=image_cache_config.get("max_customers", 5000),
+            max_distance=image_cache_config.get("max_hamming_distance", 4),
+        )
+    logger.info(f"All agents initialized successfully (agent pool size: {pool_size})")
+    timer.log_summary()
+
+
+def get_agent_pool() -> AgentPool:
+    """Return the agent pool, initializing shared agent resources on first use"""
+    if agent_pool is None:
+        with agents_init_lock:
+            if agent_pool is None:
+                initialize_agents()
+    return agent_pool
+
+
+def get_admission() -> AdmissionController:
+    """Return the admission controller, configured from the admission section of the model config"""
+    global admission
+
+    if admission is None:
+        with admission_lock:
+            if admission is None:
+                config = load_model_config()
+                admission_config = config.get("admission", {})
+                # By default admit as many requests as there are agent sets, so admitted
+                # requests never wait on the pool
+                max_concurrency = admission_config.get(
+                    "max_concurrency", config.get("runtime", {}).get("agent_pool_size", 4)
+                )
+                admission = AdmissionController(
+                    max_concurrency=max_concurrency,
+                    max_queue_size=admission_config.get("max_queue_size", 16),
+                    queue_timeout=admission_config.get("queue_timeout", 60),
+                    priorities=admission_config.get("priorities", {}),
+                    default_priority=admission_config.get("default_priority", 1),
+                )
+                logger.info(f"Admission control: {admission.stats()}")
+    return admission
+
+
+def admit_request(payload: dict):
+    """Admission slot for a request, classed by its payload action (unknown actions share one class)"""
+    controller = get_admission()
+    return controller.admit(controller.request_class(payload.get("action")))
+
+
+def busy_message() -> str:
+    """Reply for requests rejected by admission control (admission.busy_message in model config)"""
+    return load_model_config().get("admission", {}).get("busy_message", DEFAULT_BUSY_MESSAGE)
+
+
+def start_eager_init() -> None:
+    """Initialize agents on a background thread at container start
+
+    Enabled by runtime.eager_init in the model config. A request that arrives
+    while initialization is still running waits for it instead of starting a
+    second one. Never runs in multiprocessing workers, which only do CPU work.
+    """
+    if is_worker_process():
+        return
+    if not load_model_config().get("runtime", {}).get("eager_init", False):
+        return
 
+    def warm_up():
+        try:
+            get_agent_pool()
+        except Exception as e:
+            logger.error(f"Eager initialization failed, will retry on first request: {e}")
 
-def create_router_agent() -> Agent:
-    """Create router agent that routes requests and returns responses to user"""
-    router_model = create_bedrock_model("orchestrator")
+    logger.info("Starting eager agent initialization")
+    threading.Thread(target=warm_up, name="eager-init", daemon=True).start()
 
-    router = Agent(
-        system_prompt=(BASE_DIR / "prompts/router.md").read_text(),
-        model=router_model,
+
+def create_agent(agent_name: str) -> Agent:
+    """Create an agent from the shared model, tools and system prompt for agent_name"""
+    return Agent(
+        system_prompt=agent_prompts[agent_name],
+        tools=agent_tools[agent_name],
+        model=agent_models[agent_name],
     )
+
+
+def create_router_agent() -> Agent:
+    """Create router agent that returns a RouteDecision for each incoming request"""
+    router = create_agent("orchestrator")
     logger.info("✓ Router (orchestrator) agent initialized")
 
     return router
 
 
-def build_order_processing_graph():
+def create_relay_agent() -> Agent:
+    """Create the LLM terminal node that returns the last node's output to the user"""
+    relay = Agent(system_prompt=agent_prompts["relay"], tools=[], model=agent_models["orchestrator"])
+    logger.info("✓ Relay agent initialized")
+
+    return relay
+
+
+def create_terminal_node(agents):
+    """Create the terminal node that returns the final response to the user
+
+    By default this is a deterministic relay of the previous node's output.
+    Setting graph.relay_mode to "llm" in the model config keeps the previous
+    behaviour of relaying through the router model.
+    """
+    graph_config = load_model_config().get("graph", {})
+    relay_mode = graph_config.get("relay_mode", "passthrough")
+
+    if relay_mode == "llm":
+        # The router only routes, so the relay is a separate agent on the router's model
+        if agents.relay is None:
+            agents.relay = create_relay_agent()
+        logger.info("Terminal node: LLM relay")
+        return agents.relay
+
+    from graph_nodes import RelayNode
+
+    logger.info("Terminal node: passthrough relay")
+    return RelayNode(TERMINAL_NODE, templates=graph_config.get("relay_templates"))
+
+
+def find_tool(agent_name: str, tool_name: str):
+    """Return the tool of agent_name whose (possibly prefixed) name ends with tool_name, or None"""
+    return next((tool for tool in agent_tools.get(agent_name, []) if tool.tool_name.endswith(tool_name)), None)
+
+
+def create_image_node(agents):
+    """Create the image processor node of Path 1
+
+    With graph.image_path set to "pipelined" in the model config, catalog
+    searches start while the image processor is still extracting the list;
+    otherwise ("sequential", the default) the image processor agent is the node.
+    """
+    graph_config = load_model_config().get("graph", {})
+
+    if graph_config.get("image_path", "sequential") == "pipelined":
+        search_tool = find_tool("catalog", "search_products_by_product_names")
+        if search_tool is not None:
+            from graph_nodes import PipelinedImageNode
+
+            logger.info("Image node: pipelined extraction and catalog search")
+            return PipelinedImageNode(
+                agents.image_processor, search_tool, batch_size=graph_config.get("pipeline_batch_size", 5)
+            )
+        logger.warning("Catalog search tool not loaded, using sequential image path")
+
+    return agents.image_processor
+
+
+def create_tiered_node(agent, agent_name: str):
+    """Wrap an agent in a TieredAgentNode when the model config has a tiering policy for it"""
+    if agent_name not in tiering_policies:
+        return agent
+
+    from graph_nodes import TieredAgentNode
+    from model_tiering import VALIDATORS
+
+    logger.info(f"{agent_name.capitalize()} node: tiered models")
+    return TieredAgentNode(agent, agent_name, tier_models[agent_name], tiering_policies[agent_name],
+                           VALIDATORS[agent_name])
+
+
+def create_catalog_node(agents, mode=None):
+    """Create the catalog node of Path 1
+
+    graph.catalog_mode in the model config selects the implementation:
+    "agent" (default) uses the catalog agent; "deterministic" matches, checks
+    stock and prices in code and only asks the catalog agent about unresolved items.
+
+    Args:
+        agents: Agent set the node belongs to
+        mode: Override of graph.catalog_mode (used by the catalog benchmark)
+    """
+    mode = mode or load_model_config().get("graph", {}).get("catalog_mode", "agent")
+
+    if mode == "deterministic":
+        search_tool = find_tool("catalog", "search_products_by_product_names")
+        if search_tool is not None:
+            from graph_nodes import CatalogNode
+
+            logger.info("Catalog node: deterministic matching with agent fallback")
+            return CatalogNode(agents.catalog, search_tool, find_tool("catalog", "list_product_catalogue"))
+        logger.warning("Catalog search tool not loaded, using the catalog agent")
+
+    return create_tiered_node(agents.catalog, "catalog")
+
+
+def create_warehouse_node(agents):
+    """Create the warehouse node of Path 2
+
+    graph.warehouse_mode in the model config selects the implementation:
+    "agent" (default) uses the warehouse agent; "deterministic" looks up the
+    postcode and delivery slot directly and fills in the confirmation template,
+    using the warehouse agent only if a lookup fails.
+    """
+    graph_config = load_model_config().get("graph", {})
+
+    if graph_config.get("warehouse_mode", "agent") == "deterministic":
+        postcode_tool = find_tool("warehouse", "get_customer_postcode")
+        slots_tool = find_tool("warehouse", "get_available_delivery_slots")
+        if postcode_tool is not None and slots_tool is not None:
+            from graph_nodes import WarehouseNode
+
+            logger.info("Warehouse node: deterministic lookups with agent fallback")
+            return WarehouseNode(
+                agents.warehouse, postcode_tool, slots_tool, default_postcode=graph_config.get("default_postcode")
+            )
+        logger.warning("Warehouse tools not loaded, using the warehouse agent")
+
+    return agents.warehouse
+
+
+def create_delivery_lookup_node():
+    """Create the Path 2 branch that looks up delivery details in parallel with order placement
+
+    Returns None (sequential order → warehouse) unless graph.parallel_order_path
+    is enabled in the model config and the warehouse tools are loaded.
+    """
+    graph_config = load_model_config().get("graph", {})
+    if not graph_config.get("parallel_order_path", False):
+        return None
+
+    postcode_tool = find_tool("warehouse", "get_customer_postcode")
+    slots_tool = find_tool("warehouse", "get_available_delivery_slots")
+    if postcode_tool is None or slots_tool is None:
+        logger.warning("Warehouse tools not loaded, running Path 2 sequentially")
+        return None
+
+    from graph_nodes import DeliveryLookupNode
+
+    logger.info("Path 2: delivery lookup in parallel with order placement")
+    return DeliveryLookupNode(postcode_tool, slots_tool, default_postcode=graph_config.get("default_postcode"))
+
+
+class AgentSet:
+    """Agents for one in-flight request, plus the graphs compiled over them
+
+    Checked out from the agent pool for the duration of a request, so agent
+    conversation state and graph execution state are never shared between
+    concurrent executions. Graphs are compiled once per set and reused.
+    """
+
+    def __init__(self):
+        self.catalog = create_agent("catalog")
+        self.order = create_agent("order")
+        self.warehouse = create_agent("warehouse")
+        self.image_processor = create_agent("image_processor")
+        self.router = create_router_agent()
+        self.relay = None  # Created with the graphs when graph.relay_mode is "llm"
+        self.graphs = {}
+        logger.info("✓ Agent set initialized")
+
+    def conversation_agents(self) -> Dict[str, Agent]:
+        """Agents whose conversation history is kept per session"""
+        agents = {
+            "orchestrator": self.router,
+            "catalog": self.catalog,
+            "order": self.order,
+            "warehouse": self.warehouse,
+            "image_processor": self.image_processor,
+        }
+        if self.relay is not None:
+            agents["relay"] = self.relay
+        return agents
+
+    def get_graph(self, path=None):
+        """Return the graph for a workflow path, building it on first use
+
+        The graph topology is compiled once per agent set; each call to the
+        returned graph starts from a fresh GraphState, so invocations only pay
+        for execution.
+
+        Args:
+            path: Pre-classified workflow path (e.g. PATH_IMAGE), or None for the
+                  router-driven graph
+        """
+        variant = path or "router"
+
+        if variant not in self.graphs:
+            with metrics.timer("graph.build_ms"):
+                if path == PATH_IMAGE:
+                    self.graphs[variant] = build_image_path_graph(self)
+                elif path == PATH_CACHED_IMAGE:
+                    self.graphs[variant] = build_cached_image_graph(self)
+                elif path == PATH_DOCUMENT:
+                    self.graphs[variant] = build_document_graph(self)
+                else:
+                    self.graphs[variant] = build_order_processing_graph(self)
+            logger.info(f"✓ Order processing graph '{variant}' compiled and cached")
+
+        return self.graphs[variant]
+
+
+def build_image_path_graph(agents: AgentSet):
+    """Build the Path 1 graph used when the payload already identifies an image request
+
+    image_processor → catalog → respond [END]
+
+    The router LLM is skipped entirely; the terminal node relays the catalog options.
+    """
+    from strands.multiagent import GraphBuilder
+
+    builder = GraphBuilder()
+
+    builder.add_node(create_image_node(agents), "image_processor")
+    builder.add_node(create_catalog_node(agents), "catalog")
+    builder.add_node(create_terminal_node(agents), TERMINAL_NODE)
+
+    builder.set_entry_point("image_processor")
+
+    builder.add_edge("image_processor", "catalog")
+    builder.add_edge("catalog", TERMINAL_NODE)  # Relay options to user
+
+    builder.set_execution_timeout(300)  # 5 minutes
+    builder.set_max_node_executions(10)  # Prevent infinite loops
+
+    logger.info("Graph built for pre-classified image path")
+    return builder.build()
+
+
+def build_cached_image_graph(agents: AgentSet):
+    """Build the Path 1 graph for an image whose grocery list is already cached
+
+    catalog → respond [END]
+
+    The graph prompt is the cached extracted list, without catalog search
+    results, so stock and prices are always looked up for this request.
+    """
+    from strands.multiagent import GraphBuilder
+
+    builder = GraphBuilder()
+
+    builder.add_node(create_catalog_node(agents), "catalog")
+    builder.add_node(create_terminal_node(agents), TERMINAL_NODE)
+
+    builder.set_entry_point("catalog")
+
+    builder.add_edge("catalog", TERMINAL_NODE)  # Relay options to user
+
+    builder.set_execution_timeout(300)  # 5 minutes
+    builder.set_max_node_executions(10)  # Prevent infinite loops
+
+    logger.info("Graph built for cached image path")
+    return builder.build()
+
+
+def build_document_graph(agents: AgentSet):
+    """Build the Path 1 graph for PDF documents
+
+    document → catalog → respond [END]
+
+    The document node reads the PDF's text layer locally and only uses the
+    image processor agent for scanned pages.
+    """
+    from strands.multiagent import GraphBuilder
+    from graph_nodes import DocumentNode
+
+    builder = GraphBuilder()
+
+    builder.add_node(DocumentNode(agents.image_processor), "document")
+    builder.add_node(create_catalog_node(agents), "catalog")
+    builder.add_node(create_terminal_node(agents), TERMINAL_NODE)
+
+    builder.set_entry_point("document")
+
+    builder.add_edge("document", "catalog")
+    builder.add_edge("catalog", TERMINAL_NODE)  # Relay options to user
+
+    builder.set_execution_timeout(300)  # 5 minutes
+    builder.set_max_node_executions(10)  # Prevent infinite loops
+
+    logger.info("Graph built for PDF document path")
+    return builder.build()
+
+
+def build_order_processing_graph(agents: AgentSet):
     """Build a graph with two workflow paths:
 
     Path 1 (New Order - Image):
-        router (routing) → image_processor → catalog → router (return) [END]
-        Router returns catalog options to user
+        router (routing) → image_processor → catalog → respond [END]
+        Terminal node returns catalog options to user
+        (image_processor pipelines catalog searches when graph.image_path is "pipelined")
 
     Path 2 (User Confirmation):
-        router (routing) → order → warehouse → router (return) [END]
-        Router returns final order confirmation with delivery details to user
-    """
-    global catalog_agent, order_agent, wm_agent, image_processor_agent
+        router (routing) → order → warehouse → respond [END]
+        Terminal node returns final order confirmation with delivery details to user
+        With graph.parallel_order_path, delivery_lookup runs alongside order:
+        router → {order, delivery_lookup} → warehouse (joins both) → respond [END]
 
-    # Initialize agents first
-    if catalog_agent is None:
-        initialize_agents()
-
-    # Create router agent
-    router = create_router_agent()
-    logger.info("Router agent created")
+    Anything else (questions, unclear messages):
+        router (reply) → respond [END]
 
+    The router returns a validated RouteDecision (see routing.RouteDecision);
+    edge conditions read its path instead of scanning the router's text.
+    """
     # Create graph builder
+    from strands.multiagent import GraphBuilder
+    from graph_nodes import RouterNode
+
     builder = GraphBuilder()
 
     # Add all nodes
+    router = RouterNode(agents.router)
     builder.add_node(router, "router")
-    builder.add_node(image_processor_agent, "image_processor")
-    builder.add_node(catalog_agent, "catalog")
-    builder.add_node(order_agent, "order")
-    builder.add_node(wm_agent, "warehouse")
+    builder.add_node(create_image_node(agents), "image_processor")
+    builder.add_node(create_catalog_node(agents), "catalog")
+    builder.add_node(create_tiered_node(agents.order, "order"), "order")
+    builder.add_node(create_warehouse_node(agents), "warehouse")
+    delivery_lookup = create_delivery_lookup_node()
+    if delivery_lookup is not None:
+        builder.add_node(delivery_lookup, "delivery_lookup")
+    builder.add_node(create_terminal_node(agents), TERMINAL_NODE)
     logger.info("Graph nodes added")
 
     # Set entry point
     builder.set_entry_point("router")
 
+    # Conditions read the router's parsed decision, evaluated once per router completion
+    def routed_to(path):
+        def condition(state):
+            return router.decision is not None and router.decision.path == path
+        condition.__name__ = f"routed_to_{path}"
+        return condition
+
+    is_image_request = routed_to(PATH_IMAGE)
+    is_order_request = routed_to(PATH_ORDER)
+
+    def not_routed(state):
+        """Router output that starts neither workflow path (replies, or no usable decision)"""
+        return not (is_image_request(state) or is_order_request(state))
+
     # Path 1: Image flow (router → image_processor → catalog)
-    def is_image_request(result):
-        """Check if this is an image processing request"""
-        # Extract just the router's latest output from GraphState.results
-        router_output = ""
+    builder.add_edge("router", "image_processor", condition=is_image_request)
+    builder.add_edge("image_processor", "catalog")
+    builder.add_edge("catalog", TERMINAL_NODE)  # Relay options to user
 
-        if hasattr(result, 'results') and 'router' in result.results:
-            router_result = result.results['router']
-            if hasattr(router_result, 'result'):
-                agent_result = router_result.result
-                if hasattr(agent_result, 'message'):
-                    message = agent_result.message
-                    # Message is a dict with structure: {'role': 'assistant', 'content': [{'text': '...'}]}
-                    if isinstance(message, dict) and 'content' in message and len(message['content']) > 0:
-                        router_output = str(message['content'][0].get('text', ''))
+    # Path 2: Confirmation flow (router → order → warehouse)
+    builder.add_edge("router", "order", condition=is_order_request)
 
-        # Fallback to string conversion if extraction failed
-        if not router_output:
-            router_output = str(result)
+    if delivery_lookup is not None:
+        # Delivery details don't depend on the placed order: look them up in a parallel
+        # branch and join both branches at the warehouse node
+        def order_branches_done(state):
+            """Join condition: warehouse starts once both Path 2 branches have completed"""
+            completed = {node.node_id for node in state.completed_nodes}
+            return {"order", "delivery_lookup"} <= completed
 
-        result_str = router_output.lower()
-        is_image = "route_to_image" in result_str
+        builder.add_edge("router", "delivery_lookup", condition=is_order_request)
+        builder.add_edge("order", "warehouse", condition=order_branches_done)
+        builder.add_edge("delivery_lookup", "warehouse", condition=order_branches_done)
+    else:
+        builder.add_edge("order", "warehouse")
+    builder.add_edge("warehouse", TERMINAL_NODE)  # Relay final confirmation to user
 
-        if is_image:
-            logger.info("Router routing to image processor (Path 1)")
+    # Anything else: the router's reply goes straight to the user
+    builder.add_edge("router", TERMINAL_NODE, condition=not_routed)
 
-        return is_image
+    # Set execution limits
+    builder.set_execution_timeout(300)  # 5 minutes
+    builder.set_max_node_executions(10)  # Prevent infinite loops
 
-    builder.add_edge("router", "image_processor", condition=is_image_request)
-    builder.add_edge("image_processor", "catalog")
-    builder.add_edge("catalog", "router")  # Return to router to relay options to user
+    logger.info("Graph built with two workflow paths")
+    return builder.build()
 
-    # Path 2: Confirmation flow (router → order → warehouse)
-    def is_order_request(result):
-        """Check if this is a user confirmation for order placement"""
-        # Extract just the router's latest output from GraphState.results
-        router_output = ""
 
-        # Extract just the router's latest output from GraphState.results
-        if hasattr(result, 'results') and 'router' in result.results:
-            router_result = result.results['router']
-            if hasattr(router_result, 'result'):
-                agent_result = router_result.result
-                if hasattr(agent_result, 'message'):
-                    message = agent_result.message
-                    # Message is a dict with structure: {'role': 'assistant', 'content': [{'text': '...'}]}
-                    if isinstance(message, dict) and 'content' in message and len(message['content']) > 0:
-                        router_output = str(message['content'][0].get('text', ''))
+def get_pool_timeout():
+    """Seconds a request waits for a free agent set (runtime.agent_pool_timeout in model config)"""
+    return load_model_config().get("runtime", {}).get("agent_pool_timeout", 120)
 
-        # Fallback to string conversion if extraction failed
-        if not router_output:
-            router_output = str(result)
 
-        result_str = router_output.lower()
+@contextmanager
+def checkout_agents(payload: dict):
+    """Check out an agent set loaded with the conversation history of the payload's session
 
-        # Router outputs order details with "Selected Option" and "Items to Order"
-        # Must NOT contain "route_to_image" to avoid confusion with Path 1
-        has_order_keywords = "selected option" in result_str and "items to order" in result_str
-        has_total_and_customer = "total amount" in result_str and "customer id" in result_str
-        is_not_image_route = "route_to_image" not in result_str
+    The session is the AgentCore runtime session when available, otherwise the
+    customer. The agents' trimmed history is stored back when the block exits.
+    """
+    pool = get_agent_pool()
+    session_key = payload.get("session_id") or payload.get("customer_id") or "anonymous"
 
-        is_order = (has_order_keywords or has_total_and_customer) and is_not_image_route
+    with pool.checkout(timeout=get_pool_timeout()) as agents:
+        conversation = agents.conversation_agents()
+        session_memory.load(session_key, conversation)
+        try:
+            yield agents
+        finally:
+            session_memory.save(session_key, conversation)
+
+
+def build_graph_prompt(payload: dict) -> str:
+    """Build the minimal structured prompt the graph's entry node receives"""
+    customer_id = payload.get("customer_id", "")
+    action = payload.get("action", "")
+    message = payload.get("message", "")
+    grocery_list = payload.get("grocery_list", [])
+    s3_bucket = payload.get("s3_bucket")
+    s3_key = payload.get("s3_key")
+    instruction = payload.get("instruction", "")
+    catalog_options = payload.get("catalog_options", "")
+
+    # Build minimal structured prompt - let orchestrator decide routing
+    prompt_parts = []
+
+    if customer_id:
+        prompt_parts.append(f"Customer ID: {customer_id}")
+
+    # Just provide the data - orchestrator will decide what to do
+    if action == "TEXT_MESSAGE" and message:
+        prompt_parts.append(f"User Message: {message}")
+    elif s3_bucket and s3_key:
+        prompt_parts.append(f"S3 Bucket: {s3_bucket}")
+        prompt_parts.append(f"S3 Key: {s3_key}")
+    elif grocery_list:
+        items_text = "\n".join(grocery_list)
+        prompt_parts.append(f"Grocery List:\n{items_text}")
+    elif instruction:
+        prompt_parts.append(instruction)
+
+    # Include catalog options if available (for Path 2)
+    if catalog_options:
+        prompt_parts.append(f"Catalog Options:\n{catalog_options}")
+
+    return "\n\n".join(prompt_parts)
+
+
+def classify_path(payload: dict):
+    """Pre-classify the workflow path, skipping the router when the path is known"""
+    # Decide the path from the payload when possible to skip the router's entry call
+    path = classify_request(payload)
+    if path:
+        metrics.increment("router.fast_path")
+    else:
+        metrics.increment("router.llm_path")
+    return path
+
+
+def image_cache_key(payload: dict):
+    """Return (customer_id, sha256, perceptual hash) identifying the payload's image
+
+    The perceptual hash needs the image itself, so it is only computed when
+    image_cache.perceptual_hash is enabled.
+    """
+    customer_id = payload.get("customer_id") or "anonymous"
+    sha256 = payload.get("image_sha256")
+    phash = None
 
-        if is_order:
-            logger.info("Router routing to order placement (Path 2)")
+    if load_model_config().get("image_cache", {}).get("perceptual_hash", False):
+        try:
+            from s3_tools import s3_client
 
-        return is_order
+            response = s3_client.get_object(Bucket=payload["s3_bucket"], Key=payload["s3_key"])
+            with metrics.timer("image_cache.dhash_ms"):
+                phash = dhash(response["Body"].read())
+        except Exception as e:
+            logger.warning(f"Could not compute perceptual hash of image: {e}")
 
-    builder.add_edge("router", "order", condition=is_order_request)
-    builder.add_edge("order", "warehouse")
-    builder.add_edge("warehouse", "router")  # Return to router to relay final confirmation to user
+    return customer_id, sha256, phash
 
-    # Set execution limits
-    builder.set_execution_timeout(300)  # 5 minutes
-    builder.set_max_node_executions(10)  # Prevent infinite loops
 
-    logger.info("Graph built with two workflow paths")
-    return builder.build()
+def prepare_graph_request(payload: dict):
+    """Choose the workflow path and build the graph prompt for a request
+
+    Image requests whose grocery list is cached take the catalog-only path,
+    with the cached list as the prompt; the catalog node then searches the
+    catalog afresh.
+
+    Returns:
+        Tuple of (path, prompt, image cache key or None)
+    """
+    path = classify_path(payload)
+
+    if path == PATH_IMAGE and image_cache is not None:
+        key = image_cache_key(payload)
+        cached = image_cache.get(*key)
+        if cached:
+            from graph_nodes import extracted_list
+
+            # Entries cached before search results were stripped may still carry them
+            return PATH_CACHED_IMAGE, extracted_list(cached), None
+        return path, build_graph_prompt(payload), key
+
+    return path, build_graph_prompt(payload), None
+
+
+def store_image_result(key, result) -> None:
+    """Cache the extracted list of a completed image path run
+
+    Only the list is cached: the catalog search results appended by the
+    pipelined image node carry stock and prices, which must be looked up
+    again whenever the list is reused.
+    """
+    from graph_nodes import extracted_list, node_text
+    from strands.multiagent.base import Status
+
+    node_result = result.results.get("image_processor") if result is not None else None
+    if key is None or node_result is None or node_result.status != Status.COMPLETED:
+        return
+
+    text = extracted_list(node_text(node_result))
+    if text:
+        customer_id, sha256, phash = key
+        image_cache.put(customer_id, text, sha256=sha256, phash=phash)
+
+
+def record_token_usage(result) -> None:
+    """Record each graph node's token usage, separating cached from uncached input
+
+    Counters are tokens.<node>.<field> (see USAGE_METRICS); the share of a
+    node's input read from the prompt cache is observed as
+    tokens.<node>.cache_hit_pct.
+    """
+    for node_id, node_result in getattr(result, "results", {}).items():
+        usage = node_result.accumulated_usage or {}
+        for field, name in USAGE_METRICS.items():
+            if usage.get(field):
+                metrics.increment(f"tokens.{node_id}.{name}", usage[field])
+
+        total_input = sum(usage.get(field, 0) for field in ("inputTokens", "cacheReadInputTokens",
+                                                             "cacheWriteInputTokens"))
+        if total_input:
+            metrics.observe(f"tokens.{node_id}.cache_hit_pct",
+                            100 * usage.get("cacheReadInputTokens", 0) / total_input)
+
+
+def extract_response_text(result) -> str:
+    """Extract the terminal node's message from a graph result"""
+    from graph_nodes import node_text, clean_agent_text
+
+    try:
+        text = node_text(result.results.get(TERMINAL_NODE))
+        if text:
+            # Strip <thinking> blocks once here so callers receive clean text
+            text = clean_agent_text(text)
+            logger.info(f"Successfully extracted terminal node message ({len(text)} chars)")
+            return text
+
+        # No path reached the terminal node; never send the raw graph result to the customer
+        logger.error(f"Graph ended without a terminal node message (completed: {list(result.results)})")
+
+    except Exception as e:
+        logger.error(f"Error extracting message from result: {e}")
+
+    metrics.increment("graph.missing_response")
+    return NO_RESPONSE_MESSAGE
 
 
 def process_grocery_list(payload: dict) -> str:
@@ -537,78 +1358,32 @@ def process_grocery_list(payload: dict) -> str:
             - s3_bucket: S3 bucket name (optional, for image processing)
             - s3_key: S3 object key (optional, for image processing)
             - instruction: Additional instruction text (optional)
+            - image_sha256: WhatsApp media hash of the image (optional, for the image cache)
+            - mime_type: MIME type of the S3 object (optional, application/pdf takes the document path)
+
+    Returns:
+        The response text, or the busy message if admission control rejected the request
     """
     try:
-        # Build the graph
-        graph = build_order_processing_graph()
-
-        # Build prompt with customer_id and action-specific content
-        customer_id = payload.get("customer_id", "")
-        action = payload.get("action", "")
-        message = payload.get("message", "")
-        grocery_list = payload.get("grocery_list", [])
-        s3_bucket = payload.get("s3_bucket")
-        s3_key = payload.get("s3_key")
-        instruction = payload.get("instruction", "")
-        catalog_options = payload.get("catalog_options", "")
-
-        # Build minimal structured prompt - let orchestrator decide routing
-        prompt_parts = []
-
-        if customer_id:
-            prompt_parts.append(f"Customer ID: {customer_id}")
-
-        # Just provide the data - orchestrator will decide what to do
-        if action == "TEXT_MESSAGE" and message:
-            prompt_parts.append(f"User Message: {message}")
-        elif s3_bucket and s3_key:
-            prompt_parts.append(f"S3 Bucket: {s3_bucket}")
-            prompt_parts.append(f"S3 Key: {s3_key}")
-        elif grocery_list:
-            items_text = "\n".join(grocery_list)
-            prompt_parts.append(f"Grocery List:\n{items_text}")
-        elif instruction:
-            prompt_parts.append(instruction)
-
-        # Include catalog options if available (for Path 2)
-        if catalog_options:
-            prompt_parts.append(f"Catalog Options:\n{catalog_options}")
-
-        prompt = "\n\n".join(prompt_parts)
-
-        logger.info(f"Executing graph with prompt:\n{prompt}")
-
-        # Execute the graph
-        result = graph(prompt)
+        # Wait for an admission slot, then execute the graph on a checked-out agent set
+        # (reusing its compiled graph)
+        with admit_request(payload):
+            with checkout_agents(payload) as agents:
+                path, prompt, image_key = prepare_graph_request(payload)
+                logger.info(f"Executing graph with prompt:\n{prompt}")
+
+                graph = agents.get_graph(path)
+                with metrics.timer("graph.execution_ms"):
+                    result = graph(prompt)
+                store_image_result(image_key, result)
+                record_token_usage(result)
 
         logger.info("Graph execution completed")
 
-        # Extract the router node's message from the result
-        try:
-            # result is a GraphResult object with results dict
-            if hasattr(result, 'results') and 'router' in result.results:
-                router_result = result.results['router']
-                # Navigate: NodeResult -> result -> message -> content -> text
-                if hasattr(router_result, 'result'):
-                    agent_result = router_result.result
-                    if hasattr(agent_result, 'message'):
-                        message = agent_result.message
-                        # message is a dict: {'role': 'assistant', 'content': [{'text': '...'}]}
-                        if isinstance(message, dict) and 'content' in message:
-                            content = message['content']
-                            if content and isinstance(content, list) and len(content) > 0:
-                                text = content[0].get('text', '')
-                                if text:
-                                    logger.info(f"Successfully extracted router message ({len(text)} chars)")
-                                    return text
-
-            # Fallback if extraction fails
-            logger.warning("Could not extract router message, returning string representation")
-            return str(result)
+        return extract_response_text(result)
 
-        except Exception as e:
-            logger.error(f"Error extracting message from result: {e}")
-            return str(result)
+    except AdmissionRejected:
+        return busy_message()
 
     except Exception as e:
         logger.error(f"Error processing grocery list: {e}")
@@ -617,32 +1392,137 @@ def process_grocery_list(payload: dict) -> str:
         return f"Error: {str(e)}"
 
 
+def split_response_text(text: str, max_chars: int = STREAM_CHUNK_CHARS) -> List[str]:
+    """Split a response into chunks of at most max_chars, preferring paragraph and line breaks"""
+    chunks = []
+    while len(text) > max_chars:
+        cut = text.rfind("\n\n", 0, max_chars)
+        if cut <= 0:
+            cut = text.rfind("\n", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        chunks.append(text[:cut])
+        text = text[cut:]
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+def stream_grocery_list(payload: dict) -> Iterator[Dict[str, Any]]:
+    """Process a grocery list and yield events as the graph progresses
+
+    Runs the graph on a worker thread and yields:
+        - {"type": "progress", "node": <node_id>} when a node starts
+        - {"type": "text", "text": <chunk>} for each chunk of the final response, as
+          soon as the terminal node completes (before the graph's bookkeeping, the
+          image cache update and the agent set's return to the pool)
+        - {"type": "done", "length": <chars>} once the request is complete
+        - {"type": "busy", "message": <text>} if admission control rejected the request
+        - {"type": "error", "message": <text>} if processing fails
+
+    Args:
+        payload: Same as process_grocery_list
+    """
+    from graph_nodes import clean_agent_text, node_text
+    from strands.multiagent.base import Status
+
+    events = queue.Queue()
+    done = object()
+    sent = []  # Response text already emitted
+
+    def send_text(text: str) -> None:
+        for chunk in split_response_text(text):
+            events.put({"type": "text", "text": chunk})
+        sent.append(text)
+
+    async def run_graph(graph, prompt):
+        result = None
+        async for event in graph.stream_async(prompt):
+            event_type = event.get("type")
+            if event_type == "multiagent_node_start":
+                events.put({"type": "progress", "node": event.get("node_id")})
+            elif event_type == "multiagent_node_stop" and event.get("node_id") == TERMINAL_NODE:
+                node_result = event.get("node_result")
+                if node_result is not None and node_result.status == Status.COMPLETED:
+                    text = clean_agent_text(node_text(node_result))
+                    if text:
+                        send_text(text)
+            elif "result" in event:
+                result = event["result"]
+        return result
+
+    def worker():
+        try:
+            with admit_request(payload):
+                with checkout_agents(payload) as agents:
+                    path, prompt, image_key = prepare_graph_request(payload)
+                    logger.info(f"Executing graph (streaming) with prompt:\n{prompt}")
+
+                    graph = agents.get_graph(path)
+                    with metrics.timer("graph.execution_ms"):
+                        result = asyncio.run(run_graph(graph, prompt))
+                    store_image_result(image_key, result)
+                    record_token_usage(result)
+
+            logger.info("Graph execution completed")
+            if not sent:
+                send_text(extract_response_text(result))
+            events.put({"type": "done", "length": len(sent[0])})
+
+        except AdmissionRejected:
+            events.put({"type": "busy", "message": busy_message()})
+
+        except Exception as e:
+            logger.error(f"Error processing grocery list: {e}")
+            import traceback
+            traceback.print_exc()
+            if sent:
+                # The customer already has the response; only the bookkeeping after it failed
+                events.put({"type": "done", "length": len(sent[0])})
+            else:
+                events.put({"type": "error", "message": f"Error: {str(e)}"})
+        finally:
+            events.put(done)
+
+    threading.Thread(target=worker, name="graph-stream", daemon=True).start()
+
+    while True:
+        event = events.get()
+        if event is done:
+            return
+        yield event
+
+
 def health_check() -> Dict[str, Any]:
     """Health check for the agent system"""
-    return {
-        "orchestrator_ready": orchestrator_agent is not None,
-        "catalog_ready": catalog_agent is not None,
-        "order_ready": order_agent is not None,
-        "wm_ready": wm_agent is not None,
-        "image_processor_ready": image_processor_agent is not None,
-        "bedrock_model_ready": bedrock_model is not None,
-    }
+    status = {f"{name}_ready": name in agent_models for name in AGENT_PROMPT_FILES}
+    status.update(
+        {
+            "mcp_client_ready": gateway_session is not None and gateway_session.started,
+            "agent_pool": agent_pool.stats() if agent_pool is not None else None,
+            "admission": admission.stats() if admission is not None else None,
+            "model_limiters": {
+                limiter.name: limiter.stats() for limiter in model_limiters.values()
+            },
+            "session_memory": session_memory.stats() if session_memory is not None else None,
+            "image_cache": image_cache.stats() if image_cache is not None else None,
+            "tool_cache_entries": tool_cache.size() if tool_cache is not None else None,
+            "metrics": metrics.snapshot(),
+        }
+    )
+    return status
 
 
 def cleanup_mcp_client():
     """Clean up MCP client resources"""
-    global mcp_client, mcp_client_started
-
     try:
-        if mcp_client is not None and mcp_client_started:
+        if gateway_session is not None and gateway_session.started:
             logger.info("Cleaning up MCP client session")
             try:
-                mcp_client.__exit__(None, None, None)
+                gateway_session.close()
                 logger.info("✓ MCP client session closed")
             except Exception as e:
                 logger.error(f"Error closing MCP client session: {e}")
-            finally:
-                mcp_client_started = False
     except Exception as e:
         logger.error(f"Error during MCP client cleanup: {e}")
 
@@ -0,0 +1,282 @@
+"""MCP gateway session with proactive token refresh and transparent reconnect
+
+The gateway authenticates with a Cognito access token passed as a header when
+the MCP session is opened, so a session stops working once its token expires.
+GatewaySession tracks the token's expiry, opens a new MCP session with a fresh
+token shortly before it lapses and swaps it in; the previous session is closed
+only after the tool calls still running on it have finished. GatewayTool calls
+the tool through whichever session is current and, on an authentication
+error, reconnects and retries the call once.
+"""
+import asyncio
+import base64
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional
+
+from strands.types._events import ToolResultEvent
+from strands.types.tools import AgentTool
+
+import metrics
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+# Assumed lifetime of a token without an exp claim (Cognito access token default)
+DEFAULT_TOKEN_LIFETIME = 3600
+
+# Delay before retrying a failed background refresh
+REFRESH_RETRY_SECONDS = 30
+
+# HTTP statuses of a rejected or expired token
+AUTH_STATUS_CODES = {401, 403}
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """Return the exp claim (epoch seconds) of a JWT, or None if it cannot be read
+
+    The signature is not verified; the claim is only used to schedule refresh.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def error_status(result: Dict[str, Any]) -> Optional[int]:
+    """HTTP status carried by a tool result's structured (JSON) error content, or None
+
+    Reads statusCode, status or code at the top level or under error.
+    """
+    for item in result.get("content", []):
+        payload = item.get("json")
+        if payload is None and "text" in item:
+            try:
+                payload = json.loads(item["text"])
+            except (TypeError, ValueError):
+                continue
+        if not isinstance(payload, dict):
+            continue
+
+        error = payload.get("error")
+        fields = [payload, error] if isinstance(error, dict) else [payload]
+        for field in fields:
+            for key in ("statusCode", "status", "code"):
+                value = field.get(key)
+                if isinstance(value, int) and not isinstance(value, bool):
+                    return value
+                if isinstance(value, str) and value.isdigit():
+                    return int(value)
+    return None
+
+
+def is_auth_error(result: Dict[str, Any], token_expired: bool = False) -> bool:
+    """Whether a tool result failed because the gateway rejected the token
+
+    Decided by the structured status of the error. Transport failures carry
+    none, so they count as auth errors only if the session's token had
+    already expired (token_expired).
+    """
+    if result.get("status") != "error":
+        return False
+    status = error_status(result)
+    if status is not None:
+        return status in AUTH_STATUS_CODES
+    return token_expired
+
+
+class GatewaySession:
+    """Owns the current MCP client and replaces it before its token expires
+
+    Args:
+        token_provider: Returns a new access token
+        client_factory: Creates an (unstarted) MCPClient for an access token
+        refresh_margin: Seconds before expiry at which the token is refreshed
+        drain_timeout: Seconds to wait for in-flight calls before closing a replaced client
+    """
+
+    def __init__(self, token_provider: Callable[[], str], client_factory: Callable[[str], Any],
+                 refresh_margin: float = 300, drain_timeout: float = 120):
+        self.token_provider = token_provider
+        self.client_factory = client_factory
+        self.refresh_margin = refresh_margin
+        self.drain_timeout = drain_timeout
+        self.client = None
+        self.expires_at: Optional[float] = None
+        self._in_flight: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        self._refresh_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+
+    @property
+    def started(self) -> bool:
+        return self.client is not None and not self._closed
+
+    def token_expired(self) -> bool:
+        """Whether the current session's token is past its expiry"""
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+    def start(self, access_token: Optional[str] = None) -> None:
+        """Open the first MCP session (with access_token if already fetched)"""
+        self._connect(access_token or self.token_provider())
+
+    def _connect(self, access_token: str) -> None:
+        """Open a session with access_token, swap it in and retire the previous one"""
+        client = self.client_factory(access_token)
+        client.__enter__()
+
+        expires_at = token_expiry(access_token) or time.time() + DEFAULT_TOKEN_LIFETIME
+        with self._lock:
+            previous = self.client
+            self.client = client
+            self.expires_at = expires_at
+        metrics.set_gauge("gateway.token_ttl_s", round(expires_at - time.time()))
+        logger.info(f"✓ MCP gateway session active (token valid for {expires_at - time.time():.0f}s)")
+
+        self._schedule_refresh(max(expires_at - time.time() - self.refresh_margin, 0))
+        if previous is not None:
+            threading.Thread(target=self._drain, args=(previous,), name="mcp-drain", daemon=True).start()
+
+    def _schedule_refresh(self, delay: float) -> None:
+        if self._closed:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            metrics.increment("gateway.token_refresh_failures")
+            logger.error(f"MCP gateway token refresh failed, retrying in {REFRESH_RETRY_SECONDS}s: {e}")
+            self._schedule_refresh(REFRESH_RETRY_SECONDS)
+
+    def refresh(self, failed_client: Any = None) -> None:
+        """Fetch a new token and switch to a new MCP session
+
+        Args:
+            failed_client: Client whose call was rejected. If another caller has
+                already replaced it, no further refresh is done.
+        """
+        with self._refresh_lock:
+            if self._closed or (failed_client is not None and failed_client is not self.client):
+                return
+
+            start = time.perf_counter()
+            self._connect(self.token_provider())
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+        metrics.increment("gateway.token_refreshes")
+        metrics.observe("gateway.reconnect_ms", elapsed_ms)
+        logger.info(f"MCP gateway session refreshed in {elapsed_ms:.0f}ms")
+
+    def _drain(self, client: Any) -> None:
+        """Close a replaced client once its in-flight calls have finished"""
+        key = id(client)
+        with self._lock:
+            finished = self._drained.wait_for(lambda: self._in_flight.get(key, 0) == 0, timeout=self.drain_timeout)
+        if not finished:
+            logger.warning(f"Closing replaced MCP session with calls still in flight after {self.drain_timeout}s")
+        try:
+            client.__exit__(None, None, None)
+        except Exception as e:
+            logger.warning(f"Error closing replaced MCP session: {e}")
+
+    @contextmanager
+    def acquire(self):
+        """Yield the current client, counting the call as in flight on it"""
+        with self._lock:
+            client = self.client
+            key = id(client)
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        try:
+            yield client
+        finally:
+            with self._lock:
+                self._in_flight[key] -= 1
+                if not self._in_flight[key]:
+                    del self._in_flight[key]
+                    self._drained.notify_all()
+
+    def close(self) -> None:
+        """Stop refreshing and close the current session"""
+        self._closed = True
+        if self._timer is not None:
+            self._timer.cancel()
+        with self._lock:
+            client, self.client = self.client, None
+        if client is not None:
+            client.__exit__(None, None, None)
+
+
+class GatewayTool(AgentTool):
+    """MCP tool that calls through the current GatewaySession client
+
+    Args:
+        tool: MCP tool as listed by the gateway (provides the name and spec)
+        session: Gateway session owning the current client
+        timeout: Seconds a call may wait for its result, unless the tool sets its own timeout
+    """
+
+    def __init__(self, tool: AgentTool, session: GatewaySession, timeout: Optional[float] = None):
+        super().__init__()
+        self.tool = tool
+        self.session = session
+        self.timeout = getattr(tool, "timeout", None)
+        if self.timeout is None and timeout:
+            self.timeout = timedelta(seconds=timeout)
+
+    @property
+    def tool_name(self) -> str:
+        return self.tool.tool_name
+
+    @property
+    def tool_spec(self):
+        return self.tool.tool_spec
+
+    @property
+    def tool_type(self) -> str:
+        return self.tool.tool_type
+
+    async def _call(self, tool_use) -> tuple:
+        with self.session.acquire() as client:
+            try:
+                result = await client.call_tool_async(
+                    tool_use_id=tool_use["toolUseId"],
+                    name=self.tool.mcp_tool.name,
+                    arguments=tool_use.get("input"),
+                    read_timeout_seconds=self.timeout,
+                )
+            except Exception as e:
+                result = {
+                    "toolUseId": tool_use["toolUseId"],
+                    "status": "error",
+                    "content": [{"text": f"Tool execution failed: {e}"}],
+                }
+        return client, result
+
+    async def stream(self, tool_use, invocation_state, **kwargs):
+        client, result = await self._call(tool_use)
+
+        if is_auth_error(result, token_expired=self.session.token_expired()):
+            logger.warning(f"Gateway rejected '{self.tool_name}' call, reconnecting and retrying")
+            metrics.increment("gateway.auth_retries")
+            try:
+                await asyncio.to_thread(self.session.refresh, client)
+            except Exception as e:
+                logger.error(f"MCP gateway reconnect failed: {e}")
+            else:
+                _, result = await self._call(tool_use)
+
+        yield ToolResultEvent(result)
@@ -0,0 +1,717 @@
+"""Deterministic (code-driven) nodes for the order processing graph
+
+These nodes plug into strands GraphBuilder like agents do, but produce their
+output in code instead of calling a model (or call one only as a fallback).
+"""
+import asyncio
+import json
+import logging
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from strands.agent.agent_result import AgentResult
+from strands.multiagent.base import MultiAgentBase, MultiAgentResult, NodeResult, Status
+from strands.telemetry.metrics import EventLoopMetrics
+
+import metrics
+from grocery_items import product_name
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+# Prefix the graph adds to each dependency output: "  - Agent: <text>"
+_DEPENDENCY_PREFIX = re.compile(r"^\s*- [^:\n]*: ", re.DOTALL)
+_DEPENDENCY_HEADER = re.compile(r"^\s*From (\S+):\s*$")
+
+# Structured fields of the graph prompt (see build_graph_prompt in core)
+_PROMPT_FIELD = re.compile(r"^(Customer ID|S3 Bucket|S3 Key): *(.+?)\s*$", re.MULTILINE)
+
+# Header of the catalog search results the pipelined image node appends to the extracted list
+SEARCH_RESULTS_HEADER = "Catalog search results"
+
+
+def clean_agent_text(text: str) -> str:
+    """Remove <thinking> blocks and collapse blank lines in model output"""
+    text = re.sub(r"<thinking>.*?</thinking>", "", text, flags=re.DOTALL)
+    text = re.sub(r"</?thinking>", "", text)
+    return re.sub(r"\n\s*\n\s*\n", "\n\n", text).strip()
+
+
+def extracted_list(text: str) -> str:
+    """The extracted list of an image processor output, without any catalog search results"""
+    return text.split(f"\n\n{SEARCH_RESULTS_HEADER}", 1)[0].strip()
+
+
+def node_text(node_result) -> str:
+    """Extract the text output of a graph node result (agent or nested multi-agent)"""
+    if node_result is None:
+        return ""
+
+    texts = []
+    for agent_result in node_result.get_agent_results():
+        message = agent_result.message
+        if isinstance(message, dict):
+            for block in message.get("content", []):
+                if block.get("text"):
+                    texts.append(block["text"])
+    return "\n".join(texts)
+
+
+def parse_node_input(task) -> Tuple[str, Dict[str, str]]:
+    """Split the input the graph builds for a node into the original task and dependency outputs
+
+    The graph passes non-entry nodes a list of content blocks:
+    "Original Task: ...", "Inputs from previous nodes:", then "From <node_id>:"
+    followed by one "  - Agent: <text>" block per result of that node.
+
+    Returns:
+        Tuple of (original task text, {node_id: output text})
+    """
+    if isinstance(task, str):
+        return task, {}
+
+    original_parts = []
+    inputs: Dict[str, list] = {}
+    current = None
+    in_task = False
+
+    for block in task:
+        text = block.get("text") if isinstance(block, dict) else None
+        if text is None:
+            continue
+
+        if text.startswith("Original Task:"):
+            in_task = True
+            rest = text[len("Original Task:"):].strip()
+            if rest:
+                original_parts.append(rest)
+            continue
+
+        if text.strip() == "Inputs from previous nodes:":
+            in_task = False
+            continue
+
+        header = _DEPENDENCY_HEADER.match(text)
+        if header:
+            in_task = False
+            current = header.group(1)
+            inputs.setdefault(current, [])
+            continue
+
+        if current is not None:
+            inputs[current].append(_DEPENDENCY_PREFIX.sub("", text, count=1))
+        elif in_task or not inputs:
+            original_parts.append(text)
+
+    return "\n".join(original_parts), {k: "\n".join(v) for k, v in inputs.items()}
+
+
+def node_prompt(original_task: str, inputs: Dict[str, str]) -> str:
+    """Rebuild a prompt for an agent called from a function node"""
+    parts = [original_task] + [f"From {node_id}:\n{text}" for node_id, text in inputs.items()]
+    return "\n\n".join(part for part in parts if part)
+
+
+async def call_tool(tool, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Call an agent tool directly (outside an agent loop) and return its ToolResult"""
+    tool_use = {"toolUseId": f"direct-{uuid.uuid4().hex}", "name": tool.tool_name, "input": arguments}
+    result = {"toolUseId": tool_use["toolUseId"], "status": "error", "content": [{"text": "Tool returned no result"}]}
+    async for event in tool.stream(tool_use, {}):
+        if isinstance(event, dict) and "tool_result" in event:
+            result = event["tool_result"]
+    return result
+
+
+def tool_result_text(result: Dict[str, Any]) -> str:
+    return "\n".join(item["text"] for item in result.get("content", []) if "text" in item)
+
+
+def text_result(node_id: str, text: str, execution_time: int = 0,
+                usage: Optional[Dict[str, int]] = None) -> MultiAgentResult:
+    """Wrap plain text as the result of a custom graph node
+
+    Args:
+        usage: Tokens used by any model calls the node made (counted in the graph's usage)
+    """
+    usage = usage or {"inputTokens": 0, "outputTokens": 0, "totalTokens": 0}
+    agent_result = AgentResult(
+        stop_reason="end_turn",
+        message={"role": "assistant", "content": [{"text": text}]},
+        metrics=EventLoopMetrics(),
+        state={},
+    )
+    return MultiAgentResult(
+        status=Status.COMPLETED,
+        results={
+            node_id: NodeResult(
+                result=agent_result,
+                execution_time=execution_time,
+                status=Status.COMPLETED,
+                accumulated_usage=dict(usage),
+            )
+        },
+        accumulated_usage=dict(usage),
+        execution_count=1,
+        execution_time=execution_time,
+    )
+
+
+class FunctionNode(MultiAgentBase):
+    """Base class for graph nodes whose output is computed in code
+
+    Subclasses implement run(), which receives the original task and the
+    outputs of the upstream nodes and returns the node's text. Nodes that call
+    an agent report its token usage with add_usage().
+    """
+
+    def __init__(self, node_id: str):
+        super().__init__()
+        self.node_id = node_id
+        self.usage = {"inputTokens": 0, "outputTokens": 0, "totalTokens": 0,
+                      "cacheReadInputTokens": 0, "cacheWriteInputTokens": 0}
+
+    def add_usage(self, agent_result) -> None:
+        """Add the token usage of an agent call made by this node"""
+        usage = agent_result.metrics.accumulated_usage
+        for key in self.usage:
+            self.usage[key] += usage.get(key, 0)
+
+    async def run(self, original_task: str, inputs: Dict[str, str], invocation_state: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    async def invoke_async(self, task, invocation_state: Optional[Dict[str, Any]] = None, **kwargs) -> MultiAgentResult:
+        start = time.time()
+        self.usage = {key: 0 for key in self.usage}
+        original_task, inputs = parse_node_input(task)
+        text = await self.run(original_task, inputs, invocation_state or {})
+        return text_result(self.node_id, text, round((time.time() - start) * 1000), self.usage)
+
+
+class RelayNode(FunctionNode):
+    """Terminal node that returns the previous node's output to the user without a model call
+
+    Output is rendered from a per-source template ({text} is the upstream
+    output, already stripped of <thinking> blocks).
+    """
+
+    DEFAULT_TEMPLATE = "{text}"
+
+    def __init__(self, node_id: str = "respond", templates: Optional[Dict[str, str]] = None):
+        super().__init__(node_id)
+        self.templates = templates or {}
+
+    async def run(self, original_task: str, inputs: Dict[str, str], invocation_state: Dict[str, Any]) -> str:
+        if not inputs:
+            logger.warning("Relay node received no upstream output")
+            return ""
+
+        # The terminal node has a single active upstream edge per path
+        source, text = next(iter(inputs.items()))
+        template = self.templates.get(source, self.DEFAULT_TEMPLATE)
+        logger.info(f"Relaying output of '{source}' ({len(text)} chars)")
+        return template.format(text=clean_agent_text(text))
+
+
+class RouterNode(FunctionNode):
+    """Entry node that asks the router agent for a validated RouteDecision
+
+    The decision is parsed once per run and kept on the node, so the graph's
+    edge conditions read decision.path instead of scanning the router's text.
+    The node's text output is what the next node on the chosen path receives.
+    """
+
+    FALLBACK_REPLY = (
+        "Sorry, I couldn't work out what you'd like to do. Send a photo or PDF of your "
+        'grocery list, or reply "Option 1" or "Option 2" to confirm an order.'
+    )
+
+    def __init__(self, router_agent, node_id: str = "router"):
+        super().__init__(node_id)
+        self.router_agent = router_agent
+        self.decision = None
+
+    async def run(self, original_task: str, inputs: Dict[str, str], invocation_state: Dict[str, Any]) -> str:
+        from routing import PATH_REPLY, RouteDecision
+
+        self.decision = None
+        try:
+            result = await self.router_agent.invoke_async(
+                node_prompt(original_task, inputs), structured_output_model=RouteDecision
+            )
+            self.add_usage(result)
+            self.decision = result.structured_output
+        except Exception as e:
+            logger.warning(f"Router returned no valid decision: {e}")
+
+        if self.decision is None:
+            metrics.increment("router.structured_output_failures")
+            self.decision = RouteDecision(path=PATH_REPLY, reply=self.FALLBACK_REPLY)
+
+        metrics.increment(f"router.decisions.{self.decision.path}")
+        logger.info(f"Router decision: {self.decision.path}")
+        return self.decision.to_text()
+
+
+class DocumentNode(FunctionNode):
+    """Entry node for PDF requests that reads the document's text layer locally
+
+    Replaces the image processor on the document path. Pages with a text layer
+    are extracted without a model call; only scanned pages are sent to the
+    vision agent. A PDF whose text layer cannot be read at all (encrypted,
+    corrupt, or no pages) goes to the vision agent as a whole. The output
+    follows the image processor's format so the catalog node consumes it
+    unchanged.
+    """
+
+    def __init__(self, vision_agent, node_id: str = "document"):
+        super().__init__(node_id)
+        self.vision_agent = vision_agent
+
+    async def render_pages(self, data: bytes, indices: List[int]) -> Optional[List[Dict[str, Any]]]:
+        """Image blocks of the given pages, or None if they cannot be rendered"""
+        import image_preprocess
+        import pdf_text
+
+        if not pdf_text.can_render():
+            logger.warning("pypdfium2 is not installed, sending the whole PDF to the vision agent")
+            return None
+
+        try:
+            images = await asyncio.to_thread(pdf_text.render_pages, data, indices)
+        except Exception as e:
+            logger.warning(f"Could not render scanned PDF pages ({e}), sending the whole PDF to the vision agent")
+            return None
+
+        processed = await asyncio.gather(*(image_preprocess.preprocess_image_async(image, "jpeg") for image in images))
+        return [{"image": {"format": fmt, "source": {"bytes": image}}} for image, fmt in processed]
+
+    async def read_scanned_pages(self, customer_id: str, data: bytes, indices: Optional[List[int]] = None) -> str:
+        """Extract the grocery list from scanned pages (the whole PDF if indices is None) with the vision agent"""
+        blocks = await self.render_pages(data, indices) if indices else None
+        if blocks is None:
+            blocks = [{"document": {"format": "pdf", "name": "grocery-list", "source": {"bytes": data}}}]
+            prompt = f"Customer ID: {customer_id}\n\nExtract the grocery list from the attached customer's PDF."
+        else:
+            pages = ", ".join(str(index + 1) for index in indices)
+            prompt = (
+                f"Customer ID: {customer_id}\n\n"
+                f"Extract the grocery list from the attached scanned page(s) {pages} of the customer's PDF."
+            )
+        result = await self.vision_agent.invoke_async([{"text": prompt}, *blocks])
+        self.add_usage(result)
+        return clean_agent_text(str(result))
+
+    async def run(self, original_task: str, inputs: Dict[str, str], invocation_state: Dict[str, Any]) -> str:
+        import pdf_text
+        from s3_tools import s3_client
+
+        fields = dict(_PROMPT_FIELD.findall(original_task))
+        customer_id = fields.get("Customer ID", "")
+
+        response = await asyncio.to_thread(
+            s3_client.get_object, Bucket=fields["S3 Bucket"], Key=fields["S3 Key"]
+        )
+        data = await asyncio.to_thread(response["Body"].read)
+        try:
+            pages = await asyncio.to_thread(pdf_text.extract_text_pages, data)
+        except Exception as e:
+            logger.warning(f"Could not read the PDF text layer ({e}), sending the whole PDF to the vision agent")
+            metrics.increment("document_node.unreadable")
+            pages = []
+
+        if not pages:
+            body = await self.read_scanned_pages(customer_id, data)
+            return f"Customer ID: {customer_id}\n\nExtracted Grocery List:\n{body}"
+
+        texts = [text for text in pages if text is not None]
+        scanned = [index for index, text in enumerate(pages) if text is None]
+        if scanned:
+            logger.info(f"Sending {len(scanned)} scanned PDF page(s) to the vision agent")
+            texts.append(await self.read_scanned_pages(customer_id, data, scanned))
+
+        body = "\n\n".join(texts)
+        return f"Customer ID: {customer_id}\n\nExtracted Grocery List:\n{body}"
+
+
+class PipelinedImageNode(FunctionNode):
+    """Path 1 image node that overlaps list extraction with catalog searches
+
+    Streams the image processor agent's output and, as extracted list lines
+    complete, searches the catalog for them in batches while the model is
+    still generating. The output is the extracted list followed by the search
+    results, so the catalog agent does not need to search for these items again.
+    The search results reflect stock and prices at the time of the run, so only
+    the extracted list (see extracted_list) may be reused across requests.
+    """
+
+    def __init__(self, extractor, search_tool, batch_size: int = 5, node_id: str = "image_processor"):
+        super().__init__(node_id)
+        self.extractor = extractor
+        self.search_tool = search_tool
+        self.batch_size = batch_size
+
+    async def search(self, names: List[str]) -> str:
+        with metrics.timer("image_pipeline.search_ms"):
+            result = await call_tool(self.search_tool, {"product_names": names})
+        if result.get("status") != "success":
+            logger.warning(f"Pipelined catalog search failed for {names}")
+            return ""
+        return tool_result_text(result)
+
+    async def run(self, original_task: str, inputs: Dict[str, str], invocation_state: Dict[str, Any]) -> str:
+        start = time.perf_counter()
+        searches = []
+        pending: List[str] = []
+        seen = set()
+        buffer = ""
+        in_thinking = False
+        result = None
+
+        def take_line(line: str):
+            nonlocal in_thinking
+            if "<thinking>" in line:
+                in_thinking = True
+            if in_thinking:
+                in_thinking = "</thinking>" not in line
+                return
+            name = product_name(line)
+            if name and name.lower() not in seen:
+                seen.add(name.lower())
+                pending.append(name)
+                if len(seen) == 1:
+                    metrics.observe("image_pipeline.first_item_ms", (time.perf_counter() - start) * 1000)
+
+        def flush(force: bool = False):
+            while pending and (force or len(pending) >= self.batch_size):
+                batch = pending[: self.batch_size]
+                del pending[: self.batch_size]
+                searches.append((batch, asyncio.create_task(self.search(batch))))
+
+        async for event in self.extractor.stream_async(node_prompt(original_task, inputs)):
+            if "data" in event:
+                buffer += event["data"]
+                *lines, buffer = buffer.split("\n")
+                for line in lines:
+                    take_line(line)
+                flush()
+            elif "result" in event:
+                result = event["result"]
+
+        take_line(buffer)
+        flush(force=True)
+
+        extracted = ""
+        if result is not None:
+            self.add_usage(result)
+            extracted = clean_agent_text(str(result))
+        found = await asyncio.gather(*(task for _, task in searches))
+        metrics.increment("image_pipeline.searches", len(searches))
+        logger.info(f"Pipelined {len(seen)} items into {len(searches)} catalog searches")
+
+        sections = [
+            f"Search results for {', '.join(batch)}:\n{text}"
+            for (batch, _), text in zip(searches, found)
+            if text
+        ]
+        if not sections:
+            return extracted
+
+        return (
+            f"{extracted}\n\n{SEARCH_RESULTS_HEADER} (already retrieved with search_products_by_product_names - "
+            "only search again for items not covered here):\n\n" + "\n\n".join(sections)
+        )
+
+
+class CatalogNode(FunctionNode):
+    """Catalog stage computed in code, using the catalog agent only for unresolved items
+
+    Items of the extracted list are searched for in a single
+    search_products_by_product_names call, matched, checked for stock and
+    priced in code (see catalog_matching). Items with no or several matching
+    products are resolved by the catalog agent, which only names the product
+    to use; the options message itself is always formatted in code.
+    """
+
+    def __init__(self, catalog_agent, search_tool, catalogue_tool=None, node_id: str = "catalog"):
+        super().__init__(node_id)
+        self.catalog_agent = catalog_agent
+        self.search_tool = search_tool
+        self.catalogue_tool = catalogue_tool
+
+    async def fetch_products(self, tool, arguments: Dict[str, Any]) -> List[Dict[str, Any]]:
+        from catalog_matching import parse_products
+
+        result = await call_tool(tool, arguments)
+        if result.get("status") != "success":
+            logger.warning(f"Catalog tool '{tool.tool_name}' failed: {tool_result_text(result)[:200]}")
+            return []
+        return parse_products(tool_result_text(result))
+
+    async def resolve_with_agent(self, customer_id: str, unresolved, products_by_name: Dict[str, Dict]) -> None:
+        """Ask the catalog agent which product each unresolved item refers to"""
+        from catalog_matching import availability
+
+        lines = []
+        for match in unresolved:
+            candidates = ", ".join(product["product_name"] for product in match.candidates) or "none found"
+            lines.append(f"- {match.item.name} ({match.item.quantity_text()}) - candidates: {candidates}")
+
+        prompt = (
+            f"Customer ID: {customer_id}\n\n"
+            "Match each requested item below to exactly one catalog product. Search the catalog if none "
+            "of the candidates fit. Reply only with one line per item, in exactly this form:\n"
+            "<requested item> => <exact catalog product name>\n"
+            "or, if the catalog has no such product:\n"
+            "<requested item> => NONE\n\n" + "\n".join(lines)
+        )
+        result = await self.catalog_agent.invoke_async(prompt)
+        self.add_usage(result)
+
+        choices = {}
+        for line in clean_agent_text(str(result)).splitlines():
+            if "=>" in line:
+                requested, chosen = line.split("=>", 1)
+                choices[requested.strip(" -•*").lower()] = chosen.strip()
+
+        for match in unresolved:
+            chosen = choices.get(match.item.name.lower())
+            if not chosen or chosen.upper() == "NONE":
+                continue
+            if chosen.lower() not in products_by_name:
+                for product in await self.fetch_products(self.search_tool, {"product_names": [chosen]}):
+                    products_by_name.setdefault(product["product_name"].lower(), product)
+            product = products_by_name.get(chosen.lower())
+            if product is not None:
+                match.product = product
+                match.status = availability(match.item.quantity, product.get("stock_level", 0))
+
+    async def run(self, original_task: str, inputs: Dict[str, str], invocation_state: Dict[str, Any]) -> str:
+        from catalog_matching import (
+            OUT_OF_STOCK, choose_alternative, format_options, match_item, parse_requested_items, search_terms,
+        )
+
+        text = "\n\n".join(inputs.values()) if inputs else original_task
+        fields = dict(_PROMPT_FIELD.findall(text)) or dict(_PROMPT_FIELD.findall(original_task))
+        customer_id = fields.get("Customer ID", "")
+
+        items = parse_requested_items(text)
+        if not items:
+            # Not a list we can read in code - let the catalog agent handle the whole request
+            logger.info("Catalog node found no list items, delegating to the catalog agent")
+            metrics.increment("catalog_node.agent_fallbacks")
+            result = await self.catalog_agent.invoke_async(node_prompt(original_task, inputs))
+            self.add_usage(result)
+            return clean_agent_text(str(result))
+
+        products = await self.fetch_products(self.search_tool, {"product_names": search_terms(items)})
+        products_by_name = {product["product_name"].lower(): product for product in products}
+        matches = [match_item(item, products) for item in items]
+
+        unresolved = [match for match in matches if not match.resolved]
+        metrics.increment("catalog_node.items", len(matches))
+        metrics.increment("catalog_node.resolved_in_code", len(matches) - len(unresolved))
+        if unresolved:
+            metrics.increment("catalog_node.llm_items", len(unresolved))
+            logger.info(f"Resolving {len(unresolved)}/{len(matches)} catalog items with the catalog agent")
+            await self.resolve_with_agent(customer_id, unresolved, products_by_name)
+
+        out_of_stock = [match for match in matches if match.status == OUT_OF_STOCK]
+        if out_of_stock and self.catalogue_tool is not None:
+            catalogue = await self.fetch_products(self.catalogue_tool, {})
+            chosen = [match.product["product_name"] for match in matches if match.resolved]
+            for match in out_of_stock:
+                match.alternative = choose_alternative(match, catalogue, chosen)
+
+        return format_options(customer_id, matches)
+
+
+async def lookup_delivery(postcode_tool, slots_tool, customer_id: Optional[str],
+                          default_postcode: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Look up the customer's postcode and the earliest available delivery slot for it
+
+    The slot query is filtered by the postcode, so the two calls run back to back.
+
+    Returns:
+        {"postcode": ..., "earliest_slot": slot dict or None}, or None if a lookup failed
+    """
+    from order_confirmation import DEFAULT_POSTCODE, parse_lambda_body
+
+    async def lookup(tool, arguments):
+        result = await call_tool(tool, arguments)
+        if result.get("status") != "success":
+            return None
+        return parse_lambda_body(tool_result_text(result))
+
+    postcode = None
+    if customer_id:
+        customer = await lookup(postcode_tool, {"customer_id": customer_id})
+        if customer is None:
+            logger.warning(f"Postcode lookup failed for customer {customer_id}")
+            return None
+        postcode = customer.get("postcode")
+    postcode = postcode or default_postcode or DEFAULT_POSTCODE
+
+    slots = await lookup(slots_tool, {"status_filter": "available", "postcode": postcode, "query_delivery_slots": True})
+    if slots is None:
+        logger.warning(f"Delivery slot lookup failed for postcode {postcode}")
+        return None
+    return {"postcode": postcode, "earliest_slot": slots.get("earliest_slot")}
+
+
+class DeliveryLookupNode(FunctionNode):
+    """Path 2 branch that retrieves delivery details while the order is being placed
+
+    Runs in parallel with the order node (neither depends on the other) and
+    reports the customer's postcode and earliest delivery slot as a
+    "Delivery Lookup: {json}" line for the warehouse node that joins the branches.
+    """
+
+    def __init__(self, postcode_tool, slots_tool, default_postcode: Optional[str] = None,
+                 node_id: str = "delivery_lookup"):
+        super().__init__(node_id)
+        self.postcode_tool = postcode_tool
+        self.slots_tool = slots_tool
+        self.default_postcode = default_postcode
+
+    async def run(self, original_task: str, inputs: Dict[str, str], invocation_state: Dict[str, Any]) -> str:
+        customer_id = dict(_PROMPT_FIELD.findall(original_task)).get("Customer ID")
+        delivery = await lookup_delivery(self.postcode_tool, self.slots_tool, customer_id, self.default_postcode)
+        if delivery is None:
+            return "Delivery Lookup: failed - look up the postcode and delivery slot with the tools"
+        return f"Delivery Lookup: {json.dumps(delivery)}"
+
+
+def parse_delivery_lookup(text: str) -> Optional[Dict[str, Any]]:
+    """Delivery details reported by DeliveryLookupNode, or None if absent or failed"""
+    match = re.search(r"^Delivery Lookup: (\{.*\})\s*$", text, re.MULTILINE)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(1))
+    except ValueError:
+        return None
+
+
+class WarehouseNode(FunctionNode):
+    """Warehouse stage that looks up delivery details and confirms the order in code
+
+    Calls get_customer_postcode and then get_available_delivery_slots (or uses
+    the details already retrieved by a parallel DeliveryLookupNode) and renders
+    the confirmation template. The warehouse agent is only used when the order
+    cannot be parsed or a lookup fails.
+    """
+
+    def __init__(self, warehouse_agent, postcode_tool, slots_tool, default_postcode: Optional[str] = None,
+                 node_id: str = "warehouse"):
+        super().__init__(node_id)
+        self.warehouse_agent = warehouse_agent
+        self.postcode_tool = postcode_tool
+        self.slots_tool = slots_tool
+        self.default_postcode = default_postcode
+
+    async def fallback(self, reason: str, original_task: str, inputs: Dict[str, str]) -> str:
+        logger.warning(f"Warehouse node falling back to the warehouse agent: {reason}")
+        metrics.increment("warehouse_node.agent_fallbacks")
+        result = await self.warehouse_agent.invoke_async(node_prompt(original_task, inputs))
+        self.add_usage(result)
+        return clean_agent_text(str(result))
+
+    async def run(self, original_task: str, inputs: Dict[str, str], invocation_state: Dict[str, Any]) -> str:
+        from order_confirmation import format_confirmation, parse_placed_order
+
+        order = parse_placed_order(inputs.get("order", "") or "\n\n".join(inputs.values()) or original_task)
+        if order is None:
+            return await self.fallback("order details could not be parsed", original_task, inputs)
+
+        delivery = parse_delivery_lookup(inputs.get("delivery_lookup", ""))
+        if delivery is None:
+            customer_id = order.customer_id or dict(_PROMPT_FIELD.findall(original_task)).get("Customer ID")
+            delivery = await lookup_delivery(self.postcode_tool, self.slots_tool, customer_id, self.default_postcode)
+            if delivery is None:
+                return await self.fallback("delivery lookup failed", original_task, inputs)
+
+        slot = delivery["earliest_slot"]
+        metrics.increment("warehouse_node.confirmations" if slot else "warehouse_node.no_slots")
+        logger.info(f"Order {order.order_id}: postcode {delivery['postcode']}, earliest slot {slot}")
+        return format_confirmation(order, slot)
+
+
+def called_tools(messages: List[Dict[str, Any]], tool_names: List[str]) -> List[str]:
+    """Tools of tool_names (matched by name suffix) whose calls in messages succeeded"""
+    requested = {}
+    for message in messages:
+        for block in message.get("content", []):
+            if "toolUse" in block:
+                requested[block["toolUse"]["toolUseId"]] = block["toolUse"]["name"]
+    called = []
+    for message in messages:
+        for block in message.get("content", []):
+            result = block.get("toolResult")
+            if result and result.get("status") != "error":
+                name = requested.get(result.get("toolUseId"), "")
+                called.extend(tool for tool in tool_names if name.endswith(tool))
+    return called
+
+
+class TieredAgentNode(FunctionNode):
+    """Agent node that picks the agent's model per invocation from a tiering policy
+
+    The starting tier comes from cheap signals of the upstream output (see
+    model_tiering.input_signals). If the output fails the agent's validator,
+    the attempt is discarded from the conversation and retried on the next
+    tier, unless it already called a tool with side effects.
+    """
+
+    def __init__(self, agent, agent_name: str, models, policy, validate, node_id: Optional[str] = None):
+        super().__init__(node_id or agent_name)
+        self.agent = agent
+        self.agent_name = agent_name
+        self.models = models
+        self.policy = policy
+        self.validate = validate
+
+    async def run(self, original_task: str, inputs: Dict[str, str], invocation_state: Dict[str, Any]) -> str:
+        from model_tiering import input_signals
+
+        signals = input_signals("\n\n".join(inputs.values()))
+        tier = self.policy.initial_tier(signals)
+        default_model = self.agent.model
+        escalations = 0
+
+        try:
+            while True:
+                tier_name = self.policy.tiers[tier]
+                history = list(self.agent.messages)
+                self.agent.model = self.models[tier]
+                with metrics.timer(f"tiering.{self.agent_name}.{tier_name}_ms"):
+                    result = await self.agent.invoke_async(node_prompt(original_task, inputs))
+                self.add_usage(result)
+                text = clean_agent_text(str(result))
+
+                if self.validate(text):
+                    break
+                metrics.increment(f"tiering.{self.agent_name}.validation_failures")
+                if escalations >= self.policy.max_escalations or tier + 1 >= len(self.policy.tiers):
+                    logger.warning(f"'{self.agent_name}' output failed validation on tier '{tier_name}', "
+                                   "no stronger tier to retry on")
+                    break
+                side_effects = called_tools(self.agent.messages[len(history):], self.policy.no_retry_after_tools)
+                if side_effects:
+                    logger.warning(f"'{self.agent_name}' output failed validation on tier '{tier_name}', "
+                                   f"not retrying after {side_effects}")
+                    break
+
+                # Retry on the next tier without the failed attempt in the conversation
+                self.agent.messages[:] = history
+                tier += 1
+                escalations += 1
+                metrics.increment(f"tiering.{self.agent_name}.escalations")
+        finally:
+            self.agent.model = default_model
+
+        metrics.increment(f"tiering.{self.agent_name}.tier.{tier_name}")
+        logger.info(f"Tiering '{self.agent_name}': {signals.items} items, {signals.ambiguous} ambiguous "
+                    f"-> tier '{tier_name}' after {escalations} escalation(s)")
+        return text
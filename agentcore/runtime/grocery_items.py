@@ -0,0 +1,58 @@
+"""Parsing of extracted grocery list lines
+
+The image processor returns one "- [quantity] [unit] [product name]" line per
+item. These helpers turn such lines into searchable product names without a
+model call.
+"""
+import re
+from typing import List, Optional, Tuple
+
+# Bulleted ("- ", "• ", "* ") or numbered ("1. ", "2) ") list lines
+_LIST_ITEM = re.compile(r"^\s*(?:[-•*]|\d+[.)])\s+(.+?)\s*$")
+
+_UNITS = (
+    r"cases?|boxes?|bags?|packs?|packets?|bottles?|cans?|jars?|tins?|dozen|units?|pcs|pieces?|"
+    r"lbs?|pounds?|kgs?|kilos?|g|grams?|l|litres?|liters?|ml|gallons?|oz|bunch(?:es)?|trays?|"
+    r"cartons?|loaf|loaves|sacks?|crates?|tubs?|blocks?|heads?"
+)
+_QUANTITY = re.compile(
+    rf"^(?P<quantity>\d+(?:[.,/]\d+)?|(?:a|an|one|two|three|four|five|six|ten|twelve)\b)\s*(?:x\b\s*)?"
+    rf"(?:(?P<unit>{_UNITS})\b\.?\s*)?(?:of\s+)?",
+    re.IGNORECASE,
+)
+
+
+def list_item_text(line: str) -> Optional[str]:
+    """Return the text of a bulleted or numbered list line, or None for other lines"""
+    match = _LIST_ITEM.match(line)
+    return match.group(1) if match else None
+
+
+def split_quantity(item: str) -> Tuple[Optional[str], Optional[str], str]:
+    """Split "2 cases milk" into ("2", "cases", "milk")
+
+    Returns:
+        Tuple of (quantity or None, unit or None, product name)
+    """
+    match = _QUANTITY.match(item)
+    if not match or not item[match.end():].strip():
+        return None, None, item.strip()
+    return match.group("quantity"), match.group("unit"), item[match.end():].strip()
+
+
+def product_name(line: str) -> Optional[str]:
+    """Searchable product name of a list line, or None if the line is not an item"""
+    item = list_item_text(line)
+    if item is None:
+        return None
+    return split_quantity(item)[2] or None
+
+
+def parse_items(text: str) -> List[str]:
+    """Product names of every list line in text, in order, without duplicates"""
+    names = []
+    for line in text.splitlines():
+        name = product_name(line)
+        if name and name.lower() not in (existing.lower() for existing in names):
+            names.append(name)
+    return names
@@ -0,0 +1,121 @@
+"""Per-customer cache of grocery lists extracted from images
+
+Customers often resend the same list photo. The grocery list extracted by the
+image processor (never the catalog search results, whose stock and prices go
+stale) is cached per customer, keyed by the WhatsApp media sha256 and optionally by a
+perceptual hash (dHash) of the image, so a repeated image can skip the vision
+model and go straight to the catalog lookup. Perceptual matching also catches
+re-encoded copies of the same photo whose bytes (and sha256) differ.
+"""
+import io
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import metrics
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+# dHash grid: (HASH_SIZE + 1) x HASH_SIZE gray pixels give a 64-bit hash
+HASH_SIZE = 8
+
+
+def dhash(data: bytes) -> int:
+    """Difference hash of an encoded image (robust to re-encoding and resizing)"""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image).convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+        pixels = list(image.getdata())
+
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            right = pixels[row * (HASH_SIZE + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class ImageResultCache:
+    """TTL cache of extracted grocery lists scoped per customer
+
+    Args:
+        ttl_seconds: How long an extracted list is reused
+        max_entries_per_customer: Images remembered per customer (LRU)
+        max_customers: Customers remembered (LRU)
+        max_distance: Maximum dHash Hamming distance treated as the same image
+    """
+
+    def __init__(self, ttl_seconds: float = 604800, max_entries_per_customer: int = 20,
+                 max_customers: int = 5000, max_distance: int = 4):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_customer = max_entries_per_customer
+        self.max_customers = max_customers
+        self.max_distance = max_distance
+        self._customers: "OrderedDict[str, OrderedDict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, customer_id: str, sha256: Optional[str] = None, phash: Optional[int] = None) -> Optional[str]:
+        """Return the cached extraction for an image, matching sha256 first, then dHash"""
+        now = time.monotonic()
+        with self._lock:
+            entries = self._customers.get(customer_id)
+            if entries is None:
+                metrics.increment("image_cache.misses")
+                return None
+
+            for key, (expires_at, _, _) in list(entries.items()):
+                if expires_at < now:
+                    del entries[key]
+
+            match = None
+            if sha256 and sha256 in entries:
+                match, kind = sha256, "exact"
+            elif phash is not None:
+                for key, (_, _, entry_phash) in entries.items():
+                    if entry_phash is not None and bin(entry_phash ^ phash).count("1") <= self.max_distance:
+                        match, kind = key, "perceptual"
+                        break
+
+            if match is None:
+                metrics.increment("image_cache.misses")
+                return None
+
+            entries.move_to_end(match)
+            self._customers.move_to_end(customer_id)
+            text = entries[match][1]
+
+        metrics.increment(f"image_cache.hits.{kind}")
+        logger.info(f"Image cache hit ({kind}) for customer {customer_id}")
+        return text
+
+    def put(self, customer_id: str, text: str, sha256: Optional[str] = None, phash: Optional[int] = None) -> None:
+        """Store the extraction for an image (needs sha256 or phash to be findable)"""
+        if not sha256 and phash is None:
+            return
+
+        key = sha256 or f"dhash:{phash:016x}"
+        with self._lock:
+            entries = self._customers.setdefault(customer_id, OrderedDict())
+            entries[key] = (time.monotonic() + self.ttl_seconds, text, phash)
+            entries.move_to_end(key)
+            self._customers.move_to_end(customer_id)
+
+            while len(entries) > self.max_entries_per_customer:
+                entries.popitem(last=False)
+            while len(self._customers) > self.max_customers:
+                self._customers.popitem(last=False)
+            total = sum(len(customer_entries) for customer_entries in self._customers.values())
+
+        metrics.set_gauge("image_cache.entries", total)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "customers": len(self._customers),
+                "entries": sum(len(entries) for entries in self._customers.values()),
+            }
@@ -0,0 +1,72 @@
+"""In-process metrics for the order assistant runtime
+
+Counters, gauges and timings are kept in memory for the lifetime of the
+container. Every recording is also logged so values show up in CloudWatch,
+and snapshot() exposes the current totals (used by health_check).
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+_timings: Dict[str, Dict[str, float]] = {}
+
+
+def increment(name: str, value: float = 1) -> None:
+    """Increase a counter by value"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+        total = _counters[name]
+    logger.info(f"[Metrics] {name} += {value} (total={total})")
+
+
+def set_gauge(name: str, value: float) -> None:
+    """Record the current value of a gauge"""
+    with _lock:
+        _gauges[name] = value
+    logger.info(f"[Metrics] {name} = {value}")
+
+
+def observe(name: str, value: float) -> None:
+    """Record a single observation (e.g. a duration in milliseconds)"""
+    with _lock:
+        stats = _timings.get(name)
+        if stats is None:
+            stats = {"count": 0, "total": 0.0, "min": value, "max": value, "last": value}
+            _timings[name] = stats
+        stats["count"] += 1
+        stats["total"] += value
+        stats["min"] = min(stats["min"], value)
+        stats["max"] = max(stats["max"], value)
+        stats["last"] = value
+    logger.info(f"[Metrics] {name} = {value:.1f}")
+
+
+@contextmanager
+def timer(name: str):
+    """Time the wrapped block and record it in milliseconds under name"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - start) * 1000)
+
+
+def snapshot() -> Dict[str, Any]:
+    """Return a copy of all recorded metrics"""
+    with _lock:
+        timings = {}
+        for name, stats in _timings.items():
+            timings[name] = dict(stats, avg=stats["total"] / stats["count"])
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "timings": timings,
+        }
@@ -0,0 +1,237 @@
+"""Fallback chains and hedged requests for agent models
+
+An agent's model can be backed by a chain of alternatives (another inference
+profile or a smaller model) in the model config. FallbackModel calls the
+first model of the chain and moves on to the next one when a call fails
+before producing any output with a capacity error (throttling, model not
+ready, timeouts). With hedging enabled, a second call is started if the
+first has not produced its first event after the agent's recent p95
+first-event latency, and whichever call responds first is used; the other is
+cancelled. Only primary calls that produce their first event feed the
+latency window, so hedges and fallbacks cannot inflate the hedge delay, and
+the share of hedged calls is capped so a slow model cannot double the load.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, List, Optional
+
+from botocore.exceptions import ClientError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError
+from strands.models.model import Model
+from strands.types.exceptions import ModelThrottledException
+
+import metrics
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+# Bedrock error codes that mean the model is unavailable or overloaded, rather than the request being invalid
+FALLBACK_ERROR_CODES = {
+    "ThrottlingException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+    "InternalServerException",
+}
+
+# Recent calls over which the share of hedged calls is measured
+HEDGE_RATE_WINDOW = 200
+
+
+def is_fallback_error(error: BaseException) -> bool:
+    """Whether a failed call should be retried on the next model of the chain"""
+    if isinstance(error, (ModelThrottledException, ReadTimeoutError, ConnectTimeoutError, EndpointConnectionError)):
+        return True
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in FALLBACK_ERROR_CODES
+    return False
+
+
+class LatencyWindow:
+    """Recent first-event latencies of an agent's model calls"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, latency_ms: float) -> None:
+        with self._lock:
+            self._samples.append(latency_ms)
+
+    def percentile(self, fraction: float, min_samples: int) -> Optional[float]:
+        """Latency at fraction (e.g. 0.95), or None with fewer than min_samples samples"""
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class FallbackModel(Model):
+    """Model that calls a chain of models, falling back on capacity errors and optionally hedging
+
+    Args:
+        name: Agent name (used in metric names)
+        models: Primary model followed by its fallbacks
+        hedge: Start a second call when the first is slower than the hedge delay
+        hedge_percentile: Percentile of recent first-event latencies used as the hedge delay
+        hedge_min_samples: Samples needed before the percentile is used
+        hedge_default_delay_ms: Hedge delay until enough samples are collected
+        hedge_min_delay_ms: Lower bound of the hedge delay
+        hedge_max_rate: Largest share of recent calls that may be hedged
+    """
+
+    def __init__(self, name: str, models: List[Model], hedge: bool = False, hedge_percentile: float = 0.95,
+                 hedge_min_samples: int = 20, hedge_default_delay_ms: float = 5000, hedge_min_delay_ms: float = 500,
+                 hedge_max_rate: float = 0.05):
+        if not models:
+            raise ValueError(f"Model chain of '{name}' is empty")
+
+        self.name = name
+        self.models = models
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_default_delay_ms = hedge_default_delay_ms
+        self.hedge_min_delay_ms = hedge_min_delay_ms
+        self.hedge_max_rate = hedge_max_rate
+        self.latencies = LatencyWindow()
+        self._hedged_calls = deque(maxlen=HEDGE_RATE_WINDOW)  # Whether each recent call was hedged
+        self._hedge_lock = threading.Lock()
+
+    def update_config(self, **model_config: Any) -> None:
+        """Apply config to every model of the chain; model_id only applies to the primary"""
+        model_id = model_config.pop("model_id", None)
+        for model in self.models[1:]:
+            model.update_config(**model_config)
+        if model_id is not None:
+            model_config["model_id"] = model_id
+        self.models[0].update_config(**model_config)
+
+    def get_config(self) -> Any:
+        return self.models[0].get_config()
+
+    @property
+    def config(self) -> Any:
+        """Primary model's config, read by strands tracing for the model_id"""
+        return self.models[0].config
+
+    async def count_tokens(self, *args, **kwargs) -> int:
+        return await self.models[0].count_tokens(*args, **kwargs)
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the first event before hedging"""
+        delay_ms = self.latencies.percentile(self.hedge_percentile, self.hedge_min_samples)
+        if delay_ms is None:
+            delay_ms = self.hedge_default_delay_ms
+        return max(self.hedge_min_delay_ms, delay_ms) / 1000
+
+    def hedge_allowed(self) -> bool:
+        """Whether hedging another call keeps the share of hedged calls within hedge_max_rate"""
+        with self._hedge_lock:
+            return (sum(self._hedged_calls) + 1) / (len(self._hedged_calls) + 1) <= self.hedge_max_rate
+
+    def record_call(self, hedged: bool) -> None:
+        with self._hedge_lock:
+            self._hedged_calls.append(hedged)
+
+    async def call(self, start_call: Callable[[Model], Any]):
+        """Yield the events of the first call to respond, falling back and hedging across the chain
+
+        Args:
+            start_call: Function starting a call on a model and returning its event stream
+        """
+        start = time.perf_counter()
+        pending = {}  # Task awaiting a call's first event -> (event stream, chain index, started by hedging, start)
+        next_index = 0
+        hedged = False  # Hedge delay has passed (whether or not a hedge was started)
+        hedge_started = False
+        last_error = None
+
+        def launch(index: int, hedge: bool = False) -> None:
+            events = start_call(self.models[index]).__aiter__()
+            pending[asyncio.ensure_future(events.__anext__())] = (events, index, hedge, time.perf_counter())
+
+        async def cancel(task, events) -> None:
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+            await events.aclose()
+
+        launch(next_index)
+        next_index += 1
+
+        try:
+            while pending:
+                timeout = self.hedge_delay() if self.hedge and not hedged else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedged = True
+                    if not self.hedge_allowed():
+                        metrics.increment(f"model_hedge.{self.name}.capped")
+                        continue
+                    # First event is late: hedge on the next model of the chain (or the primary again)
+                    hedge_started = True
+                    metrics.increment(f"model_hedge.{self.name}.fired")
+                    logger.info(f"Hedging '{self.name}' model call after {time.perf_counter() - start:.1f}s")
+                    if next_index < len(self.models):
+                        launch(next_index, hedge=True)
+                        next_index += 1
+                    else:
+                        launch(0, hedge=True)
+                    continue
+
+                task = done.pop()
+                events, index, hedge, started = pending.pop(task)
+                error = task.exception()
+                if error is None or isinstance(error, StopAsyncIteration):
+                    if index == 0 and not hedge:
+                        # Only the primary call's own latency, so hedges and fallbacks do not skew the delay
+                        self.latencies.add((time.perf_counter() - started) * 1000)
+                    break
+
+                last_error = error
+                await events.aclose()
+                if pending:
+                    # The other (hedged) call may still succeed
+                    continue
+                if is_fallback_error(error) and next_index < len(self.models):
+                    metrics.increment(f"model_fallback.{self.name}.used")
+                    logger.warning(f"'{self.name}' model {index} failed ({error}), falling back to model {next_index}")
+                    launch(next_index)
+                    next_index += 1
+            else:
+                if is_fallback_error(last_error):
+                    metrics.increment(f"model_fallback.{self.name}.exhausted")
+                raise last_error
+        finally:
+            # Drop the calls that lost (or all of them on failure or cancellation)
+            for other, (other_events, _, _, _) in pending.items():
+                await cancel(other, other_events)
+            self.record_call(hedge_started)
+
+        if hedge:
+            metrics.increment(f"model_hedge.{self.name}.won")
+        if index != 0:
+            metrics.increment(f"model_fallback.{self.name}.served")
+
+        if error is not None:
+            return  # The winning call produced no events
+        yield task.result()
+        async for event in events:
+            yield event
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        async for event in self.call(lambda model: model.stream(messages, tool_specs, system_prompt, **kwargs)):
+            yield event
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        async for event in self.call(
+            lambda model: model.structured_output(output_model, prompt, system_prompt, **kwargs)
+        ):
+            yield event
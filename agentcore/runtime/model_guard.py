@@ -0,0 +1,236 @@
+"""Adaptive concurrency limits on Bedrock model calls
+
+Every agent set in the pool calls Bedrock independently, so at peak load the
+runtime can exceed the account's throughput and trigger ThrottlingExceptions
+that each agent then retries on its own. GuardedModel wraps an agent's model
+and takes a slot from the limiter of its bulkhead before every call. Each
+limiter adjusts its limit AIMD-style: it grows by one slot per window of
+successful calls while the limit is in use, and shrinks multiplicatively
+when Bedrock throttles or the first response event is slower than the
+latency target. Agents are grouped into bulkheads so that, for example,
+image extraction cannot take the capacity the order path needs.
+
+A call that cannot get a slot in time fails with ModelThrottledException,
+which the strands event loop already retries with backoff.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from strands.models.model import Model
+from strands.types.exceptions import ModelThrottledException
+
+import metrics
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+OUTCOME_OK = "ok"
+OUTCOME_THROTTLED = "throttled"
+OUTCOME_ERROR = "error"
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit shared by the models of one bulkhead
+
+    Args:
+        name: Bulkhead name (used in metric names)
+        initial_limit: Concurrent calls allowed at start
+        min_limit: Lowest the limit shrinks to
+        max_limit: Highest the limit grows to
+        latency_target_ms: First-event latency above which the limit shrinks (None disables)
+        backoff: Factor applied to the limit when a call is throttled
+        latency_backoff: Factor applied to the limit when a call exceeds the latency target
+        decrease_interval: Minimum seconds between two decreases, so one burst of throttles counts once
+        acquire_timeout: Seconds a call waits for a slot before it is rejected
+    """
+
+    def __init__(self, name: str, initial_limit: float = 8, min_limit: float = 1, max_limit: float = 32,
+                 latency_target_ms: Optional[float] = None, backoff: float = 0.5, latency_backoff: float = 0.9,
+                 decrease_interval: float = 1.0, acquire_timeout: float = 30):
+        if min_limit < 1 or not min_limit <= initial_limit <= max_limit:
+            raise ValueError(f"Invalid limits for bulkhead '{name}': "
+                             f"min {min_limit}, initial {initial_limit}, max {max_limit}")
+
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target_ms = latency_target_ms
+        self.backoff = backoff
+        self.latency_backoff = latency_backoff
+        self.decrease_interval = decrease_interval
+        self.acquire_timeout = acquire_timeout
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def _record(self) -> None:
+        metrics.set_gauge(f"model_limiter.{self.name}.limit", round(self.limit, 2))
+        metrics.set_gauge(f"model_limiter.{self.name}.in_flight", self._in_flight)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take a slot, waiting up to timeout seconds (acquire_timeout if None)
+
+        Returns:
+            True if a slot was taken, False if none became free in time
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self._in_flight += 1
+            self._record()
+            return True
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_interval:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
+        logger.info(f"Bulkhead '{self.name}' limit decreased to {self.limit:.2f}")
+
+    def release(self, outcome: str, latency_ms: Optional[float] = None) -> None:
+        """Return a slot and adjust the limit from the call's outcome"""
+        with self._condition:
+            saturated = self._in_flight >= int(self.limit)
+            self._in_flight -= 1
+
+            if outcome == OUTCOME_THROTTLED:
+                metrics.increment(f"model_limiter.{self.name}.throttled")
+                self._decrease(self.backoff)
+            elif outcome == OUTCOME_OK:
+                if self.latency_target_ms and latency_ms is not None and latency_ms > self.latency_target_ms:
+                    metrics.increment(f"model_limiter.{self.name}.slow")
+                    self._decrease(self.latency_backoff)
+                elif saturated:
+                    # Additive increase: about one slot per window of `limit` successful calls
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            self._record()
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {"limit": round(self.limit, 2), "in_flight": self._in_flight}
+
+
+class GuardedModel(Model):
+    """Model wrapper that runs every call within a slot of its bulkhead's limiter
+
+    Configuration is delegated to the wrapped model, so update_config (e.g.
+    on config reload) applies to it directly.
+    """
+
+    def __init__(self, model: Model, limiter: AdaptiveLimiter):
+        self.model = model
+        self.limiter = limiter
+
+    def update_config(self, **model_config: Any) -> None:
+        self.model.update_config(**model_config)
+
+    def get_config(self) -> Any:
+        return self.model.get_config()
+
+    @property
+    def config(self) -> Any:
+        """Wrapped model's config, read by strands tracing for the model_id"""
+        return self.model.config
+
+    async def count_tokens(self, *args, **kwargs) -> int:
+        return await self.model.count_tokens(*args, **kwargs)
+
+    async def acquire(self) -> None:
+        """Take a limiter slot without blocking the event loop
+
+        Raises:
+            ModelThrottledException: If no slot became free within the limiter's acquire_timeout
+        """
+        if self.limiter.acquire(timeout=0):
+            return
+
+        waiter = asyncio.ensure_future(asyncio.to_thread(self.limiter.acquire))
+        try:
+            acquired = await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            # The waiting thread cannot be interrupted (e.g. a hedged call that lost), so hand
+            # back the slot it may still take
+            waiter.add_done_callback(
+                lambda future: future.result() and self.limiter.release(OUTCOME_ERROR)
+            )
+            raise
+        if not acquired:
+            metrics.increment(f"model_limiter.{self.limiter.name}.rejected")
+            raise ModelThrottledException(
+                f"Concurrency limit of bulkhead '{self.limiter.name}' reached "
+                f"({self.limiter.acquire_timeout}s without a free slot)"
+            )
+
+    async def guarded(self, call):
+        """Run a model call within a slot and yield its events, releasing the slot with the call's outcome
+
+        Args:
+            call: Function starting the wrapped model's call and returning its event stream
+        """
+        await self.acquire()
+        start = time.perf_counter()
+        latency_ms = None
+        outcome = OUTCOME_ERROR
+        try:
+            async for event in call():
+                if latency_ms is None:
+                    latency_ms = (time.perf_counter() - start) * 1000
+                yield event
+            outcome = OUTCOME_OK
+        except ModelThrottledException:
+            outcome = OUTCOME_THROTTLED
+            raise
+        finally:
+            self.limiter.release(outcome, latency_ms)
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        async for event in self.guarded(lambda: self.model.stream(messages, tool_specs, system_prompt, **kwargs)):
+            yield event
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        async for event in self.guarded(
+            lambda: self.model.structured_output(output_model, prompt, system_prompt, **kwargs)
+        ):
+            yield event
+
+
+def create_limiters(limits_config: Dict[str, Any], agent_names: Iterable[str]) -> Dict[str, AdaptiveLimiter]:
+    """Create one limiter per bulkhead of the model_limits config section
+
+    Agents not assigned to a bulkhead get a bulkhead of their own with the
+    default limits.
+
+    Returns:
+        Limiter of every agent name (agents of one bulkhead share a limiter)
+    """
+    defaults = {
+        key: limits_config[key]
+        for key in ("latency_target_ms", "backoff", "latency_backoff", "decrease_interval", "acquire_timeout")
+        if key in limits_config
+    }
+    limiters = {}
+    for bulkhead, settings in (limits_config.get("bulkheads") or {}).items():
+        settings = dict(settings)
+        agents = settings.pop("agents", [])
+        limiter = AdaptiveLimiter(bulkhead, **{**defaults, **settings})
+        for agent_name in agents:
+            limiters[agent_name] = limiter
+        logger.info(f"Bulkhead '{bulkhead}' for {agents}: limit {limiter.limit:g} "
+                    f"({limiter.min_limit}-{limiter.max_limit})")
+
+    for agent_name in agent_names:
+        if agent_name not in limiters:
+            limiters[agent_name] = AdaptiveLimiter(agent_name, **defaults)
+    return limiters
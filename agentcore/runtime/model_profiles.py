@@ -0,0 +1,57 @@
+"""Bedrock model settings of an agent from its section of the model config
+
+Kept apart from core so the profiles can be built (and checked) without the
+MCP gateway and agent runtime.
+"""
+import logging
+from typing import Any, Dict
+
+from strands.models.model import CacheConfig
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+# Inference parameters an agent's profile can set (agents.<name>.inference in the model config)
+INFERENCE_PARAMS = ("max_tokens", "temperature", "top_p", "stop_sequences")
+
+# Cache points are placed in Bedrock's cachePoint format. Only Claude models get a cache
+# config: the strategy also adds a message-level cachePoint, which other models reject or ignore
+CACHE_STRATEGY = "anthropic"
+CACHING_MODELS = ("anthropic.claude",)
+
+
+def supports_prompt_caching(model_id: str) -> bool:
+    """Whether cache points can be sent to this Bedrock model ID"""
+    return any(family in (model_id or "") for family in CACHING_MODELS)
+
+
+def build_inference_profile(agent_name: str, agent_config: Dict[str, Any]) -> Dict[str, Any]:
+    """BedrockModel config of an agent from agents.<name> in the model config
+
+    Returns:
+        Config with the model ID, every inference parameter and the prompt
+        cache settings (None for settings the profile leaves unset, so
+        removing one from the file also removes it from the model on reload)
+    """
+    inference = agent_config.get("inference") or {}
+
+    unknown = set(inference) - set(INFERENCE_PARAMS)
+    if unknown:
+        logger.warning(f"Ignoring unknown inference parameters for '{agent_name}': {sorted(unknown)}")
+
+    profile = {"model_id": agent_config.get("model_id")}
+    profile.update({param: inference.get(param) for param in INFERENCE_PARAMS})
+
+    # Cache checkpoints after the static prefix of every request: the tool specs and the system prompt
+    cache_tools = bool(agent_config.get("cache_tools"))
+    cache_prompt = bool(agent_config.get("cache_prompt"))
+    if (cache_tools or cache_prompt) and not supports_prompt_caching(profile["model_id"]):
+        logger.warning(
+            f"Ignoring cache settings for '{agent_name}': {profile['model_id']} does not support prompt caching"
+        )
+        cache_tools = cache_prompt = False
+    profile["cache_config"] = (
+        CacheConfig(strategy=CACHE_STRATEGY, system_prompt_ttl=cache_prompt, tools_ttl=cache_tools)
+        if cache_tools or cache_prompt else None
+    )
+    return profile
@@ -0,0 +1,127 @@
+"""Complexity-based model tiering for the catalog and order agents
+
+A two-item list does not need the same model as a 60-line restaurant order.
+The tiering policy picks a model tier per invocation from cheap signals of
+the node's input (number of list items, ambiguous catalog matches) and
+escalates to the next tier when the agent's output fails validation.
+Tiers are ordered from cheapest to strongest in the model config.
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from catalog_matching import match_item, parse_products, parse_requested_items
+from grocery_items import list_item_text
+from order_confirmation import parse_placed_order
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+# "Search results for a, b:\n<tool result>" sections added by the pipelined image node
+_SEARCH_SECTION = re.compile(r"^Search results for [^\n]*:\n(.+?)(?=\n\nSearch results for |\Z)",
+                             re.MULTILINE | re.DOTALL)
+_CATALOG_OPTION = re.compile(r"OPTION 1\b.*?Total:\s*\$\s*[\d,]+(?:\.\d+)?", re.IGNORECASE | re.DOTALL)
+
+
+@dataclass
+class TierSignals:
+    """Cheap complexity signals of a node's input"""
+
+    items: int = 0
+    ambiguous: int = 0
+
+
+@dataclass
+class TieringPolicy:
+    """Tier selection for one agent
+
+    Args:
+        tiers: Tier names, cheapest first
+        base_tier: Index of the tier simple requests use
+        items_threshold: Inputs with more list items start one tier up (None disables)
+        ambiguous_threshold: Inputs with more ambiguous catalog matches start one tier up (None disables)
+        max_escalations: Retries on a stronger tier when the output fails validation
+        no_retry_after_tools: Tools with side effects; an attempt that called one is never retried
+    """
+
+    tiers: List[str]
+    base_tier: int = 0
+    items_threshold: Optional[int] = None
+    ambiguous_threshold: Optional[int] = None
+    max_escalations: int = 1
+    no_retry_after_tools: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_config(cls, tiers: List[str], agent_config: Dict[str, Any]) -> "TieringPolicy":
+        base_tier = agent_config.get("base_tier", tiers[0])
+        if base_tier not in tiers:
+            raise ValueError(f"Unknown base tier '{base_tier}' (tiers: {tiers})")
+        return cls(
+            tiers=tiers,
+            base_tier=tiers.index(base_tier),
+            items_threshold=agent_config.get("items_threshold"),
+            ambiguous_threshold=agent_config.get("ambiguous_threshold"),
+            max_escalations=agent_config.get("max_escalations", 1),
+            no_retry_after_tools=agent_config.get("no_retry_after_tools", []),
+        )
+
+    @property
+    def can_change_tier(self) -> bool:
+        """Whether any input or escalation can move the agent off its base tier"""
+        return self.base_tier < len(self.tiers) - 1
+
+    def initial_tier(self, signals: TierSignals) -> int:
+        """Index of the tier to start with, one tier up for each exceeded threshold"""
+        tier = self.base_tier
+        if self.items_threshold is not None and signals.items > self.items_threshold:
+            tier += 1
+        if self.ambiguous_threshold is not None and signals.ambiguous > self.ambiguous_threshold:
+            tier += 1
+        return min(tier, len(self.tiers) - 1)
+
+
+def base_model_id(tiers: List[Dict[str, Any]], agent_config: Dict[str, Any]) -> str:
+    """Model id of an agent's base tier (tiers as in the tiering config section)"""
+    policy = TieringPolicy.from_config([tier["name"] for tier in tiers], agent_config)
+    return tiers[policy.base_tier]["model_id"]
+
+
+def count_items(text: str) -> int:
+    """Number of bulleted or numbered list lines in text"""
+    return sum(1 for line in text.splitlines() if list_item_text(line) is not None)
+
+
+def count_ambiguous(text: str) -> int:
+    """Requested items without exactly one match in the prefetched catalog search results
+
+    Returns 0 when the input carries no search results (nothing is known yet).
+    """
+    sections = _SEARCH_SECTION.findall(text)
+    if not sections:
+        return 0
+
+    products = [product for section in sections for product in parse_products(section.strip())]
+    list_text = text.split("Catalog search results", 1)[0]
+    return sum(1 for item in parse_requested_items(list_text) if not match_item(item, products).resolved)
+
+
+def input_signals(text: str) -> TierSignals:
+    return TierSignals(items=count_items(text), ambiguous=count_ambiguous(text))
+
+
+def valid_catalog_options(text: str) -> bool:
+    """Whether the catalog agent's output contains the options with a total"""
+    return _CATALOG_OPTION.search(text) is not None
+
+
+def valid_placed_order(text: str) -> bool:
+    """Whether the order agent's output reports a complete placed order"""
+    return parse_placed_order(text) is not None
+
+
+# Output validation of each tiered agent
+VALIDATORS = {
+    "catalog": valid_catalog_options,
+    "order": valid_placed_order,
+}
@@ -1,6 +1,6 @@
 from bedrock_agentcore.runtime import BedrockAgentCoreApp
 import logging
-from core import process_grocery_list
+from core import process_grocery_list, stream_grocery_list, start_eager_init
 
 logger = logging.getLogger(__name__)
 
@@ -8,7 +8,7 @@ app = BedrockAgentCoreApp()
 
 
 @app.entrypoint
-def invoke(payload):
+def invoke(payload, context=None):
     """Handler for Bedrock agent invocation"""
     print(f"Received payload type: {type(payload)}")
     print(f"Received payload value: {payload}")
@@ -30,9 +30,19 @@ def invoke(payload):
     action = payload.get("action", "UNKNOWN")
     customer_id = payload.get("customer_id", "unknown")
 
+    # Key per-session conversation memory by the AgentCore runtime session
+    session_id = getattr(context, "session_id", None)
+    if session_id and not payload.get("session_id"):
+        payload["session_id"] = session_id
+
     print(f"Processing action '{action}' for customer {customer_id}")
     print(f"Full payload being sent to process_grocery_list: {payload}")
 
+    # Streaming mode: yield node progress and response chunks as server-sent events
+    if payload.get("stream"):
+        print("Streaming response")
+        return stream_grocery_list(payload)
+
     # Pass full payload to orchestrator for processing
     result = process_grocery_list(payload)
 
@@ -42,4 +52,8 @@ def invoke(payload):
 
 
 if __name__ == "__main__":
+    # Warm up agents at container start instead of on the first customer request. Kept
+    # out of the module's top level: spawned worker processes (the PDF process pool)
+    # re-import this module as __mp_main__.
+    start_eager_init()
     app.run()
@@ -0,0 +1,119 @@
+"""Parsing of the order agent's output and the final confirmation templates
+
+The warehouse stage (prompts/wm.md) looks up the customer's postcode and the
+earliest delivery slot, then rewrites the order agent's output as the
+customer-facing confirmation. These helpers do the parsing and formatting so
+the stage can run without a model call.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Delivery area used when the customer has no postcode on record (see prompts/wm.md)
+DEFAULT_POSTCODE = "SW1A"
+
+# Bold, italic-underscore and code markers the agent may wrap labels and values in
+_MARKDOWN = re.compile(r"\*\*|__|`")
+_ORDER_ID = re.compile(r"Order ID:\s*#?(\S+)", re.IGNORECASE)
+_CUSTOMER_ID = re.compile(r"Customer ID:\s*(\S+)", re.IGNORECASE)
+_TOTAL = re.compile(r"Total Amount:\s*\$?\s*([\d,]+(?:\.\d+)?)", re.IGNORECASE)
+# "1. Organic Bananas - 2 kg × $3.50 = $7.00"
+_ORDER_ITEM = re.compile(
+    r"^\s*\d+[.)]\s*(?P<name>.+?)\s+-\s+(?P<quantity>.+?)\s*[×x]\s*\$?\s*[\d,.]+\s*=\s*\$?\s*(?P<subtotal>[\d,]+(?:\.\d+)?)\s*$"
+)
+
+CONFIRMED_TEMPLATE = """✅ ORDER CONFIRMED!
+
+Order #{order_id}
+
+Items:
+{items}
+
+Total: ${total}
+Delivery: {slot_date} between {start_time}-{end_time}
+
+Thank you for your order!"""
+
+PENDING_TEMPLATE = """⚠️ ORDER PLACED - DELIVERY PENDING
+
+Order #{order_id}
+
+Items:
+{items}
+
+Total: ${total}
+Delivery: No slots available in the next 7 days
+
+Your order has been placed. We will contact you when delivery slots become available."""
+
+
+@dataclass
+class PlacedOrder:
+    """Order details reported by the order agent"""
+
+    order_id: str
+    customer_id: Optional[str]
+    total: str
+    items: List[Dict[str, str]] = field(default_factory=list)
+
+
+def parse_placed_order(text: str) -> Optional[PlacedOrder]:
+    """Parse the order agent's output, or return None if it is not a complete order"""
+    text = _MARKDOWN.sub("", text)
+    order_id = _ORDER_ID.search(text)
+    total = _TOTAL.search(text)
+    if not order_id or not total:
+        return None
+
+    items = []
+    for line in text.splitlines():
+        match = _ORDER_ITEM.match(line)
+        if match:
+            items.append({key: value.strip() for key, value in match.groupdict().items()})
+    if not items:
+        return None
+
+    customer_id = _CUSTOMER_ID.search(text)
+    return PlacedOrder(
+        order_id=order_id.group(1),
+        customer_id=customer_id.group(1) if customer_id else None,
+        total=f"{float(total.group(1).replace(',', '')):.2f}",
+        items=items,
+    )
+
+
+def parse_lambda_body(tool_text: str) -> Optional[Any]:
+    """Decode the Lambda response returned by a gateway tool ({"statusCode": ..., "body": "<json>"})
+
+    Returns:
+        The decoded body, or None if the call failed
+    """
+    try:
+        data = json.loads(tool_text)
+    except ValueError:
+        return None
+    if isinstance(data, dict) and "statusCode" in data:
+        if data["statusCode"] >= 400:
+            return None
+        body = data.get("body")
+        try:
+            return json.loads(body) if isinstance(body, str) else body
+        except ValueError:
+            return None
+    return data
+
+
+def format_confirmation(order: PlacedOrder, slot: Optional[Dict[str, Any]]) -> str:
+    """Render the final confirmation for an order and its earliest delivery slot (None if no slot)"""
+    items = "\n".join(f"• {item['name']} ({item['quantity']}) - ${item['subtotal']}" for item in order.items)
+    if slot is None:
+        return PENDING_TEMPLATE.format(order_id=order.order_id, items=items, total=order.total)
+    return CONFIRMED_TEMPLATE.format(
+        order_id=order.order_id,
+        items=items,
+        total=order.total,
+        slot_date=slot["slot_date"],
+        start_time=slot["start_time"],
+        end_time=slot["end_time"],
+    )
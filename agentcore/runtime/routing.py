@@ -0,0 +1,104 @@
+"""Request routing for the order processing graph
+
+When the structured payload already determines the workflow path, the graph
+can start at that path directly instead of asking the router LLM. Ambiguous
+input (free text) still goes through the router, which returns a structured
+RouteDecision that the graph's edge conditions read.
+"""
+import logging
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+# Workflow paths that can be decided without a model call
+PATH_IMAGE = "image"
+
+# Router decisions
+PATH_ORDER = "order"
+PATH_REPLY = "reply"
+
+# PDF document request, read from its text layer (see graph_nodes.DocumentNode)
+PATH_DOCUMENT = "document"
+
+# Image request whose grocery list was already extracted (see image_cache)
+PATH_CACHED_IMAGE = "cached_image"
+
+
+def classify_request(payload: dict) -> Optional[str]:
+    """Decide the workflow path from the payload when it is deterministic
+
+    Mirrors the precedence used when building the graph prompt: a text message
+    wins over S3 details, so only payloads that would be sent to the router as
+    S3 Bucket/S3 Key are classified as Path 1.
+
+    Args:
+        payload: Invocation payload (see process_grocery_list)
+
+    Returns:
+        PATH_DOCUMENT for PDFs, PATH_IMAGE for other image requests, or None if
+        the router LLM should decide
+    """
+    action = payload.get("action", "")
+
+    if action == "TEXT_MESSAGE" and payload.get("message"):
+        return None
+
+    if payload.get("s3_bucket") and payload.get("s3_key"):
+        if payload.get("mime_type") == "application/pdf" or payload["s3_key"].lower().endswith(".pdf"):
+            logger.info(f"Pre-classified action '{action}' as Path 1 (PDF document) from payload")
+            return PATH_DOCUMENT
+        logger.info(f"Pre-classified action '{action}' as Path 1 (image) from payload")
+        return PATH_IMAGE
+
+    return None
+
+
+class OrderItem(BaseModel):
+    """One line of the option the customer selected"""
+
+    product_name: str
+    quantity: str = Field(description="Quantity as shown in the option, including any unit, e.g. '2 kg'")
+    unit_price: float = Field(description="Price per unit in dollars")
+    subtotal: float = Field(description="Line total in dollars")
+
+
+class RouteDecision(BaseModel):
+    """Routing decision returned by the router agent"""
+
+    path: Literal["image", "order", "reply"] = Field(
+        description="image: S3 image/document to process; order: customer confirmed an option; "
+                    "reply: anything else (answer the customer directly)"
+    )
+    customer_id: Optional[str] = None
+    selected_option: Optional[str] = Field(None, description='"Option 1" or "Option 2" (order path)')
+    items: List[OrderItem] = Field(default_factory=list, description="Items of the selected option (order path)")
+    total: Optional[float] = Field(None, description="Total of the selected option in dollars (order path)")
+    reply: Optional[str] = Field(None, description="Short message to the customer (reply path)")
+
+    @model_validator(mode="after")
+    def check_path_fields(self):
+        if self.path == PATH_ORDER and (not self.items or self.total is None):
+            raise ValueError("An order decision needs the selected items and total")
+        if self.path == PATH_REPLY and not self.reply:
+            raise ValueError("A reply decision needs the reply text")
+        return self
+
+    def to_text(self) -> str:
+        """Render the decision as the input of the next node"""
+        if self.path == PATH_ORDER:
+            items = "\n".join(
+                f"- {item.product_name}: {item.quantity} × ${item.unit_price:.2f} = ${item.subtotal:.2f}"
+                for item in self.items
+            )
+            return (
+                f"Customer ID: {self.customer_id or ''}\n"
+                f"Selected Option: {self.selected_option or ''}\n\n"
+                f"Items to Order:\n{items}\n\n"
+                f"Total Amount: ${self.total:.2f}"
+            )
+        if self.path == PATH_REPLY:
+            return self.reply
+        return "ROUTE_TO_IMAGE"
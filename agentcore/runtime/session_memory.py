@@ -0,0 +1,180 @@
+"""Bounded per-session conversation memory for pooled agents
+
+Agent sets are shared by every customer through the agent pool, so their
+conversation histories are swapped in and out per session: on checkout the
+session's stored messages are loaded into the agents, and after the request
+they are trimmed and stored back. Image and document blocks are replaced by a
+text placeholder before storing: their bytes are only needed for the turn
+that read them and would otherwise be re-sent to the model on every later
+turn. Sessions are kept in LRU order and evicted when there are too many of
+them or the runtime-wide ceiling on stored bytes is reached.
+"""
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+import metrics
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+# Content blocks whose bytes are dropped from stored histories
+MEDIA_BLOCKS = ("image", "document")
+
+
+def _media_placeholder(block: Dict[str, Any]) -> Dict[str, Any]:
+    for kind in MEDIA_BLOCKS:
+        if kind in block:
+            return {"text": f"[{kind} omitted from conversation history]"}
+    return block
+
+
+def strip_media(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copy of a message history with image and document blocks replaced by text placeholders
+
+    Blocks inside tool results (e.g. images returned by download_image_from_s3)
+    are replaced too; the messages passed in are not modified.
+    """
+    stripped = []
+    for message in messages:
+        content = []
+        for block in message.get("content", []):
+            if "toolResult" in block:
+                result = block["toolResult"]
+                block = {"toolResult": {**result, "content": [_media_placeholder(item)
+                                                              for item in result.get("content", [])]}}
+            content.append(_media_placeholder(block))
+        stripped.append({**message, "content": content})
+    return stripped
+
+
+def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Estimate the prompt tokens of a message history without media blocks (~4 characters per token)"""
+    chars = 0
+    for message in messages:
+        for block in message.get("content", []):
+            if "text" in block:
+                chars += len(block["text"])
+            elif "toolUse" in block:
+                chars += len(json.dumps(block["toolUse"].get("input", {}), default=str))
+            elif "toolResult" in block:
+                for item in block["toolResult"].get("content", []):
+                    if "text" in item:
+                        chars += len(item["text"])
+                    elif "json" in item:
+                        chars += len(json.dumps(item["json"], default=str))
+    return chars // 4
+
+
+def history_bytes(messages: List[Dict[str, Any]]) -> int:
+    """Approximate memory held by a stored message history (size of its JSON encoding)"""
+    return len(json.dumps(messages, default=str).encode("utf-8"))
+
+
+def _turn_starts(messages: List[Dict[str, Any]]) -> List[int]:
+    """Indices of user messages that start a turn (user text, not a tool result)"""
+    return [
+        index
+        for index, message in enumerate(messages)
+        if message.get("role") == "user"
+        and not any("toolResult" in block for block in message.get("content", []))
+    ]
+
+
+def trim_history(messages: List[Dict[str, Any]], max_turns: int, max_tokens: int) -> List[Dict[str, Any]]:
+    """Keep the most recent whole turns within max_turns and max_tokens
+
+    Trimming always cuts at the start of a turn so tool use / tool result
+    pairs are never separated.
+    """
+    starts = _turn_starts(messages)
+    if not starts:
+        return []
+
+    if len(starts) > max_turns:
+        starts = starts[-max_turns:] if max_turns > 0 else []
+    if not starts:
+        return []
+    messages = messages[starts[0]:]
+    starts = [index - starts[0] for index in starts]
+
+    while starts and estimate_tokens(messages) > max_tokens:
+        if len(starts) == 1:
+            # A single turn larger than the cap is not worth keeping
+            return []
+        messages = messages[starts[1]:]
+        starts = [index - starts[1] for index in starts[1:]]
+
+    return messages
+
+
+class SessionMemory:
+    """LRU store of agent conversation histories keyed by session"""
+
+    def __init__(self, max_sessions: int = 200, max_turns: int = 5, max_tokens: int = 20000,
+                 max_total_bytes: int = 16_000_000):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.max_total_bytes = max_total_bytes
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str, agents: Dict[str, Any]) -> None:
+        """Replace each agent's conversation with the session's stored history"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            histories = session["histories"] if session else {}
+
+        for name, agent in agents.items():
+            agent.messages = list(histories.get(name, []))
+
+    def save(self, session_id: str, agents: Dict[str, Any]) -> None:
+        """Store the trimmed conversation of each agent, without media blocks, for the session"""
+        histories = {}
+        tokens = 0
+        size = 0
+        for name, agent in agents.items():
+            history = trim_history(strip_media(agent.messages), self.max_turns, self.max_tokens)
+            if history:
+                histories[name] = history
+                tokens += estimate_tokens(history)
+                size += history_bytes(history)
+            metrics.observe(f"session_memory.history_messages.{name}", len(history))
+
+        with self._lock:
+            previous = self._sessions.pop(session_id, None)
+            if previous is not None:
+                self._total_bytes -= previous["bytes"]
+
+            if histories:
+                self._sessions[session_id] = {"histories": histories, "bytes": size}
+                self._total_bytes += size
+
+            evicted = 0
+            while self._sessions and (
+                len(self._sessions) > self.max_sessions or self._total_bytes > self.max_total_bytes
+            ):
+                _, oldest = self._sessions.popitem(last=False)
+                self._total_bytes -= oldest["bytes"]
+                evicted += 1
+
+            session_count = len(self._sessions)
+            total_bytes = self._total_bytes
+
+        if evicted:
+            metrics.increment("session_memory.evictions", evicted)
+        metrics.observe("session_memory.session_tokens", tokens)
+        metrics.observe("session_memory.session_bytes", size)
+        metrics.set_gauge("session_memory.sessions", session_count)
+        metrics.set_gauge("session_memory.total_bytes", total_bytes)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return current session count and retained bytes"""
+        with self._lock:
+            return {"sessions": len(self._sessions), "total_bytes": self._total_bytes}
@@ -0,0 +1,83 @@
+"""Timed, dependency-aware startup steps for the runtime
+
+Cold start is dominated by network round trips (SSM, Secrets Manager,
+Cognito, the MCP gateway, Bedrock client creation). StartupTimer records how
+long each step takes and runs independent steps concurrently on threads so
+that only the dependency chain, not the sum of all steps, is on the critical
+path.
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+import metrics
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+
+def is_worker_process() -> bool:
+    """Whether this is a multiprocessing worker (e.g. of the PDF process pool)
+
+    Spawned workers re-import the main module, so code at its top level also
+    runs in every worker.
+    """
+    return multiprocessing.parent_process() is not None
+
+
+class StartupTimer:
+    """Records per-step durations of a startup sequence"""
+
+    def __init__(self, name: str = "startup"):
+        self.name = name
+        self.steps: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, step_name: str):
+        """Time the with-block as step_name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.steps[step_name] = elapsed_ms
+            metrics.observe(f"{self.name}.{step_name}_ms", elapsed_ms)
+            logger.info(f"[{self.name}] {step_name} took {elapsed_ms:.0f}ms")
+
+    def run_parallel(self, steps: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+        """Run independent steps concurrently, each timed under its own name
+
+        Args:
+            steps: Callables keyed by step name
+
+        Returns:
+            Results keyed by step name
+
+        Raises:
+            The first exception raised by a step (after all steps have finished)
+        """
+        def timed(step_name, func):
+            with self.step(step_name):
+                return func()
+
+        with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix=self.name) as executor:
+            futures = {step_name: executor.submit(timed, step_name, func) for step_name, func in steps.items()}
+        return {step_name: future.result() for step_name, future in futures.items()}
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def log_summary(self) -> None:
+        """Log the timing breakdown of all steps and the wall-clock total"""
+        total_ms = self.total_ms()
+        metrics.observe(f"{self.name}.total_ms", total_ms)
+        with self._lock:
+            breakdown = ", ".join(f"{step_name}={ms:.0f}ms" for step_name, ms in self.steps.items())
+        logger.info(f"[{self.name}] Completed in {total_ms:.0f}ms ({breakdown})")
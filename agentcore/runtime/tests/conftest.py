@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Runtime modules import each other as top-level modules (as in the container)
+RUNTIME_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RUNTIME_DIR))
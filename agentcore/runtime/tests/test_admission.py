@@ -0,0 +1,34 @@
+import pytest
+
+import metrics
+from admission import OTHER_CLASS, AdmissionController, AdmissionRejected
+
+PRIORITIES = {"TEXT_MESSAGE": 0, "PROCESS_IMAGE": 1}
+
+
+@pytest.mark.parametrize("action,expected", [
+    ("TEXT_MESSAGE", "TEXT_MESSAGE"),
+    ("PROCESS_IMAGE", "PROCESS_IMAGE"),
+    ("text_message", OTHER_CLASS),
+    ("anything.the.client.sends", OTHER_CLASS),
+    ("", OTHER_CLASS),
+    (None, OTHER_CLASS),
+])
+def test_request_class(action, expected):
+    controller = AdmissionController(max_concurrency=1, max_queue_size=0, priorities=PRIORITIES)
+    assert controller.request_class(action) == expected
+
+
+def test_metric_names_use_known_classes():
+    controller = AdmissionController(max_concurrency=1, max_queue_size=0, priorities=PRIORITIES)
+
+    with controller.admit(controller.request_class("made-up-action")):
+        with pytest.raises(AdmissionRejected):
+            with controller.admit(controller.request_class("another-made-up-action")):
+                pass
+
+    snapshot = metrics.snapshot()
+    names = list(snapshot["counters"]) + list(snapshot["timings"])
+    assert f"admission.queue_ms.{OTHER_CLASS}" in names
+    assert f"admission.rejected.{OTHER_CLASS}.queue_full" in names
+    assert not [name for name in names if "made-up" in name]
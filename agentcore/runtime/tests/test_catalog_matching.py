@@ -0,0 +1,201 @@
+"""Table-driven checks of deterministic catalog matching, availability and option totals"""
+import json
+
+import pytest
+
+from catalog_matching import (
+    AVAILABLE, NOT_FOUND, OUT_OF_STOCK, PARTIAL, ItemMatch, RequestedItem, availability, choose_alternative,
+    format_options, match_item, parse_products, parse_quantity, parse_requested_items,
+)
+
+
+def product(name, price, stock, category="Dairy"):
+    return {"product_name": name, "price": price, "stock_level": stock, "product_category": category}
+
+
+MILK = product("Milk", 3.5, 20)
+MILK_LOW_FAT = product("Low Fat Milk", 3.8, 10)
+ALMOND_MILK = product("Almond Milk", 4.2, 0)
+EGGS = product("Free Range Eggs", 6.0, 3, category="Eggs")
+APPLE = product("Apple", 0.8, 50, category="Produce")
+BREAD = product("Sourdough Bread", 5.0, 0, category="Bakery")
+RYE_BREAD = product("Rye Bread", 4.5, 8, category="Bakery")
+WHITE_BREAD = product("White Bread", 3.0, 5, category="Bakery")
+
+PRODUCTS = [MILK, MILK_LOW_FAT, ALMOND_MILK, EGGS, APPLE, BREAD]
+
+
+@pytest.mark.parametrize("text,expected", [
+    (None, 1),
+    ("", 1),
+    ("3", 3),
+    ("1.5", 1.5),
+    ("1,5", 1.5),
+    ("1/2", 0.5),
+    ("two", 2),
+    ("A", 1),
+    ("1/0", 1),
+])
+def test_parse_quantity(text, expected):
+    assert parse_quantity(text) == expected
+
+
+@pytest.mark.parametrize("line,name,quantity,unit", [
+    ("- 2 Milk", "Milk", 2, None),
+    ("• 3 bags apples", "apples", 3, "bags"),
+    ("1. a dozen eggs", "eggs", 1, "dozen"),
+    ("- 2 x bread", "bread", 2, None),
+    ("- Butter", "Butter", 1, None),
+    ("- 1.5 kg of potatoes", "potatoes", 1.5, "kg"),
+])
+def test_parse_requested_items(line, name, quantity, unit):
+    assert parse_requested_items(line) == [RequestedItem(name=name, quantity=quantity, unit=unit)]
+
+
+def test_parse_requested_items_skips_other_lines_and_duplicates():
+    text = "Customer ID: c1\n\nExtracted Grocery List:\n- 2 Milk\n- 1 milk\n- 3 Eggs"
+    assert [item.name for item in parse_requested_items(text)] == ["Milk", "Eggs"]
+
+
+@pytest.mark.parametrize("name,expected", [
+    ("Milk", "Milk"),                         # Exact match wins over substring matches
+    ("free range eggs", "Free Range Eggs"),   # Case-insensitive exact
+    ("Range Eggs", "Free Range Eggs"),        # Single substring match
+    ("Apples", "Apple"),                      # Plural falls back to the singular
+])
+def test_match_resolves_single_product(name, expected):
+    match = match_item(RequestedItem(name=name), PRODUCTS)
+    assert match.resolved
+    assert match.product["product_name"] == expected
+
+
+@pytest.mark.parametrize("name,candidates", [
+    ("Fat", ["Low Fat Milk"]),
+    ("Bread", ["Sourdough Bread"]),
+])
+def test_match_candidates(name, candidates):
+    assert [product["product_name"] for product in match_item(RequestedItem(name=name), PRODUCTS).candidates] \
+        == candidates
+
+
+def test_ambiguous_match_is_left_to_the_agent():
+    match = match_item(RequestedItem(name="Milk"), [MILK_LOW_FAT, ALMOND_MILK])
+    assert not match.resolved
+    assert match.status == NOT_FOUND
+    assert [product["product_name"] for product in match.candidates] == ["Low Fat Milk", "Almond Milk"]
+
+
+def test_unknown_item_is_not_found():
+    match = match_item(RequestedItem(name="Caviar"), PRODUCTS)
+    assert not match.resolved
+    assert match.candidates == []
+    assert match.status == NOT_FOUND
+
+
+@pytest.mark.parametrize("quantity,stock,expected", [
+    (2, 20, AVAILABLE),
+    (3, 3, AVAILABLE),
+    (5, 3, PARTIAL),
+    (1, 0, OUT_OF_STOCK),
+    (1, -1, OUT_OF_STOCK),
+])
+def test_availability(quantity, stock, expected):
+    assert availability(quantity, stock) == expected
+
+
+def test_match_sets_availability_from_stock():
+    assert match_item(RequestedItem(name="Free Range Eggs", quantity=5), PRODUCTS).status == PARTIAL
+    assert match_item(RequestedItem(name="Almond Milk"), PRODUCTS).status == OUT_OF_STOCK
+
+
+@pytest.mark.parametrize("text,names", [
+    (json.dumps({"statusCode": 200, "body": json.dumps([MILK, {"name": "no product_name"}])}), ["Milk"]),
+    (json.dumps([EGGS]), ["Free Range Eggs"]),
+    (json.dumps({"statusCode": 200, "body": json.dumps({"error": "boom"})}), []),
+    ("not json", []),
+])
+def test_parse_products(text, names):
+    assert [product["product_name"] for product in parse_products(text)] == names
+
+
+@pytest.mark.parametrize("catalogue,exclude,expected", [
+    # Same number of shared words: cheapest
+    ([RYE_BREAD, WHITE_BREAD], [], "White Bread"),
+    # Most shared words first, whatever the price
+    ([product("Sourdough Bread Rolls", 6.0, 2, "Bakery"), WHITE_BREAD], [], "Sourdough Bread Rolls"),
+    # Products already chosen for the order are skipped
+    ([RYE_BREAD, WHITE_BREAD], ["White Bread"], "Rye Bread"),
+    # Nothing in stock in the category
+    ([product("Rye Bread", 4.5, 0, "Bakery"), APPLE], [], None),
+])
+def test_choose_alternative(catalogue, exclude, expected):
+    match = ItemMatch(item=RequestedItem(name="Sourdough Bread"), product=BREAD, status=OUT_OF_STOCK)
+    alternative = choose_alternative(match, catalogue, exclude)
+    assert (alternative and alternative["product_name"]) == expected
+
+
+def option_section(text, title):
+    """Lines of the option starting with title, up to its Total line"""
+    lines = text.splitlines()
+    start = next(index for index, line in enumerate(lines) if line.startswith(title))
+    end = next(index for index in range(start, len(lines)) if lines[index].startswith("Total:"))
+    return lines[start + 1:end + 1]
+
+
+def resolved(name, quantity, catalog_product, alternative=None):
+    item = RequestedItem(name=name, quantity=quantity)
+    match = ItemMatch(item=item, product=catalog_product,
+                      status=availability(quantity, catalog_product["stock_level"]))
+    match.alternative = alternative
+    return match
+
+
+def test_options_with_partial_and_alternative():
+    matches = [
+        resolved("Milk", 2, MILK),
+        resolved("Eggs", 5, EGGS),                      # Partial: 3 of 5 in stock
+        resolved("Sourdough Bread", 1, BREAD, WHITE_BREAD),
+        ItemMatch(item=RequestedItem(name="Caviar")),
+    ]
+    text = format_options("c1", matches)
+
+    assert text.startswith("Customer ID: c1\n")
+    assert "• Free Range Eggs (3) - $18.00 ⚠️ only 3 of 5 in stock" in text
+    assert "• Sourdough Bread (1)\n  Alternative: White Bread - $3.00" in text
+    assert "❓ Not in our catalogue:\n• Caviar (1)" in text
+    assert option_section(text, "OPTION 1") == [
+        "• Milk (2) - $7.00",
+        "• Free Range Eggs (3) - $18.00",
+        "Total: $25.00",
+    ]
+    assert option_section(text, "OPTION 2") == [
+        "• Milk (2) - $7.00",
+        "• Free Range Eggs (3) - $18.00",
+        "• White Bread (1) - $3.00",
+        "Total: $28.00",
+    ]
+    assert text.endswith('Reply "Option 1" or "Option 2" to confirm your order.')
+
+
+def test_out_of_stock_without_alternative_is_left_out_of_both_options():
+    text = format_options("c1", [resolved("Milk", 1, MILK), resolved("Sourdough Bread", 2, BREAD)])
+
+    assert "❌ Out of stock:\n• Sourdough Bread (2)\n\n" in text
+    assert "Alternative:" not in text
+    assert option_section(text, "OPTION 1") == ["• Milk (1) - $3.50", "Total: $3.50"]
+    assert option_section(text, "OPTION 2") == ["• Milk (1) - $3.50", "Total: $3.50"]
+
+
+def test_alternative_quantity_is_capped_by_its_stock():
+    text = format_options("c1", [resolved("Sourdough Bread", 8, BREAD, WHITE_BREAD)])
+    assert option_section(text, "OPTION 2") == ["• White Bread (5) - $15.00", "Total: $15.00"]
+
+
+@pytest.mark.parametrize("quantity,price,expected_total", [
+    (1, 1234.5, "$1,234.50"),
+    (3, 0.1, "$0.30"),
+    (0.5, 9.99, "$5.00"),
+])
+def test_option_total_formatting(quantity, price, expected_total):
+    text = format_options("c1", [resolved("Cheese", quantity, product("Cheese", price, 100))])
+    assert option_section(text, "OPTION 1")[-1] == f"Total: {expected_total}"
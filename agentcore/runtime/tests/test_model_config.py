@@ -0,0 +1,49 @@
+"""Checks of the shipped model configs"""
+from pathlib import Path
+
+import pytest
+import yaml
+
+from model_tiering import TierSignals, TieringPolicy, base_model_id
+
+CONFIG_FILES = sorted(Path(__file__).resolve().parent.parent.glob("model_config.*.yaml"))
+
+
+def load(path):
+    with open(path) as f:
+        return yaml.safe_load(f)
+
+
+def tiered_agents():
+    params = []
+    for path in CONFIG_FILES:
+        tiering = load(path).get("tiering", {})
+        if tiering.get("enabled", False):
+            for agent_name in tiering.get("agents") or {}:
+                params.append(pytest.param(path, agent_name, id=f"{path.name}-{agent_name}"))
+    return params
+
+
+@pytest.mark.parametrize("path,agent_name", tiered_agents())
+def test_simple_requests_keep_agent_model(path, agent_name):
+    config = load(path)
+    tiers = config["tiering"]["tiers"]
+    agent_config = config["tiering"]["agents"][agent_name]
+    agent_model = config["agents"][agent_name]["model_id"]
+    assert base_model_id(tiers, agent_config) == agent_model
+
+    policy = TieringPolicy.from_config([tier["name"] for tier in tiers], agent_config)
+    assert tiers[policy.initial_tier(TierSignals(items=1))]["model_id"] == agent_model
+
+
+@pytest.mark.parametrize("path,agent_name", tiered_agents())
+def test_tiered_agents_can_change_tier(path, agent_name):
+    tiering = load(path)["tiering"]
+    policy = TieringPolicy.from_config([tier["name"] for tier in tiering["tiers"]], tiering["agents"][agent_name])
+    assert policy.can_change_tier
+
+
+@pytest.mark.parametrize("base_tier,expected", [("small", True), ("large", False)])
+def test_can_change_tier(base_tier, expected):
+    policy = TieringPolicy.from_config(["small", "large"], {"base_tier": base_tier})
+    assert policy.can_change_tier is expected
@@ -0,0 +1,18 @@
+from strands.models import BedrockModel
+
+from model_fallback import FallbackModel
+
+PRIMARY_ID = "us.anthropic.claude-sonnet-4-20250514-v1:0"
+FALLBACK_ID = "global.anthropic.claude-haiku-4-5-20251001-v1:0"
+
+
+def test_config_follows_primary_model():
+    model = FallbackModel("order", [
+        BedrockModel(region_name="us-west-2", model_id=PRIMARY_ID),
+        BedrockModel(region_name="us-west-2", model_id=FALLBACK_ID),
+    ])
+    assert model.config.get("model_id") == PRIMARY_ID
+
+    model.update_config(model_id="us.amazon.nova-lite-v1:0", temperature=0)
+    assert model.config.get("model_id") == "us.amazon.nova-lite-v1:0"
+    assert model.models[1].config.get("model_id") == FALLBACK_ID
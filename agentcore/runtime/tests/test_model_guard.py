@@ -0,0 +1,13 @@
+from strands.models import BedrockModel
+
+from model_guard import AdaptiveLimiter, GuardedModel
+
+MODEL_ID = "global.anthropic.claude-haiku-4-5-20251001-v1:0"
+
+
+def test_config_follows_wrapped_model():
+    model = GuardedModel(BedrockModel(region_name="us-west-2", model_id=MODEL_ID), AdaptiveLimiter("catalog"))
+    assert model.config.get("model_id") == MODEL_ID
+
+    model.update_config(model_id="us.amazon.nova-lite-v1:0")
+    assert model.config.get("model_id") == "us.amazon.nova-lite-v1:0"
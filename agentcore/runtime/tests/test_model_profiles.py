@@ -0,0 +1,72 @@
+"""Checks that agent inference profiles configure BedrockModel without deprecated options"""
+import warnings
+from pathlib import Path
+
+import pytest
+import yaml
+from strands.models import BedrockModel
+
+from model_profiles import build_inference_profile
+
+CONFIG_FILES = sorted(Path(__file__).resolve().parent.parent.glob("model_config.*.yaml"))
+
+TOOL_SPEC = {"name": "search", "description": "Search", "inputSchema": {"json": {"type": "object"}}}
+
+
+def agent_profiles():
+    params = []
+    for path in CONFIG_FILES:
+        with open(path) as f:
+            config = yaml.safe_load(f)
+        for agent_name, agent_config in config["agents"].items():
+            params.append(pytest.param(agent_name, agent_config, id=f"{path.name}-{agent_name}"))
+    return params
+
+
+@pytest.mark.parametrize("agent_name,agent_config", agent_profiles())
+def test_profile_emits_no_warnings(agent_name, agent_config):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        model = BedrockModel(region_name="us-west-2", **build_inference_profile(agent_name, agent_config))
+        model.format_request(
+            [{"role": "user", "content": [{"text": "hello"}]}],
+            tool_specs=[TOOL_SPEC],
+            system_prompt_content=[{"text": "You are a grocery assistant."}],
+        )
+    assert [str(warning.message) for warning in caught] == []
+
+
+def test_cache_points_follow_profile():
+    profile = build_inference_profile("catalog", {
+        "model_id": "global.anthropic.claude-haiku-4-5-20251001-v1:0",
+        "cache_prompt": True,
+        "cache_tools": True,
+    })
+    request = BedrockModel(region_name="us-west-2", **profile).format_request(
+        [{"role": "user", "content": [{"text": "hello"}]}],
+        tool_specs=[TOOL_SPEC],
+        system_prompt_content=[{"text": "You are a grocery assistant."}],
+    )
+    assert "cachePoint" in request["system"][-1]
+    assert "cachePoint" in request["toolConfig"]["tools"][-1]
+
+
+def test_no_cache_settings_leave_cache_config_unset():
+    profile = build_inference_profile("warehouse", {"model_id": "us.amazon.nova-lite-v1:0"})
+    assert profile["cache_config"] is None
+
+
+def test_cache_settings_ignored_for_models_without_caching():
+    profile = build_inference_profile("warehouse", {
+        "model_id": "us.amazon.nova-lite-v1:0",
+        "cache_prompt": True,
+        "cache_tools": True,
+    })
+    assert profile["cache_config"] is None
+
+    request = BedrockModel(region_name="us-west-2", **profile).format_request(
+        [{"role": "user", "content": [{"text": "hello"}]}],
+        tool_specs=[TOOL_SPEC],
+        system_prompt_content=[{"text": "You are a delivery assistant."}],
+    )
+    assert "cachePoint" not in str(request)
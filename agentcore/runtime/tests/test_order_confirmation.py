@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from order_confirmation import parse_lambda_body, parse_placed_order
+
+PLAIN = """Order placed successfully.
+Order ID: ORD-1
+Customer ID: CUST-7
+1. Organic Bananas - 2 kg × $3.50 = $7.00
+2. Milk - 1 x $5.00 = $5.00
+Total Amount: $12.00"""
+
+BOLD = """Order placed successfully.
+**Order ID:** ORD-1
+**Customer ID:** CUST-7
+1. **Organic Bananas** - 2 kg × $3.50 = $7.00
+2. **Milk** - 1 × $5.00 = **$5.00**
+**Total Amount:** $12.00"""
+
+
+@pytest.mark.parametrize("text", [PLAIN, BOLD], ids=["plain", "bold"])
+def test_parse_placed_order(text):
+    order = parse_placed_order(text)
+
+    assert order.order_id == "ORD-1"
+    assert order.customer_id == "CUST-7"
+    assert order.total == "12.00"
+    assert order.items == [
+        {"name": "Organic Bananas", "quantity": "2 kg", "subtotal": "7.00"},
+        {"name": "Milk", "quantity": "1", "subtotal": "5.00"},
+    ]
+
+
+@pytest.mark.parametrize("line,expected", [
+    ("1. Milk - 1 × $5.00 = $5.00", {"name": "Milk", "quantity": "1", "subtotal": "5.00"}),
+    ("1. Milk - 1 x $5.00 = $5.00", {"name": "Milk", "quantity": "1", "subtotal": "5.00"}),
+    ("1) `Milk` - 2 x 5.00 = 10.00", {"name": "Milk", "quantity": "2", "subtotal": "10.00"}),
+    ("1. TV - 1 × $1,234.50 = $1,234.50", {"name": "TV", "quantity": "1", "subtotal": "1,234.50"}),
+])
+def test_parse_order_item(line, expected):
+    order = parse_placed_order(f"Order ID: ORD-1\n{line}\nTotal Amount: $1.00")
+
+    assert order.items == [expected]
+
+
+@pytest.mark.parametrize("total,expected", [
+    ("$12.00", "12.00"),
+    ("$1,234.5", "1234.50"),
+    ("**$1,234.50**", "1234.50"),
+    ("12", "12.00"),
+])
+def test_parse_total(total, expected):
+    order = parse_placed_order(f"Order ID: ORD-1\n1. Milk - 1 × $5.00 = $5.00\nTotal Amount: {total}")
+
+    assert order.total == expected
+    assert order.customer_id is None
+
+
+@pytest.mark.parametrize("text", [
+    "1. Milk - 1 × $5.00 = $5.00\nTotal Amount: $5.00",  # No order ID
+    "Order ID: ORD-1\n1. Milk - 1 × $5.00 = $5.00",       # No total
+    "Order ID: ORD-1\nTotal Amount: $5.00",               # No items
+    "Sorry, I could not place your order.",
+])
+def test_incomplete_order(text):
+    assert parse_placed_order(text) is None
+
+
+@pytest.mark.parametrize("tool_text,expected", [
+    (json.dumps({"statusCode": 200, "body": json.dumps({"postcode": "SW1A"})}), {"postcode": "SW1A"}),
+    (json.dumps({"statusCode": 200, "body": {"postcode": "SW1A"}}), {"postcode": "SW1A"}),
+    (json.dumps({"statusCode": 200, "body": "not json"}), None),
+    (json.dumps({"statusCode": 400, "body": json.dumps({"error": "bad request"})}), None),
+    (json.dumps({"statusCode": 500, "body": "Internal Server Error"}), None),
+    (json.dumps([{"slot_date": "2026-10-19"}]), [{"slot_date": "2026-10-19"}]),
+    ("Error: tool timed out", None),
+])
+def test_parse_lambda_body(tool_text, expected):
+    assert parse_lambda_body(tool_text) == expected
@@ -0,0 +1,40 @@
+"""Checks that multiprocessing workers never start the runtime's eager initialisation"""
+import ast
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from startup import is_worker_process
+
+RUNTIME_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_main_process_is_not_a_worker():
+    assert not is_worker_process()
+
+
+def test_spawned_worker_is_detected():
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        assert pool.submit(is_worker_process).result(timeout=60)
+
+
+def test_eager_init_only_runs_under_main_guard():
+    """Spawned workers re-import the entry module as __mp_main__, so eager init must not run at its top level"""
+    tree = ast.parse((RUNTIME_DIR / "order_assistant.py").read_text())
+
+    def calls(nodes):
+        return [
+            node.func.id
+            for statement in nodes
+            for node in ast.walk(statement)
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+        ]
+
+    main_guards = [
+        node for node in tree.body
+        if isinstance(node, ast.If) and "__main__" in ast.unparse(node.test)
+    ]
+    top_level = [node for node in tree.body if node not in main_guards]
+
+    assert "start_eager_init" not in calls(top_level)
+    assert "start_eager_init" in calls(main_guards)
@@ -0,0 +1,37 @@
+"""Checks of which gateway tool results the cross-request cache keeps"""
+import json
+
+from tool_cache import is_cacheable
+
+
+def tool_result(payload, status="success"):
+    return {"toolUseId": "1", "status": status, "content": [{"text": json.dumps(payload)}]}
+
+
+def test_caches_successful_lambda_response():
+    body = {"customer_id": "c1", "postcode": "2000"}
+    assert is_cacheable(tool_result({"statusCode": 200, "body": json.dumps(body)}))
+
+
+def test_skips_failed_tool_call():
+    assert not is_cacheable({"toolUseId": "1", "status": "error", "content": [{"text": "Tool execution failed"}]})
+
+
+def test_skips_error_status_code():
+    body = {"error": "Validation error", "message": "customer_id is required"}
+    assert not is_cacheable(tool_result({"statusCode": 400, "body": json.dumps(body)}))
+
+
+def test_skips_customer_not_found_in_body():
+    body = {"error": "Customer c404 not found", "customer_id": "c404", "postcode": None}
+    assert not is_cacheable(tool_result({"statusCode": 200, "body": json.dumps(body)}))
+
+
+def test_skips_nested_status_code_in_body():
+    body = {"statusCode": 404, "body": json.dumps({"message": "Not found"})}
+    assert not is_cacheable(tool_result({"statusCode": 200, "body": json.dumps(body)}))
+
+
+def test_caches_plain_text_result():
+    result = {"toolUseId": "1", "status": "success", "content": [{"text": "OPTION 1: Milk 2L - $3.50"}]}
+    assert is_cacheable(result)
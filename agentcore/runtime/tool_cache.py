@@ -0,0 +1,197 @@
+"""Cross-request result cache for read-only MCP gateway tools
+
+Customer lookups are repeated with the same arguments across requests, and
+each call costs a gateway hop plus a Lambda invocation. CachedTool wraps an
+MCP tool and serves successful results from a size-bounded LRU cache with a
+per-tool TTL. Only tools with a configured TTL are cached; write tools are
+never cached, even if configured. Results that carry stock or prices (the
+catalog searches) should not be given a TTL.
+"""
+import copy
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from strands.types._events import ToolResultEvent
+from strands.types.tools import AgentTool
+
+import metrics
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+# Tools with side effects - never served from cache
+NEVER_CACHE = {"place_order", "update_order_status"}
+
+
+def short_tool_name(tool_name: str) -> str:
+    """Strip the gateway target prefix (e.g. 'DynamoDBMCPTarget___place_order' → 'place_order')"""
+    return tool_name.split("___", 1)[-1]
+
+
+def normalize_arguments(value: Any) -> Any:
+    """Normalise tool arguments so equivalent calls share a cache key
+
+    Strings are stripped and lower-cased, dict keys are sorted and lists of
+    scalars are sorted (the catalog search treats product names as a set).
+    """
+    if isinstance(value, str):
+        return value.strip().lower()
+    if isinstance(value, dict):
+        return {key: normalize_arguments(value[key]) for key in sorted(value)}
+    if isinstance(value, (list, tuple)):
+        items = [normalize_arguments(item) for item in value]
+        if all(isinstance(item, (str, int, float, bool)) or item is None for item in items):
+            return sorted(items, key=lambda item: (str(type(item)), str(item)))
+        return items
+    return value
+
+
+def is_error_response(response: Any) -> bool:
+    """Whether a Lambda response reports an error
+
+    Errors are a 4xx/5xx statusCode or an error field, at the top level or in
+    the (possibly JSON-encoded) body, e.g. a customer lookup returning
+    {"statusCode": 200, "body": "{\"error\": \"Customer ... not found\"}"}.
+    """
+    if isinstance(response, str):
+        try:
+            response = json.loads(response)
+        except ValueError:
+            return False
+    if not isinstance(response, dict):
+        return False
+
+    try:
+        if int(response.get("statusCode", 200)) >= 400:
+            return True
+    except (TypeError, ValueError):
+        return True
+    if "error" in response or "errorMessage" in response:
+        return True
+    return is_error_response(response.get("body"))
+
+
+def is_cacheable(result: Dict[str, Any]) -> bool:
+    """Only cache successful results (the gateway reports Lambda error responses as success)"""
+    if result.get("status") != "success":
+        return False
+    return not any(is_error_response(item.get("json", item.get("text"))) for item in result.get("content", []))
+
+
+class ToolResultCache:
+    """Size-bounded LRU cache of tool results with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def put(self, key: str, result: Dict[str, Any], ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, result)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            size = len(self._entries)
+        if evicted:
+            metrics.increment("tool_cache.evictions", evicted)
+        metrics.set_gauge("tool_cache.entries", size)
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class CachedTool(AgentTool):
+    """AgentTool wrapper that serves repeated calls from a ToolResultCache"""
+
+    def __init__(self, tool: AgentTool, cache: ToolResultCache, ttl: float):
+        super().__init__()
+        self.tool = tool
+        self.cache = cache
+        self.ttl = ttl
+
+    @property
+    def tool_name(self) -> str:
+        return self.tool.tool_name
+
+    @property
+    def tool_spec(self):
+        return self.tool.tool_spec
+
+    @property
+    def tool_type(self) -> str:
+        return self.tool.tool_type
+
+    def cache_key(self, tool_input: Dict[str, Any]) -> str:
+        return f"{self.tool_name}:{json.dumps(normalize_arguments(tool_input or {}), sort_keys=True)}"
+
+    async def stream(self, tool_use, invocation_state, **kwargs):
+        key = self.cache_key(tool_use.get("input"))
+        name = short_tool_name(self.tool_name)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            metrics.increment(f"tool_cache.hits.{name}")
+            result = copy.deepcopy(cached)
+            result["toolUseId"] = tool_use["toolUseId"]
+            yield ToolResultEvent(result)
+            return
+
+        metrics.increment(f"tool_cache.misses.{name}")
+        async for event in self.tool.stream(tool_use, invocation_state, **kwargs):
+            if isinstance(event, ToolResultEvent):
+                result = event.get("tool_result") or {}
+                if is_cacheable(result):
+                    self.cache.put(key, copy.deepcopy(result), self.ttl)
+            yield event
+
+
+def wrap_tools(tools: List[AgentTool], cache: ToolResultCache, ttls: Dict[str, float]) -> List[AgentTool]:
+    """Wrap the tools that have a configured TTL in CachedTool
+
+    Args:
+        tools: Tools loaded from the MCP gateway
+        cache: Shared result cache
+        ttls: Seconds to keep results, keyed by full or short tool name
+
+    Returns:
+        Tools in the same order, cacheable ones wrapped
+    """
+    wrapped = []
+    for tool in tools:
+        name = short_tool_name(tool.tool_name)
+        ttl = ttls.get(tool.tool_name, ttls.get(name))
+
+        if ttl and name in NEVER_CACHE:
+            logger.warning(f"Ignoring cache TTL for write tool '{tool.tool_name}'")
+            ttl = None
+
+        if ttl:
+            logger.info(f"Caching results of '{tool.tool_name}' for {ttl}s")
+            wrapped.append(CachedTool(tool, cache, ttl))
+        else:
+            wrapped.append(tool)
+    return wrapped
@@ -0,0 +1,185 @@
+"""Image pre-processing before the image processor model call
+
+Phone photos arrive at full camera resolution, which costs vision tokens and
+upload time without helping the model read a grocery list. Images are
+auto-rotated, cropped to their content, converted to grayscale if they look
+like text on paper (low colour saturation), downscaled to a target long edge
+and re-encoded as JPEG. Synchronous callers (tools already running on a
+worker thread) process the image in their own thread; async callers use
+preprocess_image_async, which runs the CPU-bound work in a small dedicated
+worker pool so several images are processed at once.
+
+Settings come from the image_preprocessing section of the model config (see
+configure()); Pillow is optional and images pass through unchanged without it.
+"""
+import asyncio
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Tuple
+
+import metrics
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+# Anthropic estimate of vision tokens per image: width * height / 750
+PIXELS_PER_TOKEN = 750
+
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "max_long_edge": 1568,       # Larger images are downscaled by the model anyway
+    "jpeg_quality": 85,
+    "grayscale": True,           # Grocery lists are text; colour rarely helps
+    "grayscale_max_saturation": 48,  # Mean saturation (0-255) up to which an image counts as text-heavy
+    "crop_borders": True,
+    "border_threshold": 24,      # Pixel difference from the corner colour counted as content
+    "border_margin": 16,         # Pixels kept around the detected content
+    "max_input_bytes": 20_000_000,
+    "workers": 2,
+}
+
+settings: Dict[str, Any] = dict(DEFAULT_SETTINGS)
+_executor = None
+
+
+def configure(config: Dict[str, Any]) -> None:
+    """Apply the image_preprocessing section of the model config"""
+    global _executor
+
+    settings.update(config or {})
+    if _executor is not None:
+        # Running tasks finish on the old pool; its threads exit afterwards
+        _executor.shutdown(wait=False)
+        _executor = None
+    logger.info(f"Image pre-processing settings: {settings}")
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings["workers"], thread_name_prefix="image_preprocess")
+    return _executor
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    return max(1, width * height // PIXELS_PER_TOKEN)
+
+
+def _crop_borders(image):
+    """Crop uniform borders (table, background) around the list"""
+    from PIL import Image, ImageChops
+
+    gray = image.convert("L")
+    background = Image.new("L", gray.size, gray.getpixel((0, 0)))
+    diff = ImageChops.difference(gray, background).point(
+        lambda value: 255 if value > settings["border_threshold"] else 0
+    )
+    bbox = diff.getbbox()
+    if bbox is None:
+        return image
+
+    margin = settings["border_margin"]
+    left, top, right, bottom = bbox
+    bbox = (max(left - margin, 0), max(top - margin, 0),
+            min(right + margin, image.width), min(bottom + margin, image.height))
+    return image.crop(bbox)
+
+
+def _is_text_heavy(image) -> bool:
+    """Whether an image looks like text on paper (low mean colour saturation) rather than a colour photo"""
+    from PIL import ImageStat
+
+    sample = image.convert("RGB")
+    sample.thumbnail((64, 64))
+    saturation = ImageStat.Stat(sample.convert("HSV").getchannel("S")).mean[0]
+    return saturation <= settings["grayscale_max_saturation"]
+
+
+def _preprocess(data: bytes, fmt: str) -> Tuple[bytes, str]:
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        input_size = original.size
+        image = ImageOps.exif_transpose(original)
+
+        if settings["crop_borders"]:
+            image = _crop_borders(image)
+
+        grayscale = settings["grayscale"] and _is_text_heavy(image)
+        metrics.increment("image_preprocess.grayscale" if grayscale else "image_preprocess.colour")
+        image = image.convert("L") if grayscale else image.convert("RGB")
+
+        max_edge = settings["max_long_edge"]
+        if max(image.size) > max_edge:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=settings["jpeg_quality"], optimize=True)
+        output = buffer.getvalue()
+        output_size = image.size
+
+    if len(output) >= len(data) and output_size == input_size:
+        # Nothing to gain, keep the original encoding
+        output, output_size = data, input_size
+    else:
+        fmt = "jpeg"
+
+    metrics.observe("image_preprocess.input_bytes", len(data))
+    metrics.observe("image_preprocess.output_bytes", len(output))
+    metrics.observe("image_preprocess.input_tokens_est", estimate_image_tokens(*input_size))
+    metrics.observe("image_preprocess.output_tokens_est", estimate_image_tokens(*output_size))
+    logger.info(
+        f"Pre-processed image {input_size[0]}x{input_size[1]} ({len(data)} bytes) -> "
+        f"{output_size[0]}x{output_size[1]} ({len(output)} bytes)"
+    )
+    return output, fmt
+
+
+def _should_preprocess(data: bytes, fmt: str) -> bool:
+    if not settings["enabled"] or fmt == "gif" or len(data) > settings["max_input_bytes"]:
+        return False
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        logger.warning("Pillow is not installed, skipping image pre-processing")
+        return False
+    return True
+
+
+def _preprocess_or_original(data: bytes, fmt: str) -> Tuple[bytes, str]:
+    start = time.perf_counter()
+    try:
+        return _preprocess(data, fmt)
+    except Exception as e:
+        logger.error(f"Image pre-processing failed, using original image: {e}")
+        metrics.increment("image_preprocess.failures")
+        return data, fmt
+    finally:
+        metrics.observe("image_preprocess.ms", (time.perf_counter() - start) * 1000)
+
+
+def preprocess_image(data: bytes, fmt: str) -> Tuple[bytes, str]:
+    """Shrink an image for the vision model, in the calling thread
+
+    Args:
+        data: Encoded image bytes
+        fmt: Bedrock image format of data (jpeg, png, gif, webp)
+
+    Returns:
+        Tuple of (image bytes, format); the input unchanged if pre-processing is
+        disabled, unavailable or fails
+    """
+    if not _should_preprocess(data, fmt):
+        return data, fmt
+    return _preprocess_or_original(data, fmt)
+
+
+async def preprocess_image_async(data: bytes, fmt: str) -> Tuple[bytes, str]:
+    """Shrink an image for the vision model on the worker pool (see preprocess_image)"""
+    if not _should_preprocess(data, fmt):
+        return data, fmt
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), _preprocess_or_original, data, fmt)
@@ -0,0 +1,134 @@
+"""Local text extraction for PDF grocery lists and purchase orders
+
+Most PDFs customers send are generated by ordering or accounting software and
+carry a text layer, so their contents can be read without a vision model.
+Pages are extracted in parallel worker processes (pypdf is pure Python, so
+threads would serialise on the GIL, and pdfium is not thread-safe). Workers
+are spawned rather than forked: the runtime is multithreaded, and a forked
+child can inherit locks held by other threads and deadlock. Pages
+without a usable text layer (scans, photos saved as PDF) are reported as None
+and can be rendered to images with render_pages() for the vision model.
+
+pypdf is required for text extraction; pypdfium2 is optional and only used to
+render scanned pages.
+"""
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import metrics
+
+# Use root logger to ensure logs appear in CloudWatch
+logger = logging.getLogger()
+
+# A page with fewer extracted characters than this is treated as scanned
+MIN_PAGE_CHARS = 20
+
+# Documents with fewer pages are extracted in-process (worker start-up costs more)
+MIN_PARALLEL_PAGES = 4
+
+MAX_WORKERS = 4
+
+# Resolution of rendered scanned pages (1.0 = 72 dpi)
+RENDER_SCALE = 2.0
+
+_process_pool = None
+
+
+def _extract_pages(data: bytes, indices: List[int]) -> Dict[int, str]:
+    """Extract the text of the given pages (runs in a worker process)"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    return {index: reader.pages[index].extract_text() or "" for index in indices}
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _process_pool
+
+
+def page_count(data: bytes) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+
+def extract_text_pages(data: bytes) -> List[Optional[str]]:
+    """Extract the text layer of every page of a PDF
+
+    Args:
+        data: PDF bytes
+
+    Returns:
+        Text per page, or None for pages without a usable text layer
+
+    Raises:
+        Exception: If pypdf cannot read the PDF (e.g. encrypted or corrupt)
+    """
+    with metrics.timer("pdf_text.extract_ms"):
+        count = page_count(data)
+
+        if count < MIN_PARALLEL_PAGES:
+            texts = _extract_pages(data, list(range(count)))
+        else:
+            # One task per worker, each extracting an interleaved share of the pages
+            workers = min(MAX_WORKERS, count)
+            futures = [
+                get_process_pool().submit(_extract_pages, data, list(range(worker, count, workers)))
+                for worker in range(workers)
+            ]
+            texts = {}
+            for future in futures:
+                texts.update(future.result())
+
+    pages = []
+    for index in range(count):
+        text = texts[index].strip()
+        pages.append(text if len(text) >= MIN_PAGE_CHARS else None)
+
+    scanned = sum(1 for page in pages if page is None)
+    metrics.increment("pdf_text.pages", count)
+    metrics.increment("pdf_text.scanned_pages", scanned)
+    logger.info(f"Extracted text layer of {count - scanned}/{count} PDF pages")
+    return pages
+
+
+def can_render() -> bool:
+    try:
+        import pypdfium2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _render_page(data: bytes, index: int) -> bytes:
+    import pypdfium2 as pdfium
+
+    document = pdfium.PdfDocument(data)
+    try:
+        image = document[index].render(scale=RENDER_SCALE).to_pil()
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=85)
+        return buffer.getvalue()
+    finally:
+        document.close()
+
+
+def render_pages(data: bytes, indices: List[int]) -> List[bytes]:
+    """Render pages of a PDF to JPEG images, in parallel worker processes
+
+    Args:
+        data: PDF bytes
+        indices: Zero-based page numbers to render
+
+    Returns:
+        JPEG bytes per requested page, in order
+    """
+    with metrics.timer("pdf_text.render_ms"):
+        return list(get_process_pool().map(_render_page, [data] * len(indices), indices))
@@ -1,26 +1,121 @@
+import atexit
 import os
+import shutil
+import tempfile
+import time
+
 import boto3
+from botocore.config import Config
 from strands import tool
 
-s3_client = boto3.client("s3")
+import image_preprocess
+
+# Shared client: connections are pooled and kept alive across requests
+s3_client = boto3.client(
+    "s3",
+    config=Config(
+        max_pool_connections=32,
+        tcp_keepalive=True,
+        connect_timeout=5,
+        read_timeout=30,
+        retries={"max_attempts": 3, "mode": "standard"},
+    ),
+)
+
+# Images up to this size are returned to the model inline (Bedrock image block limit)
+MAX_INLINE_BYTES = 3_750_000
+
+# Larger objects are written here under unique names and removed after SPILL_TTL_SECONDS
+SPILL_DIR = os.path.join(tempfile.gettempdir(), "s3_spill")
+SPILL_TTL_SECONDS = 900
+
+IMAGE_FORMATS = {
+    "image/jpeg": "jpeg",
+    "image/jpg": "jpeg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+EXTENSION_FORMATS = {".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png", ".gif": "gif", ".webp": "webp"}
+
+
+def image_format(key: str, content_type: str):
+    """Bedrock image format of an object from its content type or extension, or None"""
+    fmt = IMAGE_FORMATS.get((content_type or "").split(";")[0].strip().lower())
+    if fmt is None:
+        fmt = EXTENSION_FORMATS.get(os.path.splitext(key)[1].lower())
+    return fmt
+
+
+def cleanup_spill_dir(max_age: float = SPILL_TTL_SECONDS) -> None:
+    """Remove spilled files older than max_age seconds"""
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(SPILL_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def spill_to_disk(key: str, body) -> str:
+    """Write an object body (stream or bytes) to a uniquely named file and return its path"""
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    cleanup_spill_dir()
+    suffix = os.path.splitext(key)[1]
+    with tempfile.NamedTemporaryFile(dir=SPILL_DIR, suffix=suffix, delete=False) as f:
+        if isinstance(body, bytes):
+            f.write(body)
+        else:
+            shutil.copyfileobj(body, f)
+        return f.name
+
+
+atexit.register(shutil.rmtree, SPILL_DIR, True)
 
 
 @tool(name="download_image_from_s3", description="Download files from Amazon S3 bucket")
-def download_image_from_s3(bucket: str, key: str) -> str:
+def download_image_from_s3(bucket: str, key: str) -> dict:
     """
-    Download an image from S3 to a temporary location.
+    Fetch an image from S3 for analysis.
+
+    Images are pre-processed (rotated, cropped, downscaled) and, if they fit
+    in MAX_INLINE_BYTES, returned directly as an image content block, so they
+    can be read without a separate image_reader call. Larger objects and
+    non-image files are saved to a uniquely named local file.
 
     Args:
         bucket: S3 bucket name
         key: S3 object key (e.g., 'grocery_list.pdf')
 
     Returns:
-        Local file path where the image was downloaded
+        Tool result with the image, or with the local file path of a large object
     """
-    # Use /tmp directory which is writable in Lambda/container environments
-    filename = os.path.basename(key)
-    download_path = os.path.join("/tmp", filename)
+    response = s3_client.get_object(Bucket=bucket, Key=key)
+    size = response.get("ContentLength", 0)
+    fmt = image_format(key, response.get("ContentType"))
 
-    s3_client.download_file(bucket, key, download_path)
+    if fmt is not None and size <= max(MAX_INLINE_BYTES, image_preprocess.settings["max_input_bytes"]):
+        data, fmt = image_preprocess.preprocess_image(response["Body"].read(), fmt)
+        if len(data) <= MAX_INLINE_BYTES:
+            return {
+                "status": "success",
+                "content": [
+                    {"text": f"Image s3://{bucket}/{key} ({len(data)} bytes) is attached below."},
+                    {"image": {"format": fmt, "source": {"bytes": data}}},
+                ],
+            }
+        body = data
+    else:
+        # Stream large objects straight to disk rather than holding them in memory
+        body = response["Body"]
 
-    return download_path
+    download_path = spill_to_disk(key, body)
+    return {
+        "status": "success",
+        "content": [{"text": f"File downloaded to local path: {download_path} (use image_reader to read it)"}],
+    }
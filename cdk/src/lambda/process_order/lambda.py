@@ -26,6 +26,16 @@ PENDING_ORDERS_TABLE = os.environ.get("PENDING_ORDERS_TABLE")
 # Cached values
 AGENT_ARN = None
 
+# WhatsApp text message body limit
+WHATSAPP_MAX_CHARS = 4096
+
+# Early progress messages sent while the agent works (first matching node only)
+PROGRESS_MESSAGES = {
+    "image_processor": "📋 Got your list! Checking our catalogue now...",
+    "document": "📋 Got your list! Checking our catalogue now...",
+    "order": "🛒 Placing your order...",
+}
+
 # DynamoDB client for pending orders
 dynamodb_client = session.client("dynamodb")
 
@@ -88,21 +98,19 @@ def delete_catalog_options(customer_id):
 
 
 def extract_agent_message(response_data):
-    """Extract message text from the router node (always the terminal node in our graph)
+    """Extract message text from the terminal node of our graph
 
-    The graph architecture ensures router is always the final node that formats
-    responses for the user:
-    - Path 1 (Image): router → image_processor → catalog → router [END]
-    - Path 2 (Order): router → order → warehouse → router [END]
+    The runtime returns the terminal node's text (already cleaned of <thinking>
+    blocks) for both paths:
+    - Path 1 (Image): router → image_processor → catalog → respond [END]
+    - Path 2 (Order): router → order → warehouse → respond [END]
 
     Args:
         response_data: The parsed JSON response from agent (dict or GraphResult object)
 
     Returns:
-        str: Extracted message text from router node
+        str: Extracted message text from terminal node
     """
-    import re
-
     logger.info("Extracting message from agent response")
     logger.info(f"Response data type: {type(response_data)}")
 
@@ -124,10 +132,10 @@ def extract_agent_message(response_data):
         node_names = list(results.keys())
         logger.info(f"Found {len(node_names)} node results: {node_names}")
 
-        # Try to get router node first (terminal node)
-        target_node = 'router'
+        # Try to get the terminal node first
+        target_node = 'respond'
         if target_node not in results:
-            logger.warning(f"Router node not found! Available nodes: {node_names}")
+            logger.warning(f"Terminal node not found! Available nodes: {node_names}")
             # Fallback to last node
             target_node = node_names[-1] if node_names else None
             if target_node:
@@ -136,7 +144,7 @@ def extract_agent_message(response_data):
                 logger.error("No nodes available in results")
                 return "Error: Unable to process the response. Please try again."
         else:
-            logger.info("Using router node (terminal node)")
+            logger.info("Using terminal node")
 
         # Navigate to the message text
         node_result = results[target_node]
@@ -173,11 +181,7 @@ def extract_agent_message(response_data):
         logger.info(f"Response string (first 500 chars): {response_str[:500]}")
         return "Error: Unexpected response format. Please try again."
 
-    # Remove <thinking> tags and their content
-    message_text = re.sub(r'<thinking>.*?</thinking>', '', message_text, flags=re.DOTALL)
-    message_text = re.sub(r'</?thinking>', '', message_text)
-    # Clean up extra whitespace
-    message_text = re.sub(r'\n\s*\n\s*\n', '\n\n', message_text).strip()
+    message_text = message_text.strip()
 
     logger.info(f"Extracted message length: {len(message_text)} chars")
     logger.info(f"Message preview: {message_text[:200]}...")
@@ -216,6 +220,9 @@ def handler(event, _context):
         # Handle different message types
         if customer_message["type"] == "image":
             handle_image_message(customer_message, session_id)
+        elif customer_message["type"] == "document" and customer_message["document"].get("mimeType") == "application/pdf":
+            # PDF grocery lists / purchase orders take the same path as images
+            handle_image_message(customer_message, session_id, media_type="document")
         elif customer_message["type"] == "text":
             reply(customer_message, session_id)
         else:
@@ -227,7 +234,7 @@ def handler(event, _context):
                     "to": f"+{customer_message['from']}",
                     "text": {
                         "preview_url": False,
-                        "body": "Sorry, this message type is not supported yet. Please send text or images.",
+                        "body": "Sorry, this message type is not supported yet. Please send text, images or PDF documents.",
                     },
                 }
             )
@@ -299,44 +306,19 @@ def reply(customer_message, session_id):
             logger.info(f"Invoking AgentCore with text message payload: {json.dumps(payload)}")
             logger.info(f"Using session ID: {session_id}")
 
-            agent_response = agentcore.invoke_agent_runtime(
-                agentRuntimeArn=agent_arn,
-                runtimeSessionId=session_id,
-                payload=json.dumps(payload),
-                qualifier="DEFAULT",
+            # Stream the agent response to the user as it arrives
+            message_text = invoke_agent_and_reply(
+                agent_arn, payload, session_id, customer_message["from"], PROGRESS_MESSAGES
             )
-
-            # Read and parse response
-            response_body = agent_response["response"].read()
-            logger.info(f"Response body type: {type(response_body)}")
-            logger.info(f"Response body (first 500 chars): {str(response_body)[:500]}")
-            response_data = json.loads(response_body)
-            logger.info(f"Parsed response_data type: {type(response_data)}")
-
-            # Extract message from router node (terminal node)
-            message_text = extract_agent_message(response_data)
             logger.info("Agent processing completed")
 
             # Delete catalog options after successful order (Path 2 - warehouse confirmation)
-            if "order confirmed" in message_text.lower() or "order id:" in message_text.lower():
+            if message_text is None:
+                logger.info("Runtime busy - keeping catalog options for the retry")
+            elif "order confirmed" in message_text.lower() or "order id:" in message_text.lower():
                 logger.info("Detected order confirmation - deleting catalog options")
                 delete_catalog_options(customer_message["from"])
 
-            # Send agent response to user
-            logger.info(f"About to send agent response to customer {customer_message['from']}")
-            logger.info(f"Response message length: {len(message_text)} characters")
-            send_whatsapp_message(
-                {
-                    "messaging_product": "whatsapp",
-                    "to": f"+{customer_message['from']}",
-                    "text": {
-                        "preview_url": False,
-                        "body": message_text,
-                    },
-                }
-            )
-            logger.info("Finished sending agent response")
-
         except Exception as error:
             logger.error(f"Error handling text message: {error}", exc_info=True)
             send_whatsapp_message(
@@ -408,24 +390,147 @@ def send_whatsapp_message(meta_message):
     logger.info("WhatsApp message sent successfully")
 
 
+def split_message(text, max_chars=WHATSAPP_MAX_CHARS):
+    """Split text into WhatsApp-sized chunks, preferring paragraph and line breaks
+
+    Returns:
+        tuple: (list of complete chunks, remaining text shorter than max_chars)
+    """
+    chunks = []
+    while len(text) > max_chars:
+        cut = text.rfind("\n\n", 0, max_chars)
+        if cut <= 0:
+            cut = text.rfind("\n", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        chunks.append(text[:cut].strip())
+        text = text[cut:].lstrip("\n")
+    return chunks, text
+
+
+def send_text_message(customer_id, body):
+    """Send a text message to the customer, split into WhatsApp-sized chunks"""
+    chunks, rest = split_message(body)
+    if rest.strip():
+        chunks.append(rest.strip())
+
+    for chunk in chunks:
+        send_whatsapp_message(
+            {
+                "messaging_product": "whatsapp",
+                "to": f"+{customer_id}",
+                "text": {
+                    "preview_url": False,
+                    "body": chunk,
+                },
+            }
+        )
 
 
-def handle_image_message(customer_message, session_id):
-    """Handle image messages
+def invoke_agent_and_reply(agent_arn, payload, session_id, customer_id, progress_messages=None):
+    """Invoke AgentCore and deliver its response to the customer as it arrives
+
+    Requests a streamed response. Node progress events trigger at most one early
+    progress message, and text chunks are sent as soon as a full WhatsApp-sized
+    message is buffered. Falls back to reading a single JSON response when the
+    runtime does not stream.
+
+    Args:
+        agent_arn: AgentCore runtime ARN
+        payload: Payload for the runtime (stream flag is added)
+        session_id: Session ID created in the handler
+        customer_id: Customer's mobile number to reply to
+        progress_messages: Optional mapping of node_id to progress message text
+
+    Returns:
+        str: Full message text sent to the customer, or None if the runtime was
+        too busy to take the request (the customer is asked to retry)
+    """
+    agent_response = agentcore.invoke_agent_runtime(
+        agentRuntimeArn=agent_arn,
+        runtimeSessionId=session_id,
+        payload=json.dumps(dict(payload, stream=True)),
+        qualifier="DEFAULT",
+    )
+
+    content_type = agent_response.get("contentType", "")
+    logger.info(f"Agent response content type: {content_type}")
+
+    if "text/event-stream" not in content_type:
+        # Read and parse response
+        response_body = agent_response["response"].read()
+        logger.info(f"Response body (first 500 chars): {str(response_body)[:500]}")
+        message_text = extract_agent_message(json.loads(response_body))
+        logger.info(f"Sending agent response to customer {customer_id} ({len(message_text)} characters)")
+        send_text_message(customer_id, message_text)
+        return message_text
+
+    start_time = time.time()
+    progress_sent = False
+    first_chunk_logged = False
+    buffer = ""
+    parts = []
+
+    for line in agent_response["response"].iter_lines(chunk_size=64):
+        if not line:
+            continue
+        line = line.decode("utf-8")
+        if not line.startswith("data: "):
+            continue
+
+        event = json.loads(line[len("data: "):])
+        if not isinstance(event, dict):
+            continue
+
+        event_type = event.get("type")
+        if event_type == "progress":
+            node_id = event.get("node")
+            logger.info(f"Agent progress: node '{node_id}' started ({time.time() - start_time:.1f}s)")
+            if progress_messages and not progress_sent and node_id in progress_messages:
+                send_text_message(customer_id, progress_messages[node_id])
+                progress_sent = True
+        elif event_type == "text":
+            if not first_chunk_logged:
+                logger.info(f"First response chunk received after {time.time() - start_time:.1f}s")
+                first_chunk_logged = True
+            parts.append(event.get("text", ""))
+            buffer += event.get("text", "")
+            chunks, buffer = split_message(buffer)
+            for chunk in chunks:
+                send_text_message(customer_id, chunk)
+        elif event_type == "busy":
+            logger.warning(f"Agent runtime busy, asking customer {customer_id} to retry")
+            send_text_message(customer_id, event.get("message", ""))
+            return None
+        elif event_type == "error" or "error" in event:
+            raise RuntimeError(event.get("message") or event.get("error"))
+
+    if buffer.strip():
+        send_text_message(customer_id, buffer)
+
+    message_text = "".join(parts).strip()
+    logger.info(f"Streamed agent response to customer {customer_id} ({len(message_text)} characters)")
+    return message_text
+
+
+def handle_image_message(customer_message, session_id, media_type="image"):
+    """Handle image messages (and PDF documents, which follow the same path)
 
     Args:
         customer_message: Message details from WhatsApp
         session_id: Session ID created in the handler
+        media_type: Message field holding the media details ("image" or "document")
     """
-    if not customer_message.get("image") or not customer_message["image"].get("id"):
-        logger.warning("No image data found in message")
+    media = customer_message.get(media_type)
+    if not media or not media.get("id"):
+        logger.warning(f"No {media_type} data found in message")
         return
 
     try:
-        logger.info(f"Receiving image with media ID: {customer_message['image']['id']}")
+        logger.info(f"Receiving {media_type} with media ID: {media['id']}")
 
         # Determine file extension from MIME type
-        mime_type = customer_message["image"].get("mimeType", "image/jpeg")
+        mime_type = media.get("mimeType", "image/jpeg")
         extension = mime_type.split("/")[1] if "/" in mime_type else "jpg"
 
         # Create unique filename
@@ -433,7 +538,7 @@ def handle_image_message(customer_message, session_id):
 
         # Download image from WhatsApp to S3
         response = social_messaging.get_whatsapp_message_media(
-            mediaId=customer_message["image"]["id"],
+            mediaId=media["id"],
             originationPhoneNumberId=PHONE_NUMBER_ID,
             destinationS3File={"bucketName": MEDIA_BUCKET_NAME, "key": file_name},
         )
@@ -464,48 +569,28 @@ def handle_image_message(customer_message, session_id):
             "customer_id": customer_message["from"],
             "s3_bucket": MEDIA_BUCKET_NAME,
             "s3_key": actual_s3_key,
+            "mime_type": mime_type,
+            # WhatsApp media hash lets the runtime reuse the extraction of a resent image
+            "image_sha256": media.get("sha256"),
         }
 
         logger.info(f"Invoking AgentCore with payload: {json.dumps(payload)}")
         logger.info(f"Using session ID: {session_id}")
 
-        agent_response = agentcore.invoke_agent_runtime(
-            agentRuntimeArn=agent_arn,
-            runtimeSessionId=session_id,
-            payload=json.dumps(payload),
-            qualifier="DEFAULT",
+        # Stream the agent response to the user as it arrives
+        message_text = invoke_agent_and_reply(
+            agent_arn, payload, session_id, customer_message["from"], PROGRESS_MESSAGES
         )
-        # Read and parse response
-        response_body = agent_response["response"].read()
-        logger.info(f"Response body type: {type(response_body)}")
-        logger.info(f"Response body (first 500 chars): {str(response_body)[:500]}")
-        response_data = json.loads(response_body)
-        logger.info(f"Parsed response_data type: {type(response_data)}")
-
-        # Extract message from router node (terminal node)
-        message_text = extract_agent_message(response_data)
         logger.info("Agent processing completed")
 
         # Store catalog options for Path 1 (image processing always returns catalog options)
-        # Path 1: router → image_processor → catalog → router [END]
+        # Path 1: router → image_processor → catalog → respond [END]
+        if message_text is None:
+            logger.info("Runtime busy - no catalog options to store")
+            return
         logger.info("Path 1 (PROCESS_IMAGE) - storing catalog options for later order confirmation")
         store_catalog_options(customer_message["from"], message_text)
 
-        # Send agent response to user
-        logger.info(f"About to send agent response to customer {customer_message['from']}")
-        logger.info(f"Response message length: {len(message_text)} characters")
-        send_whatsapp_message(
-            {
-                "messaging_product": "whatsapp",
-                "to": f"+{customer_message['from']}",
-                "text": {
-                    "preview_url": False,
-                    "body": message_text,
-                },
-            }
-        )
-        logger.info("Finished sending agent response")
-
     except Exception as error:
         logger.error(f"Error handling image message: {error}", exc_info=True)
 
@@ -570,6 +655,16 @@ def get_customer_message_details(event):
                 if message_type == "image"
                 else None
             ),
+            "document": (
+                {
+                    "id": message_object.get("document", {}).get("id"),
+                    "mimeType": message_object.get("document", {}).get("mime_type"),
+                    "sha256": message_object.get("document", {}).get("sha256"),
+                    "filename": message_object.get("document", {}).get("filename"),
+                }
+                if message_type == "document"
+                else None
+            ),
         }
 
         return message_details if message_details.get("from") else None
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark the catalog stage: catalog agent vs deterministic catalog node.
+
+Runs the same extracted grocery lists through a single-node graph for each
+catalog mode and reports latency and model token usage. Requires AWS
+credentials and a deployed gateway (the runtime is initialized as in the
+container).
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+RUNTIME_DIR = Path(__file__).resolve().parent.parent / "agentcore" / "runtime"
+
+SAMPLE_LISTS = [
+    ["2 Milk", "1 Bread", "12 Eggs", "5 Apples"],
+    ["3 cases Tomatoes", "2 kg Onions", "1 bag Rice", "4 bottles Olive Oil", "2 Butter"],
+    ["10 lb Chicken Breast", "6 Lemons", "2 bunches Coriander", "1 case Potatoes"],
+]
+
+
+def build_prompt(customer_id, items):
+    lines = "\n".join(f"- {item}" for item in items)
+    return f"Customer ID: {customer_id}\n\nExtracted Grocery List:\n{lines}"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_mode(core, mode, prompts, runs):
+    """Run every prompt `runs` times through a catalog-only graph in the given mode
+
+    Returns:
+        Dict with latencies (ms) and token totals
+    """
+    from strands.multiagent import GraphBuilder
+
+    latencies = []
+    input_tokens = 0
+    cache_read_tokens = 0
+    output_tokens = 0
+
+    with core.get_agent_pool().checkout(timeout=core.get_pool_timeout()) as agents:
+        builder = GraphBuilder()
+        builder.add_node(core.create_catalog_node(agents, mode=mode), "catalog")
+        builder.set_entry_point("catalog")
+        graph = builder.build()
+
+        for _ in range(runs):
+            for prompt in prompts:
+                # Start each request from an empty conversation, as a new session would
+                for agent in agents.conversation_agents().values():
+                    agent.messages = []
+
+                start = time.perf_counter()
+                result = graph(prompt)
+                latencies.append((time.perf_counter() - start) * 1000)
+                input_tokens += result.accumulated_usage.get("inputTokens", 0)
+                cache_read_tokens += result.accumulated_usage.get("cacheReadInputTokens", 0)
+                output_tokens += result.accumulated_usage.get("outputTokens", 0)
+
+    return {
+        "requests": len(latencies),
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 0.95),
+        "input_tokens": input_tokens,
+        "cache_read_tokens": cache_read_tokens,
+        "output_tokens": output_tokens,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark catalog agent vs deterministic catalog node")
+    parser.add_argument("--runs", type=int, default=3, help="Passes over the grocery lists per mode")
+    parser.add_argument("--lists", help="JSON file with a list of grocery lists (lists of item strings)")
+    parser.add_argument("--customer-id", default="benchmark", help="Customer ID used in the prompts")
+    parser.add_argument("--modes", default="agent,deterministic", help="Comma-separated catalog modes")
+    args = parser.parse_args()
+
+    grocery_lists = json.loads(Path(args.lists).read_text()) if args.lists else SAMPLE_LISTS
+    prompts = [build_prompt(args.customer_id, items) for items in grocery_lists]
+
+    sys.path.insert(0, str(RUNTIME_DIR))
+    import core
+
+    print("=" * 60)
+    print("CATALOG STAGE BENCHMARK")
+    print("=" * 60)
+    print(f"{len(prompts)} grocery lists x {args.runs} runs per mode\n")
+
+    results = {}
+    for mode in args.modes.split(","):
+        print(f"Running '{mode}'...")
+        results[mode] = run_mode(core, mode, prompts, args.runs)
+
+    print(f"\n{'mode':<15} {'p50 ms':>9} {'p95 ms':>9} {'in tok/req':>11} {'cached/req':>11} {'out tok/req':>12}")
+    for mode, result in results.items():
+        requests = result["requests"]
+        print(
+            f"{mode:<15} {result['p50_ms']:>9.0f} {result['p95_ms']:>9.0f} "
+            f"{result['input_tokens'] / requests:>11.0f} {result['cache_read_tokens'] / requests:>11.0f} "
+            f"{result['output_tokens'] / requests:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
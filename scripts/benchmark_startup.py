@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the order assistant runtime.
+
+Measures, in fresh interpreter processes:
+  - per-module import cost of order_assistant.py (python -X importtime)
+  - time-to-ready: interpreter start until the agent pool is initialized
+    (requires AWS credentials and a deployed gateway)
+
+Exits non-zero when a configured threshold is exceeded, so it can run in CI.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+RUNTIME_DIR = Path(__file__).resolve().parent.parent / "agentcore" / "runtime"
+
+READY_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import order_assistant
+imported = time.perf_counter()
+import core
+core.get_agent_pool()
+ready = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "init_ms": (ready - imported) * 1000}))
+"""
+
+
+def parse_importtime(stderr):
+    """Parse `python -X importtime` output into {module: (self_us, cumulative_us)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return modules
+
+
+def measure_imports(python):
+    """Import order_assistant in a fresh process with -X importtime
+
+    Returns:
+        Tuple of (wall-clock ms, {module: (self_us, cumulative_us)})
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", "import order_assistant"],
+        cwd=RUNTIME_DIR,
+        capture_output=True,
+        text=True,
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        print(result.stderr[-2000:], file=sys.stderr)
+        raise RuntimeError("Importing order_assistant failed")
+    return elapsed_ms, parse_importtime(result.stderr)
+
+
+def measure_ready(python):
+    """Start a fresh process and initialize the agent pool
+
+    Returns:
+        Dict with process wall-clock, import and initialization times in ms
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [python, "-c", READY_SNIPPET],
+        cwd=RUNTIME_DIR,
+        capture_output=True,
+        text=True,
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        print(result.stderr[-2000:], file=sys.stderr)
+        raise RuntimeError("Agent initialization failed")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process_ms"] = elapsed_ms
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark order assistant cold start")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh processes per measurement")
+    parser.add_argument("--top", type=int, default=20, help="Number of most expensive modules to list")
+    parser.add_argument("--ready", action="store_true", help="Also measure time-to-ready (needs AWS access)")
+    parser.add_argument("--max-import-ms", type=float, help="Fail if median import time exceeds this")
+    parser.add_argument("--max-ready-ms", type=float, help="Fail if median time-to-ready exceeds this")
+    parser.add_argument("--python", default=sys.executable, help="Interpreter to benchmark")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ORDER ASSISTANT STARTUP BENCHMARK")
+    print("=" * 60)
+
+    import_runs = []
+    modules = {}
+    for _ in range(args.runs):
+        elapsed_ms, modules = measure_imports(args.python)
+        import_runs.append(elapsed_ms)
+
+    # Report module costs from the last run (earlier runs warm the filesystem cache)
+    print(f"\nTop {args.top} modules by cumulative import time:")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    ranked = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_us, cumulative_us) in ranked[: args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    import_median = statistics.median(import_runs)
+    print(f"\nImport order_assistant (process wall-clock, {args.runs} runs):")
+    print(f"   median {import_median:.0f}ms, min {min(import_runs):.0f}ms, max {max(import_runs):.0f}ms")
+
+    failures = []
+    if args.max_import_ms is not None and import_median > args.max_import_ms:
+        failures.append(f"median import time {import_median:.0f}ms > {args.max_import_ms:.0f}ms")
+
+    if args.ready:
+        ready_runs = [measure_ready(args.python) for _ in range(args.runs)]
+        ready_median = statistics.median(run["process_ms"] for run in ready_runs)
+        init_median = statistics.median(run["init_ms"] for run in ready_runs)
+        print(f"\nTime-to-ready ({args.runs} runs):")
+        print(f"   median {ready_median:.0f}ms (agent initialization {init_median:.0f}ms)")
+
+        if args.max_ready_ms is not None and ready_median > args.max_ready_ms:
+            failures.append(f"median time-to-ready {ready_median:.0f}ms > {args.max_ready_ms:.0f}ms")
+
+    if failures:
+        print("\n❌ Startup regression:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+
+    print("\n✅ Startup within thresholds")
+
+
+if __name__ == "__main__":
+    main()